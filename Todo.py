@@ -1,25 +1,59 @@
-import requests
 import base64
-import time
+import os
 from datetime import datetime, timedelta
 import json
-import zeep
+from collections import deque
+from birthdays import BirthdayCalendar, next_occurrence
+from metrics import (METRICS_PORT, MetricsServer, Registry, register_outbound, register_router,
+                     register_runtime, register_yoai)
+from router import Router
+from runtime import BotRuntime
+from storage import Store
+from updates import UpdateTracker
+from outbound import OutboundQueue
+from yoai_client import YoAIClient
 
 # YoAI API Key
-YOAI_API_KEY = "01945bfb-0e2d-7a10-89ec-aed5b067359d:07e058c3375879e783f9b8aa3bc849af8de22267bceee7056c9795f98109fe8e"
+YOAI_API_KEY = os.environ.get(
+    "YOAI_API_KEY",
+    "01945bfb-0e2d-7a10-89ec-aed5b067359d:07e058c3375879e783f9b8aa3bc849af8de22267bceee7056c9795f98109fe8e",
+)
 
-# YoAI API Endpoints
-GET_UPDATES_URL = "https://yoai.yophone.com/api/pub/getUpdates"
-SEND_MESSAGE_URL = "https://yoai.yophone.com/api/pub/sendMessage"
+# Shared YoAI client: pooled keep-alive connections, timeouts and retries
+yoai = YoAIClient(YOAI_API_KEY)
 
-# Headers for API requests
-HEADERS = {
-    "Content-Type": "application/json",
-    "X-YoAI-API-Key": YOAI_API_KEY,
-}
+# Outgoing messages are rate limited (globally and per chat) and retried
+# from a bounded queue, so a burst of replies does not trip YoAI's limits
+outbound = OutboundQueue(yoai.deliver)
 
-# In-memory storage for birthdays (could be replaced with a database in production)
-birthdays = {}
+# In-memory birthday calendar (per chat, indexed by month/day); the store
+# keeps the events across restarts
+birthdays = BirthdayCalendar()
+
+# Send reminders this many days ahead of an event. The sweep runs hourly so
+# every chat is notified at its chosen local hour; each event occurrence is
+# notified once. The store records a notification as pending when it is
+# queued and as sent once it is delivered; pending ones are queued again
+# after a restart.
+REMINDER_DAYS_AHEAD = 7
+BIRTHDAY_SWEEP_INTERVAL = 60 * 60
+
+# Default local hour and UTC offset for notifications ("notify" command changes them)
+DEFAULT_NOTIFY_HOUR = 9
+DEFAULT_TZ_OFFSET = 0
+
+# Due notifications are queued and sent at most NOTIFICATIONS_PER_SECOND, so a
+# large daily batch is spread out instead of hitting sendMessage all at once
+NOTIFICATIONS_PER_SECOND = 20
+notification_queue = deque()
+
+store = Store()
+
+# chat_id -> (local hour, UTC offset) for birthday notifications
+notify_prefs = {}
+
+# getUpdates cursor and de-duplication of redelivered updates
+update_tracker = UpdateTracker(store, "todo")
 
 
 def decode_base64(text):
@@ -35,41 +69,16 @@ def decode_base64(text):
 
 def get_updates():
     """
-    Fetches updates from YoAI.
+    Fetches new updates from YoAI, skipping ones that were already processed.
     """
-    try:
-        response = requests.post(GET_UPDATES_URL, json={}, headers=HEADERS)
-        if response.status_code == 200:
-            updates = response.json()
-            if updates.get("success") and updates.get("data"):
-                return updates["data"]
-            else:
-                #print("No updates available.")
-                return []
-        elif response.status_code == 204:
-            #print("No new updates (HTTP 204). Waiting for new messages...")
-            return []
-        else:
-            #print(f"Failed to fetch updates. HTTP Status: {response.status_code}, Response: {response.text}")
-            return []
-    except Exception as e:
-        #print(f"Error while fetching updates: {e}")
-        return []
+    return update_tracker.filter(yoai.get_updates(offset=update_tracker.next_offset()))
 
 
 def send_message(chat_id, text):
     """
-    Sends a message to a specific chat ID via YoAI.
+    Queues a message to a specific chat ID for rate-limited delivery.
     """
-    payload = {"to": chat_id, "text": text}
-    # try:
-    response = requests.post(SEND_MESSAGE_URL, json=payload, headers=HEADERS)
-    #     if response.status_code == 200 and response.json().get("success"):
-    #         #print(f"Message sent to {chat_id}: {text}")
-    #     else:
-    #         #print(f"Failed to send message to {chat_id}: {response.json()}")
-    # except Exception as e:
-    #     #print(f"Error sending message: {e}")
+    outbound.submit(chat_id, text)
 
 
 def process_updates():
@@ -80,73 +89,170 @@ def process_updates():
     # if not updates:
         #print("No updates to process.")
     for message in updates:
-        chat_id = message.get("chatId")
-        encoded_text = message.get("text", "")
-        sender = message.get("sender", {})
-        sender_name = f"{sender.get('firstName', '')} {sender.get('lastName', '')}".strip()
-
-        # Decode the Base64 message text
-        text = decode_base64(encoded_text)
-
-        #print(f"Processing message: {text} from {sender_name} (Chat ID: {chat_id})")
-
-        # Respond based on the message content
-        if text.lower() == "/start":
-            response_text = (
-                f"Welcome, {sender_name}! 👋\n"
-                "I am your Birthday Bot. Type 'help' for commands or send me a date for a special event."
-            )
-        elif text.lower() == "help":
-            response_text = (
-                "Available commands:\n"
-                "- /start: Start the bot\n"
-                "- add: Add a new birthday or special event\n"
-                "- show: Show all upcoming birthdays and events\n"
-                "- help: Show this help message"
-            )
-        elif text.lower() == "show":
-            if birthdays:
-                response_text = "Here are your upcoming events:\n"
-                for name, date in birthdays.items():
-                    response_text += f"{name}: {date}\n"
-            else:
-                response_text = "You haven't added any birthdays or events yet."
-        elif text.lower().startswith("add "):
-            # Extract name and date from the message
-            try:
-                parts = text[4:].split(" on ")
-                name = parts[0].strip()
-                date_str = parts[1].strip()
-                date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                birthdays[name] = date_obj.strftime("%Y-%m-%d")
-                response_text = f"Added {name}'s birthday on {date_obj.strftime('%Y-%m-%d')}!"
-            except Exception as e:
-                response_text = "Failed to add the event. Please use the format: 'add <Name> on <YYYY-MM-DD>'"
-        else:
-            response_text = f"Sorry, I didn't understand that. You said: {text}"
-
-        # Send the response back to the user
-        send_message(chat_id, response_text)
-
-
-def check_upcoming_birthdays():
+        handle_message(message)
+    store.flush()
+
+
+# ----- Command handlers -----
+router = Router()
+
+
+@router.command("/start")
+def handle_start(msg):
+    return (
+        f"Welcome, {msg.sender_name}! 👋\n"
+        "I am your Birthday Bot. Type 'help' for commands or send me a date for a special event."
+    )
+
+
+@router.command("help")
+def handle_help(msg):
+    return (
+        "Available commands:\n"
+        "- /start: Start the bot\n"
+        "- add: Add a new birthday or special event\n"
+        "- show: Show all upcoming birthdays and events\n"
+        "- notify <hour> [<UTC offset>]: When to send reminders, e.g. 'notify 9 +4'\n"
+        "- help: Show this help message"
+    )
+
+
+@router.command("show")
+def handle_show(msg):
+    events = birthdays.for_owner(msg.chat_id, datetime.now().date())
+    if not events:
+        return "You haven't added any birthdays or events yet."
+    response_text = "Here are your upcoming events:\n"
+    for next_date, name, born in events:
+        response_text += f"{name}: {born.strftime('%Y-%m-%d')} (next: {next_date.strftime('%Y-%m-%d')})\n"
+    return response_text
+
+
+@router.prefix("add")
+def handle_add(msg):
+    # Extract name and date from the message
+    try:
+        parts = msg.args.split(" on ")
+        name = parts[0].strip()
+        date_str = parts[1].strip()
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        birthdays.add(msg.chat_id, name, date_obj.date())
+        store.save_birthday(msg.chat_id, name, date_obj.strftime("%Y-%m-%d"))
+        return f"Added {name}'s birthday on {date_obj.strftime('%Y-%m-%d')}!"
+    except Exception as e:
+        return "Failed to add the event. Please use the format: 'add <Name> on <YYYY-MM-DD>'"
+
+
+@router.prefix("notify")
+def handle_notify(msg):
+    try:
+        parts = msg.args.split()
+        hour = int(parts[0])
+        offset = int(parts[1]) if len(parts) > 1 else notify_prefs.get(msg.chat_id, (0, DEFAULT_TZ_OFFSET))[1]
+        if not 0 <= hour <= 23 or not -12 <= offset <= 14:
+            raise ValueError(parts)
+    except (ValueError, IndexError):
+        return "Please use the format: 'notify <hour 0-23> [<UTC offset, e.g. +4>]'"
+    notify_prefs[msg.chat_id] = (hour, offset)
+    store.save_notify_pref(msg.chat_id, hour, offset)
+    return f"I'll send birthday reminders at {hour:02d}:00 (UTC{offset:+d})."
+
+
+@router.default
+def handle_unknown(msg):
+    return f"Sorry, I didn't understand that. You said: {msg.text}"
+
+
+def handle_message(message):
     """
-    Checks for upcoming birthdays or events and sends reminders.
+    Decodes a single message and sends the appropriate response.
     """
-    today = datetime.now()
-    for name, date_str in birthdays.items():
-        birthday_date = datetime.strptime(date_str, "%Y-%m-%d")
-        # Send reminder a week before the event
-        if birthday_date - timedelta(days=7) <= today <= birthday_date:
-            reminder_text = f"Reminder: {name}'s special day is coming up on {birthday_date.strftime('%Y-%m-%d')}!"
-            send_message(chat_id, reminder_text)
+    try:
+        text = decode_base64(message.get("text", ""))
+        #print(f"Processing message: {text} (Chat ID: {message.get('chatId')})")
+        response_text = router.dispatch(message, text)
+        send_message(message.get("chatId"), response_text)
+    finally:
+        # Also when the handler failed, so one bad update cannot hold the cursor
+        update_tracker.ack(message)
 
 
-if __name__ == "__main__":
+def check_upcoming_birthdays(now_utc=None):
+    """
+    Queues reminders for events coming up within REMINDER_DAYS_AHEAD days.
+    A chat is notified once per event occurrence, on the first sweep at or
+    after its chosen local hour.
+    """
+    if now_utc is None:
+        now_utc = datetime.utcnow()
+    today = now_utc.date()
+    # Local dates range from UTC-12 to UTC+14, so look one day further each way
+    for _, chat_id, name, born in birthdays.upcoming(today - timedelta(days=1), REMINDER_DAYS_AHEAD + 2):
+        hour, offset = notify_prefs.get(chat_id, (DEFAULT_NOTIFY_HOUR, DEFAULT_TZ_OFFSET))
+        local_now = now_utc + timedelta(hours=offset)
+        if local_now.hour < hour:
+            continue
+        local_today = local_now.date()
+        next_date = next_occurrence(born, local_today)
+        if (next_date - local_today).days > REMINDER_DAYS_AHEAD:
+            continue
+        event_date = next_date.strftime("%Y-%m-%d")
+        if store.claim_notification(chat_id, name, event_date):
+            notification_queue.append((chat_id, name, event_date))
+
+    # Sent-markers of past occurrences are no longer needed
+    store.prune_notifications((today - timedelta(days=2)).strftime("%Y-%m-%d"))
+
+
+def send_queued_notifications():
+    """
+    Sends up to NOTIFICATIONS_PER_SECOND queued birthday reminders (runs every second).
+    """
+    for _ in range(min(NOTIFICATIONS_PER_SECOND, len(notification_queue))):
+        chat_id, name, event_date = notification_queue[0]
+        text = f"Reminder: {name}'s special day is coming up on {event_date}!"
+        key = (chat_id, name, event_date)
+        if not outbound.submit(chat_id, text, on_sent=lambda key=key: store.mark_notification_sent(*key)):
+            # Outbound queue full: try again on the next run
+            break
+        notification_queue.popleft()
+
+
+# ----- Metrics -----
+registry = Registry()
+register_router(registry, router)
+register_outbound(registry, outbound)
+register_yoai(registry, yoai)
+registry.value("gauge", "bot_birthdays", "Stored birthday events", lambda: len(birthdays))
+registry.value("gauge", "bot_notifications_queued", "Birthday notifications waiting to be sent",
+               lambda: len(notification_queue))
+
+
+def main():
+    """Load the saved events and run the bot until interrupted."""
+    outbound.start()
     #print("BirthdayBot is running...")
+    for owner_chat_id, name, date_str in store.load_birthdays():
+        birthdays.add(owner_chat_id, name, datetime.strptime(date_str, "%Y-%m-%d").date())
+    notify_prefs.update(store.load_notify_prefs())
+    # Notifications claimed before a restart but never delivered
+    notification_queue.extend(store.pending_notifications())
+
+    # Poll, handle updates per chat, and run the birthday check alongside
+    runtime = BotRuntime(
+        get_updates,
+        handle_message,
+        periodic=[
+            (check_upcoming_birthdays, BIRTHDAY_SWEEP_INTERVAL),
+            (send_queued_notifications, 1),
+            (store.flush, store.commit_interval),
+        ],
+    )
+    if METRICS_PORT:
+        register_runtime(registry, runtime)
+        MetricsServer(registry, health=runtime.health).start()
+    runtime.run()
 
-    # Use polling to fetch updates
-    while True:
-        process_updates()
-        check_upcoming_birthdays()
-        time.sleep(5)
+
+if __name__ == "__main__":
+    main()
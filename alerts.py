@@ -0,0 +1,249 @@
+"""
+Price-threshold alerts ("alert BTC above 30000000", "alert USD below 380").
+
+Alerts are kept per symbol in two books, one per direction, each a pair of
+parallel arrays sorted by threshold. When a new price arrives, every alert
+it crosses sits at one end of a book: the "above" alerts with a threshold
+<= price are a prefix of that book, and the "below" alerts with a threshold
+>= price are a suffix. A single bisect finds the boundary, so a refresh
+costs O(log n + fired) however many alerts are waiting, and the fired
+range is cut out of the arrays with one slice deletion. The books hold the
+thresholds as floats; every alert they return is checked against its
+Decimal threshold before it fires, so the boundary is exact.
+
+Alerts are one-shot: an alert is removed when it fires. A cancelled alert
+leaves a tombstone in its book (its id is gone from AlertBook.alerts) that
+is skipped when its range fires and compacted away once tombstones make up
+half of a book. Alert ids must not be reused (the store's ids are
+AUTOINCREMENT); a tombstone whose id does belong to another alert by now is
+still recognized by its symbol, direction and threshold.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+ABOVE = "above"
+BELOW = "below"
+DIRECTIONS = (ABOVE, BELOW)
+
+# Most alerts listed in one notification message; the rest are summarized
+MAX_LINES_PER_MESSAGE = 20
+
+# Books with fewer tombstones than this are never compacted
+COMPACT_MIN = 64
+
+
+class Alert:
+    """One pending alert: notify chat_id once `symbol` crosses `threshold` in `direction`."""
+
+    __slots__ = ("alert_id", "chat_id", "symbol", "direction", "threshold")
+
+    def __init__(self, chat_id, symbol, direction, threshold, alert_id=None):
+        self.alert_id = alert_id
+        self.chat_id = chat_id
+        self.symbol = symbol
+        self.direction = direction
+        self.threshold = threshold
+
+    def __repr__(self):
+        return f"Alert({self.alert_id!r}, chat {self.chat_id!r}, {self.symbol} {self.direction} {self.threshold})"
+
+
+class ThresholdBook:
+    """Alert ids of one symbol and direction, sorted by threshold."""
+
+    __slots__ = ("thresholds", "ids", "dead")
+
+    def __init__(self):
+        self.thresholds = array("d")
+        self.ids = array("q")
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, threshold, alert_id):
+        # Equal thresholds keep insertion order
+        index = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(index, threshold)
+        self.ids.insert(index, alert_id)
+
+    def load(self, pairs):
+        """Replace the contents with (threshold, alert_id) pairs in any order."""
+        pairs = sorted(pairs)
+        self.thresholds = array("d", [threshold for threshold, _ in pairs])
+        self.ids = array("q", [alert_id for _, alert_id in pairs])
+        self.dead = 0
+
+    def take_up_to(self, price):
+        """Remove and return the (thresholds, ids) with threshold <= price."""
+        end = bisect_right(self.thresholds, price)
+        fired = self.thresholds[:end], self.ids[:end]
+        del self.thresholds[:end]
+        del self.ids[:end]
+        return fired
+
+    def take_from(self, price):
+        """Remove and return the (thresholds, ids) with threshold >= price."""
+        start = bisect_left(self.thresholds, price)
+        fired = self.thresholds[start:], self.ids[start:]
+        del self.thresholds[start:]
+        del self.ids[start:]
+        return fired
+
+
+class AlertBook:
+    """
+    All pending alerts, indexed by id and by (symbol, direction) books.
+
+    add() and cancel() are called from handler threads and evaluate() from
+    the price refreshers, so every method takes the book's lock.
+    """
+
+    def __init__(self):
+        self.alerts = {}      # alert_id -> Alert
+        self._books = {}      # (symbol, direction) -> ThresholdBook
+        self._by_chat = {}    # chat_id -> set of alert_ids
+        self._lock = threading.Lock()
+        self.evaluations = 0
+        self.fired = 0
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def _book(self, symbol, direction):
+        book = self._books.get((symbol, direction))
+        if book is None:
+            book = self._books[(symbol, direction)] = ThresholdBook()
+        return book
+
+    def _forget(self, alert):
+        ids = self._by_chat.get(alert.chat_id)
+        if ids is not None:
+            ids.discard(alert.alert_id)
+            if not ids:
+                del self._by_chat[alert.chat_id]
+
+    def add(self, alert):
+        """Index an alert that already has its alert_id."""
+        with self._lock:
+            self.alerts[alert.alert_id] = alert
+            self._by_chat.setdefault(alert.chat_id, set()).add(alert.alert_id)
+            self._book(alert.symbol, alert.direction).add(float(alert.threshold), alert.alert_id)
+
+    def load(self, alerts):
+        """Index stored alerts in bulk: one sort per book instead of one insert per alert."""
+        grouped = {}
+        for alert in alerts:
+            grouped.setdefault((alert.symbol, alert.direction), []).append(
+                (float(alert.threshold), alert.alert_id))
+        with self._lock:
+            for alert in alerts:
+                self.alerts[alert.alert_id] = alert
+                self._by_chat.setdefault(alert.chat_id, set()).add(alert.alert_id)
+            for (symbol, direction), pairs in grouped.items():
+                book = self._book(symbol, direction)
+                book.load(pairs + list(zip(book.thresholds, book.ids)))
+
+    def get(self, alert_id):
+        return self.alerts.get(alert_id)
+
+    def for_chat(self, chat_id):
+        """The chat's pending alerts, oldest first."""
+        with self._lock:
+            return [self.alerts[alert_id] for alert_id in sorted(self._by_chat.get(chat_id, ()))]
+
+    def count_for_chat(self, chat_id):
+        return len(self._by_chat.get(chat_id, ()))
+
+    def cancel(self, alert_id):
+        """Drop a pending alert. Returns it, or None if it was not pending."""
+        with self._lock:
+            alert = self.alerts.pop(alert_id, None)
+            if alert is None:
+                return None
+            self._forget(alert)
+            book = self._books[(alert.symbol, alert.direction)]
+            book.dead += 1
+            if book.dead >= COMPACT_MIN and book.dead * 2 >= len(book):
+                book.load([(t, i) for t, i in zip(book.thresholds, book.ids) if i in self.alerts])
+            return alert
+
+    def evaluate(self, symbol, price):
+        """Remove and return the alerts of `symbol` that `price` triggers."""
+        # Floats (CoinGecko JSON) go through str() to keep their printed digits
+        exact = price if isinstance(price, Decimal) else Decimal(str(price))
+        price = float(price)
+        fired = []
+        with self._lock:
+            self.evaluations += 1
+            for direction in DIRECTIONS:
+                book = self._books.get((symbol, direction))
+                if not book:
+                    continue
+                thresholds, ids = book.take_up_to(price) if direction == ABOVE else book.take_from(price)
+                for threshold, alert_id in zip(thresholds, ids):
+                    alert = self.alerts.get(alert_id)
+                    if (alert is None or alert.symbol != symbol or alert.direction != direction
+                            or float(alert.threshold) != threshold):
+                        # Tombstone of a cancelled alert
+                        book.dead -= 1
+                    elif exact >= alert.threshold if direction == ABOVE else exact <= alert.threshold:
+                        del self.alerts[alert_id]
+                        self._forget(alert)
+                        fired.append(alert)
+                    else:
+                        # Equal as floats but not crossed: keep waiting
+                        book.add(threshold, alert_id)
+            self.fired += len(fired)
+        return fired
+
+    def evaluate_all(self, prices):
+        """evaluate() for every symbol in a {symbol: price} snapshot; returns all fired alerts."""
+        fired = []
+        for symbol, price in prices.items():
+            if price is not None:
+                fired.extend(self.evaluate(symbol, price))
+        return fired
+
+
+class AlertNotifier:
+    """
+    Turns a batch of fired alerts into one message per chat.
+
+    A refresh that fires many alerts of one chat (or of many chats) queues a
+    single summary message per chat instead of one message per alert, so
+    the outbound rate limits are spent on chats rather than on alerts.
+    `send(chat_id, text)` is OutboundQueue.submit or similar.
+    """
+
+    def __init__(self, send, max_lines=MAX_LINES_PER_MESSAGE, unit=""):
+        self.send = send
+        self.max_lines = max_lines
+        self.unit = unit
+        self.batches = 0
+        self.messages = 0
+
+    def format(self, alerts, prices):
+        suffix = f" {self.unit}" if self.unit else ""
+        lines = ["🔔 Price alert:" if len(alerts) == 1 else f"🔔 {len(alerts)} price alerts:"]
+        for alert in alerts[:self.max_lines]:
+            price = prices.get(alert.symbol)
+            lines.append(f"{alert.symbol} is {price}{suffix} ({alert.direction} {alert.threshold}{suffix})")
+        if len(alerts) > self.max_lines:
+            lines.append(f"... and {len(alerts) - self.max_lines} more")
+        return "\n".join(lines)
+
+    def notify(self, alerts, prices):
+        """Queue one message per chat for the fired alerts. `prices` is {symbol: price}."""
+        if not alerts:
+            return 0
+        by_chat = {}
+        for alert in alerts:
+            by_chat.setdefault(alert.chat_id, []).append(alert)
+        for chat_id, chat_alerts in by_chat.items():
+            self.send(chat_id, self.format(chat_alerts, prices))
+        self.batches += 1
+        self.messages += len(by_chat)
+        return len(by_chat)
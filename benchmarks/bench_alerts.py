@@ -0,0 +1,119 @@
+"""
+Evaluation cost of price alerts per price refresh with a large number of
+pending alerts.
+
+Alerts are spread over the bot's symbols with thresholds a few percent
+above or below the current price. Each refresh moves every price by a
+random step and evaluates the whole snapshot; the AlertBook finds the
+crossed alerts with one bisect per book, compared with a linear scan over
+every alert. Fired alerts go through the AlertNotifier (one message per
+chat). Run from the repository root:
+
+    python benchmarks/bench_alerts.py [alert_count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import ABOVE, BELOW, Alert, AlertBook, AlertNotifier  # noqa: E402
+
+ALERTS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+CHATS = 100_000
+REFRESHES = 200
+STEP = 0.002  # largest price move per refresh (fraction)
+PRICES = {"BTC": 30_000_000.0, "ETH": 1_500_000.0, "DOGE": 40.0, "FTN": 1_200.0, "USD": 390.0, "EUR": 420.0}
+
+
+def make_alerts(count):
+    rnd = random.Random(42)
+    symbols = list(PRICES)
+    alerts = []
+    for alert_id in range(1, count + 1):
+        symbol = rnd.choice(symbols)
+        direction = rnd.choice((ABOVE, BELOW))
+        distance = rnd.uniform(0.001, 0.10)
+        factor = 1 + distance if direction == ABOVE else 1 - distance
+        alerts.append(Alert(rnd.randrange(CHATS), symbol, direction, round(PRICES[symbol] * factor, 2), alert_id))
+    return alerts
+
+
+def linear_evaluate(alerts, prices):
+    fired = []
+    for alert in alerts:
+        price = prices[alert.symbol]
+        if price >= alert.threshold if alert.direction == ABOVE else price <= alert.threshold:
+            fired.append(alert)
+    return fired
+
+
+def walk(prices, rnd):
+    return {symbol: price * (1 + rnd.uniform(-STEP, STEP)) for symbol, price in prices.items()}
+
+
+def main():
+    alerts = make_alerts(ALERTS)
+    book = AlertBook()
+    start = time.perf_counter()
+    book.load(alerts)
+    load_s = time.perf_counter() - start
+    print(f"pending alerts:          {ALERTS:,} ({len(PRICES)} symbols, {CHATS:,} chats)")
+    print(f"bulk load:               {load_s:.2f} s ({load_s / ALERTS * 1e6:.2f} us/alert)")
+
+    # Nothing crosses when the prices do not move
+    start = time.perf_counter()
+    for _ in range(REFRESHES):
+        assert not book.evaluate_all(PRICES)
+    idle_s = (time.perf_counter() - start) / REFRESHES
+    print(f"idle refresh:            {idle_s * 1e6:.1f} us")
+
+    # A random walk: each refresh fires the alerts its prices cross
+    messages = []
+    notifier = AlertNotifier(lambda chat_id, text: messages.append(chat_id), unit="AMD")
+    rnd = random.Random(7)
+    prices = dict(PRICES)
+    fired_total = 0
+    slowest = 0
+    start = time.perf_counter()
+    for _ in range(REFRESHES):
+        prices = walk(prices, rnd)
+        tick = time.perf_counter()
+        fired = book.evaluate_all(prices)
+        notifier.notify(fired, prices)
+        slowest = max(slowest, time.perf_counter() - tick)
+        fired_total += len(fired)
+    busy_s = (time.perf_counter() - start) / REFRESHES
+    print(f"moving refresh:          {busy_s * 1e3:.3f} ms avg, {slowest * 1e3:.3f} ms max "
+          f"({fired_total / REFRESHES:.0f} alerts fired per refresh, incl. notifier)")
+    print(f"notifier:                {fired_total:,} alerts -> {len(messages):,} messages")
+
+    # Adding one alert is a bisect plus an array insert
+    rnd = random.Random(3)
+    extra = [Alert(rnd.randrange(CHATS), "BTC", ABOVE, prices["BTC"] * rnd.uniform(1.01, 1.1), ALERTS + i + 1)
+             for i in range(10_000)]
+    start = time.perf_counter()
+    for alert in extra:
+        book.add(alert)
+    add_s = (time.perf_counter() - start) / len(extra)
+    print(f"add one alert:           {add_s * 1e6:.2f} us")
+
+    # Cancelling leaves a tombstone; compaction is amortized
+    ids = rnd.sample(list(book.alerts), 10_000)
+    start = time.perf_counter()
+    for alert_id in ids:
+        book.cancel(alert_id)
+    cancel_s = (time.perf_counter() - start) / len(ids)
+    print(f"cancel one alert:        {cancel_s * 1e6:.2f} us")
+
+    # Checking every alert on every refresh is O(n) whether anything fires or not
+    remaining = list(book.alerts.values())
+    start = time.perf_counter()
+    linear_evaluate(remaining, prices)
+    linear_s = time.perf_counter() - start
+    print(f"linear scan refresh:     {linear_s * 1e3:.1f} ms ({len(remaining):,} alerts)")
+
+
+if __name__ == "__main__":
+    main()
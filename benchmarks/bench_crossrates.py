@@ -0,0 +1,63 @@
+"""
+Cost of building the cross-rate matrix and of one conversion.
+
+Uses a CBA-sized table (about 45 ISO codes) plus the bot's crypto symbols,
+and compares a lookup in the precomputed matrix with dividing the two AMD
+quotes on every request. Run from the repository root:
+
+    python benchmarks/bench_crossrates.py [fiat_count]
+"""
+import os
+import random
+import sys
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crossrates import CrossRates, _context  # noqa: E402
+
+FIAT = int(sys.argv[1]) if len(sys.argv) > 1 else 45
+CONVERSIONS = 200_000
+CRYPTO = {"BTC": 40_000_000.5, "ETH": 1_500_000.0, "DOGE": 41.7, "FTN": 1_250.0}
+
+
+def make_table(count):
+    rnd = random.Random(42)
+    return {f"C{i:02d}": Decimal(str(round(rnd.uniform(0.01, 1000), 4))) for i in range(count)}
+
+
+def direct_convert(amount, quotes, source, target):
+    return _context.multiply(amount, _context.divide(quotes[source], quotes[target])).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def main():
+    table = make_table(FIAT)
+    start = time.perf_counter()
+    rates = CrossRates(table, CRYPTO)
+    build_s = time.perf_counter() - start
+    print(f"symbols:                 {len(rates)} ({len(rates) ** 2:,} cross rates)")
+    print(f"matrix build:            {build_s * 1e3:.2f} ms")
+
+    rnd = random.Random(7)
+    pairs = [(Decimal(rnd.randint(1, 10_000)), rnd.choice(rates.symbols), rnd.choice(list(table)))
+             for _ in range(1000)]
+    start = time.perf_counter()
+    for n in range(CONVERSIONS):
+        amount, source, target = pairs[n % 1000]
+        rates.convert(amount, source, target)
+    lookup_s = (time.perf_counter() - start) / CONVERSIONS
+    print(f"convert (matrix):        {lookup_s * 1e6:.2f} us")
+
+    quotes = dict(table, AMD=Decimal(1), **{s: Decimal(str(p)) for s, p in CRYPTO.items()})
+    start = time.perf_counter()
+    for n in range(CONVERSIONS):
+        amount, source, target = pairs[n % 1000]
+        direct_convert(amount, quotes, source, target)
+    direct_s = (time.perf_counter() - start) / CONVERSIONS
+    print(f"convert (divide):        {direct_s * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
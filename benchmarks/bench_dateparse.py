@@ -0,0 +1,89 @@
+"""
+Cost of dateparse.parse_when on a corpus of reminder prompts, compared with
+the old strptime-only parser. "Now" is pinned to Wednesday 2025-01-15 14:00
+in Asia/Yerevan, as in tests/test_dateparse.py.
+
+    python benchmarks/bench_dateparse.py [rounds]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateparse import parse_when  # noqa: E402
+from timezones import local_to_utc  # noqa: E402
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+ZONE = "Asia/Yerevan"
+NOW = local_to_utc(datetime(2025, 1, 15, 14, 0), ZONE)  # a Wednesday
+
+# Every form the parser supports plus inputs it must reject (the expected
+# results are in tests/test_dateparse.py), and a few ordinary messages
+CORPUS = [
+    "2025-01-20 10:00",
+    "2025-1-2 7:05",
+    "2025-02-01",
+    "in 2h",
+    "in 90 min",
+    "in 1h30m",
+    "In 3 days",
+    "in 1 week",
+    "18:00",
+    "9:00",
+    "9am",
+    "9:30 pm",
+    "12am",
+    "today 18:00",
+    "tomorrow 9:00",
+    "Tomorrow at 9",
+    "tomorrow",
+    "fri 14:30",
+    "wed 18:00",
+    "wed 10:00",
+    "next mon 14:30",
+    "next wed",
+    "monday at 8:15",
+    "25.12 18:00",
+    "01.01 00:00",
+    "25.12.2026 18:00",
+    "25/12",
+    "",
+    "soon",
+    "in 2 fortnights",
+    "25:00",
+    "13pm",
+    "31.02 10:00",
+    "2025-13-01 10:00",
+    "next blursday",
+] * 3 + [
+    "Remind me about the meeting", "ok", "2025-03-01 09:15", "in 45 minutes", "tomorrow 7:30",
+]
+
+
+def old_parse(text):
+    try:
+        return datetime.strptime(text.strip(), "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+
+
+def bench(label, parse):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text in CORPUS:
+            parse(text)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<15} {elapsed / (ROUNDS * len(CORPUS)) * 1e6:.2f} us/message")
+
+
+def main():
+    print(f"recognized:     parse_when {sum(1 for text in CORPUS if parse_when(text, ZONE, NOW))}, "
+          f"strptime only {sum(1 for text in CORPUS if old_parse(text))} of {len(CORPUS)} messages")
+    bench("parse_when", lambda text: parse_when(text, ZONE, NOW))
+    bench("strptime only", old_parse)
+
+
+if __name__ == "__main__":
+    main()
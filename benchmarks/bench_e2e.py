@@ -0,0 +1,298 @@
+"""
+End-to-end load test of bot.py, Todo.py and reminder.py against the local
+simulator (benchmarks/simulator.py); nothing leaves the machine.
+
+Every bot runs in its own process, unchanged apart from the environment
+pointing it at the simulator. A synthetic population of users per bot
+talks to it in a closed loop: each user sends the next message of its
+script `--think` seconds after the bot answered the previous one.
+
+    bot       /start, help, USD, BTC, EUR, ETH, DOGE
+    todo      /start, help, add <name> on <date>, notify 9 +4, show
+    reminder  /start, Asia/Yerevan, then per round: <text>, <date time>, 4,
+              /list (the full state 1 -> 4 flow)
+
+reminder.py runs on a virtual clock (`--speed` times faster than real
+time, shared through SIM_CLOCK_* variables), so reminders set a few
+minutes ahead fire within seconds. The report has messages/s, p50/p99
+reply latency, reminder firing lag (in virtual seconds) and the RSS of
+every bot process.
+
+    python benchmarks/bench_e2e.py [--users 200] [--rounds 3] [--bots bot,todo,reminder]
+                                   [--speed 10] [--think 1.0] [--rate 25] [--timeout 180]
+
+bot.py needs zeep for fiat rates; without it USD/EUR are answered with an
+apology, which the report counts under "error replies".
+"""
+import argparse
+import heapq
+import importlib
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from simulator import Simulator, VirtualClock  # noqa: E402
+
+BOT_MODULES = {"bot": "bot", "todo": "Todo", "reminder": "reminder"}
+
+REMINDER_ZONE = "Asia/Yerevan"
+REMINDER_PREFIX = "⏰ Reminder!"
+ERROR_MARKERS = ("Sorry", "Invalid", "couldn't", "doesn't exist", "Failed")
+
+# How far ahead (virtual seconds) reminders are set: LEAD plus up to SPREAD
+REMINDER_LEAD = 120
+REMINDER_SPREAD = 240
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def rss_mb(pid):
+    """(current, peak) resident set size of a process in MB, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            fields = dict(line.split(":", 1) for line in status if ":" in line)
+    except OSError:
+        return None, None
+    return tuple(int(fields[key].split()[0]) / 1024 if key in fields else None for key in ("VmRSS", "VmHWM"))
+
+
+# ----- Bot processes -----
+def run_bot(name):
+    """Entry point of a bot process: put reminder.py on the virtual clock and run main()."""
+    module = importlib.import_module(BOT_MODULES[name])
+    clock = VirtualClock.from_env(os.environ)
+    if clock is not None and name == "reminder":
+        module.clock = clock
+        # The runtime sleeps in real seconds; the scheduler thinks in virtual ones
+        until_next_tick = module.seconds_until_next_tick
+        module.seconds_until_next_tick = lambda: until_next_tick() / clock.speed
+    module.main()
+
+
+def start_bot(name, simulator, clock, workdir, rate):
+    env = dict(os.environ)
+    env.update(simulator.bot_env(name))
+    env.update(clock.env())
+    env.update({
+        "BOT_DB_PATH": os.path.join(workdir, "bench.db"),
+        "WSDL_CACHE_PATH": os.path.join(workdir, "wsdl", "zeep.sqlite"),
+        "OUTBOUND_GLOBAL_RATE": str(rate),
+        "OUTBOUND_GLOBAL_BURST": str(max(1, int(rate))),
+        "PYTHONUNBUFFERED": "1",
+    })
+    log = open(os.path.join(workdir, f"{name}.log"), "w")
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--run-bot", name],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+
+
+# ----- Users -----
+class Population:
+    """
+    Closed-loop users of all bots. The simulator calls on_send() for every
+    reply; the user's next message is queued `think` seconds later.
+    """
+
+    def __init__(self, simulator, clock, users, rounds, think, seed=5):
+        self.simulator = simulator
+        self.clock = clock
+        self.think = think
+        self.zone = ZoneInfo(REMINDER_ZONE)
+        self.random = random.Random(seed)
+        self.scripts = {}     # (bot, chat_id) -> remaining messages
+        self.waiting = {}     # (bot, chat_id) -> perf_counter() when the message was queued
+        self.last_text = {}   # (bot, chat_id) -> last message sent
+        self.latencies = {}   # bot -> [seconds]
+        self.errors = {}      # bot -> error replies
+        self.extra = {}       # bot -> replies nobody waited for
+        self.expected = {}    # reminder text -> virtual epoch it should fire at
+        self.lags = []
+        self.late_reminders = 0
+        self.done = 0
+        self._due = []
+        self._cond = threading.Condition()
+        for bot in simulator.channels:
+            self.latencies[bot], self.errors[bot], self.extra[bot] = [], 0, 0
+            for user in range(users):
+                chat_id = user + 1
+                self.scripts[(bot, chat_id)] = self._script(bot, chat_id, rounds)
+
+    def _script(self, bot, chat_id, rounds):
+        if bot == "bot":
+            steps = ["/start"] + [self.random.choice(["help", "USD", "BTC", "EUR", "ETH", "DOGE"])
+                                  for _ in range(4 * rounds)]
+        elif bot == "todo":
+            steps = ["/start", "help", "notify 9 +4"]
+            for n in range(rounds):
+                born = f"19{self.random.randint(50, 99)}-{self.random.randint(1, 12):02d}-{self.random.randint(1, 28):02d}"
+                steps += [f"add Friend{chat_id}x{n} on {born}", "show"]
+        else:
+            steps = ["/start", REMINDER_ZONE]
+            for n in range(rounds):
+                # None is replaced by the reminder time when it is sent
+                steps += [f"Task {chat_id}-{n}", None, "4", "/list"]
+        return steps
+
+    def _reminder_time(self, script_text):
+        """A local time a few virtual minutes ahead; remembered to measure the firing lag."""
+        fire_at = self.clock() + REMINDER_LEAD + self.random.randrange(REMINDER_SPREAD)
+        fire_at -= fire_at % 60
+        self.expected[script_text] = fire_at
+        return datetime.fromtimestamp(fire_at, timezone.utc).astimezone(self.zone).strftime("%Y-%m-%d %H:%M")
+
+    def start(self):
+        for key in self.scripts:
+            self._schedule(key, self.random.uniform(0, self.think))
+        threading.Thread(target=self._loop, name="users", daemon=True).start()
+
+    def _schedule(self, key, delay):
+        with self._cond:
+            heapq.heappush(self._due, (time.perf_counter() + delay, key))
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._due or self._due[0][0] > time.perf_counter():
+                    self._cond.wait(self._due[0][0] - time.perf_counter() if self._due else None)
+                _, key = heapq.heappop(self._due)
+            self._send_next(key)
+
+    def _send_next(self, key):
+        bot, chat_id = key
+        script = self.scripts[key]
+        text = script.pop(0)
+        if text is None:
+            text = self._reminder_time(self.last_text[key])
+        self.last_text[key] = text
+        self.waiting[key] = time.perf_counter()
+        self.simulator.push(bot, chat_id, text)
+
+    def on_send(self, bot, chat_id, text):
+        """Called by the simulator (under its lock) for every sendMessage."""
+        if text.startswith(REMINDER_PREFIX):
+            task = text.split("\n\n")[1] if "\n\n" in text else ""
+            fire_at = self.expected.pop(task, None)
+            if fire_at is None:
+                self.late_reminders += 1
+            else:
+                self.lags.append(self.clock() - fire_at)
+            return
+        key = (bot, chat_id)
+        sent_at = self.waiting.pop(key, None)
+        if sent_at is None:
+            self.extra[bot] += 1
+            return
+        self.latencies[bot].append(time.perf_counter() - sent_at)
+        if any(marker in text for marker in ERROR_MARKERS):
+            self.errors[bot] += 1
+        if self.scripts[key]:
+            self._schedule(key, self.think)
+        else:
+            self.done += 1
+
+    @property
+    def finished(self):
+        return self.done == len(self.scripts) and not self.expected
+
+
+# ----- Report -----
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=200, help="users per bot")
+    parser.add_argument("--rounds", type=int, default=3, help="script repetitions per user")
+    parser.add_argument("--bots", default="bot,todo,reminder")
+    parser.add_argument("--speed", type=float, default=10.0, help="virtual clock speed for reminder.py")
+    parser.add_argument("--think", type=float, default=1.0, help="seconds between a reply and the next message")
+    parser.add_argument("--rate", type=float, default=25.0, help="outbound messages/s per bot (YoAI limit)")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="seconds the fake sendMessage takes")
+    parser.add_argument("--timeout", type=float, default=180.0, help="give up after this many seconds")
+    parser.add_argument("--run-bot", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_bot:
+        run_bot(args.run_bot)
+        return
+
+    bots = [bot for bot in args.bots.split(",") if bot]
+    clock = VirtualClock(speed=args.speed)
+    simulator = Simulator(send_latency=args.send_latency)
+    for bot in bots:
+        simulator.add_bot(bot)
+    population = Population(simulator, clock, args.users, args.rounds, args.think)
+    simulator.on_send = population.on_send
+    simulator.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    processes = {bot: start_bot(bot, simulator, clock, workdir, args.rate) for bot in bots}
+    print(f"bots:              {', '.join(bots)} (logs in {workdir})")
+    print(f"users:             {args.users} per bot, {args.rounds} rounds, think {args.think} s, "
+          f"virtual clock x{args.speed:g}")
+
+    deadline = time.perf_counter() + 60
+    while any(simulator.channels[bot].polls == 0 for bot in bots):
+        if time.perf_counter() > deadline or any(p.poll() is not None for p, _ in processes.values()):
+            raise SystemExit("a bot did not start; see the logs")
+        time.sleep(0.05)
+
+    start = time.perf_counter()
+    population.start()
+    deadline = start + args.timeout
+    while not population.finished and time.perf_counter() < deadline:
+        if any(process.poll() is not None for process, _ in processes.values()):
+            print("a bot exited early; see the logs")
+            break
+        time.sleep(0.2)
+    elapsed = time.perf_counter() - start
+
+    memory = {bot: rss_mb(process.pid) for bot, (process, _) in processes.items()}
+    for process, log in processes.values():
+        process.send_signal(signal.SIGINT)
+    for process, log in processes.values():
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+    simulator.stop()
+
+    print(f"elapsed:           {elapsed:.1f} s{'' if population.finished else ' (timed out)'}")
+    for bot in bots:
+        latencies = population.latencies[bot]
+        current, peak = memory[bot]
+        unfinished = sum(1 for (b, chat_id), steps in population.scripts.items()
+                         if b == bot and (steps or (b, chat_id) in population.waiting))
+        print(f"[{bot}]")
+        print(f"  replies:         {len(latencies):,} ({len(latencies) / elapsed:.1f} msg/s), "
+              f"{population.errors[bot]} error replies, {population.extra[bot]} unsolicited, "
+              f"{unfinished} users unfinished")
+        print(f"  reply latency:   p50 {percentile(latencies, 0.5) * 1e3:.0f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1e3:.0f} ms, max {max(latencies, default=0) * 1e3:.0f} ms")
+        if current is not None:
+            print(f"  RSS:             {current:.1f} MB (peak {peak:.1f} MB)")
+    if "reminder" in bots:
+        lags = population.lags
+        print(f"[reminder firing]  {len(lags):,} fired, {len(population.expected)} missing, "
+              f"{population.late_reminders} unexpected")
+        print(f"  lag (virtual s): p50 {percentile(lags, 0.5):.1f}, p99 {percentile(lags, 0.99):.1f}, "
+              f"max {max(lags, default=0):.1f}")
+    print(f"upstream calls:    CBA {simulator.cba_calls}, CoinGecko {simulator.coingecko_calls}")
+
+
+if __name__ == "__main__":
+    main()
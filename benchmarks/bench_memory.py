@@ -0,0 +1,85 @@
+"""
+Memory per pending reminder and per chat: the old dict-of-datetimes layout
+(a reminder dict, plus user_states / user_timezones / user_temp_data entries
+per chat) vs. the records.Reminder and records.Session slots classes.
+
+    python benchmarks/bench_memory.py [record_count]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Reminder, Session  # noqa: E402
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+BASE = datetime(2025, 1, 1)
+BASE_EPOCH = 1_735_689_600
+TEXT = "Pay the electricity bill"
+
+
+def old_reminders():
+    return [
+        {
+            "reminder_id": i,
+            "chat_id": i,
+            "reminder_text": TEXT,
+            "final_utc": BASE + timedelta(seconds=i),
+            "original_local": BASE + timedelta(seconds=i, hours=4),
+            "option_chosen": 0,
+        }
+        for i in range(COUNT)
+    ]
+
+
+def new_reminders():
+    return [Reminder(i, TEXT, BASE_EPOCH + i, BASE_EPOCH + i + 4 * 3600, (0,), i) for i in range(COUNT)]
+
+
+def old_users():
+    states, timezones, temp = {}, {}, {}
+    for i in range(COUNT):
+        states[i] = 3
+        timezones[i] = (4, "Armenia")
+        temp[i] = {
+            "reminder_text": TEXT,
+            "reminder_datetime": BASE + timedelta(seconds=i),
+            "warning_issued": False,
+            "time_prompt_timestamp": BASE + timedelta(seconds=i),
+            "option_prompt_timestamp": None,
+        }
+    return states, timezones, temp
+
+
+def new_users():
+    sessions = {}
+    for i in range(COUNT):
+        session = sessions[i] = Session(3, 4, "Armenia")
+        session.reminder_text = TEXT
+        session.reminder_local = BASE_EPOCH + i
+        session.prompt_at = BASE_EPOCH + i
+    return sessions
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size / COUNT
+
+
+def main():
+    print(f"{COUNT:,} records")
+    for label, old, new in (("reminder", old_reminders, new_reminders), ("chat", old_users, new_users)):
+        before, after = measure(old), measure(new)
+        print(f"bytes per {label:<9} dict {before:>6.0f}   slots {after:>6.0f}   ({before / after:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
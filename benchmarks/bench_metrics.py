@@ -0,0 +1,78 @@
+"""
+Per-message cost of the instrumentation and cost of a /metrics scrape.
+
+Dispatches a stream of messages through a Router with and without handler
+timing, measures CallStats recording (what every YoAI/CBA/CoinGecko call
+adds) and renders a registry with the standard bot metrics.
+
+    python benchmarks/bench_metrics.py [messages]
+"""
+import os
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import CallStats, MetricsServer, Registry, register_router, register_upstream  # noqa: E402
+from router import Router  # noqa: E402
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+COMMANDS = ["help", "usd", "eur", "btc", "eth", "/start", "add x", "show", "hello there"]
+
+
+def make_router(timed):
+    router = Router(timed=timed)
+    for name in COMMANDS[:-3]:
+        router.add_command(name, lambda msg: msg.key)
+    router.prefix("add")(lambda msg: msg.args)
+    router.command("show")(lambda msg: None)
+    router.default(lambda msg: msg.text)
+    return router
+
+
+def bench_dispatch(router):
+    raws = [{"chatId": i % 1000} for i in range(len(COMMANDS))]
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        j = i % len(COMMANDS)
+        router.dispatch(raws[j], COMMANDS[j])
+    return (time.perf_counter() - start) / MESSAGES
+
+
+def main():
+    plain = bench_dispatch(make_router(False))
+    timed_router = make_router(True)
+    timed = bench_dispatch(timed_router)
+    print(f"dispatch, untimed:   {plain * 1e6:.2f} us/message")
+    print(f"dispatch, timed:     {timed * 1e6:.2f} us/message (+{(timed - plain) * 1e6:.2f} us)")
+
+    stats = CallStats()
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        stats.observe(0.012, "ok" if i % 50 else "429")
+    print(f"CallStats.observe:   {(time.perf_counter() - start) / MESSAGES * 1e6:.2f} us/call")
+
+    registry = Registry()
+    register_router(registry, timed_router)
+    for upstream in ("yoai", "cba", "coingecko"):
+        register_upstream(registry, upstream, "endpoint", stats)
+    for i in range(20):
+        registry.value("gauge", f"bot_gauge_{i}", "filler", lambda: 42)
+    start = time.perf_counter()
+    for _ in range(100):
+        text = registry.render()
+    print(f"render:              {(time.perf_counter() - start) / 100 * 1e3:.2f} ms "
+          f"({text.count(chr(10))} lines)")
+
+    server = MetricsServer(registry, port=0, host="127.0.0.1").start()
+    start = time.perf_counter()
+    for _ in range(20):
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            assert response.status == 200
+    print(f"HTTP scrape:         {(time.perf_counter() - start) / 20 * 1e3:.2f} ms")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
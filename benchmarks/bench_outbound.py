@@ -0,0 +1,89 @@
+"""
+Fan-out through the OutboundQueue against a local stub YoAI server that
+answers a share of requests with 429: delivered messages per second, peak
+queue depth and send latency, once with the limits out of the way and once
+with a global limit to check that it is honoured.
+
+    python benchmarks/bench_outbound.py [message_count] [chat_count]
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbound import OutboundQueue  # noqa: E402
+from yoai_client import YoAIClient  # noqa: E402
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+CHATS = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+THROTTLED_SHARE = 0.05
+OK_BODY = json.dumps({"success": True}).encode()
+LIMIT_BODY = json.dumps({"success": False, "error": "Too Many Requests"}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body in one write (see bench_yoai_client.py)
+    wbufsize = -1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        throttled = random.random() < THROTTLED_SHARE
+        body = LIMIT_BODY if throttled else OK_BODY
+        self.send_response(429 if throttled else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(histogram, share):
+    snapshot = histogram.snapshot()
+    target = share * snapshot["count"]
+    for bound, cumulative in snapshot["buckets"]:
+        if cumulative >= target:
+            return bound
+    return float("inf")
+
+
+def run(label, client, count, **limits):
+    queue = OutboundQueue(client.deliver, max_pending=count, **limits).start()
+    peak = 0
+    start = time.perf_counter()
+    for i in range(count):
+        queue.submit(i % CHATS, f"message {i}")
+        peak = max(peak, queue.depth)
+    queue.stop()
+    elapsed = time.perf_counter() - start
+    stats = queue.stats()
+    print(f"{label:<26} {stats['sent'] / elapsed:>8,.0f} msg/s  peak depth {peak:>6}  "
+          f"retried {stats['retried']:>5}  failed {stats['failed']:>3}  "
+          f"send p50<={percentile(queue.send_latency, 0.5) * 1000:g}ms "
+          f"p99<={percentile(queue.send_latency, 0.99) * 1000:g}ms")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = YoAIClient("bench", base_url=f"http://127.0.0.1:{server.server_port}")
+
+    run("unthrottled", client, COUNT, global_rate=1e9, global_burst=1000,
+        chat_rate=1e9, chat_burst=1000)
+    limited = min(COUNT, 1000)
+    run("global 200/s", client, limited, global_rate=200, global_burst=20,
+        chat_rate=1e9, chat_burst=1000)
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Query latency of the memory-mapped rate history (ratehistory.RateHistory).
+
+Builds a file with YEARS of daily tables for CURRENCIES currencies (a
+random walk, weekdays only, like CBA), reopens it and times point lookups
+and range aggregates of increasing length. Reports whether NumPy or the
+plain-Python fallback did the aggregation.
+
+    python benchmarks/bench_ratehistory.py [years] [currencies]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ratehistory  # noqa: E402
+from ratehistory import RateHistory  # noqa: E402
+
+YEARS = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+CURRENCIES = int(sys.argv[2]) if len(sys.argv) > 2 else 45
+ROUNDS = 2000
+
+
+def build(path):
+    rnd = random.Random(3)
+    isos = ["USD", "EUR"] + [f"C{i:02d}" for i in range(CURRENCIES - 2)]
+    rates = {iso: rnd.uniform(1, 500) for iso in isos}
+    first = date(1996, 1, 1)
+    history = RateHistory(path, first_day=first)
+    start = time.perf_counter()
+    days = 0
+    for n in range(YEARS * 365):
+        day = first + timedelta(days=n)
+        if day.weekday() >= 5:
+            continue
+        for iso in isos:
+            rates[iso] *= 1 + rnd.uniform(-0.004, 0.004)
+        history.record(day, rates)
+        days += 1
+    history.flush()
+    elapsed = time.perf_counter() - start
+    end = history.last_day
+    history.close()
+    print(f"history:          {YEARS} years x {CURRENCIES} currencies ({days:,} tables) "
+          f"recorded in {elapsed:.2f} s")
+    return end
+
+
+def bench(label, func):
+    func()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    print(f"{label:<17} {(time.perf_counter() - start) / ROUNDS * 1e6:8.1f} us")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rates.history")
+        end = build(path)
+        print(f"file:             {os.path.getsize(path) / 1e6:.1f} MB apparent, "
+              f"{os.stat(path).st_blocks * 512 / 1e6:.1f} MB on disk")
+        start = time.perf_counter()
+        history = RateHistory(path)
+        print(f"open:             {(time.perf_counter() - start) * 1e3:.2f} ms")
+        print(f"aggregation:      {'numpy ' + ratehistory.np.__version__ if ratehistory.np else 'plain Python'}")
+
+        bench("rate on a day", lambda: history.rate_on("USD", end - timedelta(days=1234)))
+        for days in (7, 30, 365, 3650, YEARS * 365):
+            bench(f"stats {days}d", lambda days=days: history.stats("EUR", end - timedelta(days=days - 1), end))
+        bench("change 7d", lambda: history.change("USD", end - timedelta(days=7), end))
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Scheduler throughput with a mix of one-shot and recurring reminders.
+
+A virtual clock advances one minute per tick over a simulated day. Due
+reminders are popped; recurring ones are moved to their next occurrence
+(recurrence.next_event) and pushed back, the way reminder.send_reminders
+does. The heap never holds more than one entry per reminder, however
+often a rule repeats.
+
+    python benchmarks/bench_recurrence.py [pending_count] [recurring_share]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Reminder  # noqa: E402
+from recurrence import next_event  # noqa: E402
+from scheduler import ReminderScheduler  # noqa: E402
+
+PENDING = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+RECURRING_SHARE = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+START = 1_735_689_600  # 2025-01-01 00:00 UTC
+TICK = 60
+TICKS = 24 * 60
+RULES = ["daily", "weekly", "monthly:15", "yearly:06-01", "every:900", "every:3600", "every:14400"]
+ZONES = ["Asia/Yerevan", "Europe/Berlin", "America/New_York", "+05:30"]
+
+
+def make_reminders(rnd):
+    items = []
+    for i in range(PENDING):
+        due = START + rnd.randrange(2 * TICKS * TICK)
+        rule = rnd.choice(RULES) if rnd.random() < RECURRING_SHARE else None
+        items.append(Reminder(i, "text", due, due, (4,), reminder_id=i + 1, rule=rule))
+    return items
+
+
+def main():
+    rnd = random.Random(11)
+    zone_of = {i: rnd.choice(ZONES) for i in range(PENDING)}
+    scheduler = ReminderScheduler()
+    start = time.perf_counter()
+    scheduler.load(make_reminders(rnd))
+    print(f"pending reminders:   {PENDING:,} ({RECURRING_SHARE:.0%} recurring)")
+    print(f"load:                {time.perf_counter() - start:.2f} s")
+
+    fired = rescheduled = 0
+    start = time.perf_counter()
+    for tick in range(1, TICKS + 1):
+        now = START + tick * TICK
+        for r, _, _ in scheduler.pop_due(now):
+            fired += 1
+            if r.rule is not None:
+                r.original_local = next_event(r.rule, r.original_local, zone_of[r.chat_id], now)
+                r.final_utc = r.original_local
+                scheduler.push(r)
+                rescheduled += 1
+    elapsed = time.perf_counter() - start
+    print(f"simulated day:       {fired:,} fired, {rescheduled:,} rescheduled in {elapsed:.2f} s")
+    print(f"per fired reminder:  {elapsed / max(fired, 1) * 1e6:.2f} us")
+    print(f"pending afterwards:  {len(scheduler):,} (heap entries {len(scheduler._heap):,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Messages per second through the command Router vs. the old if/elif chain
+that re-computed text.lower()/text.upper() in every branch.
+
+    python benchmarks/bench_router.py [message_count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router import Router  # noqa: E402
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+TEXTS = ["/start", "help", "USD", "eur", "BTC", "eth", "doge", "ftn", "add Ann on 2000-01-01", "hello there"]
+
+
+def if_elif(raw, text):
+    sender = raw.get("sender", {})
+    sender_name = f"{sender.get('firstName', '')} {sender.get('lastName', '')}".strip()
+    if text.lower() == "/start":
+        return "start"
+    elif text.lower() == "help":
+        return "help"
+    elif text.upper() in ["USD", "EUR"]:
+        return "fiat"
+    elif text.upper() in ["BTC", "ETH", "DOGE", "FTN"]:
+        crypto_id_map = {"BTC": "bitcoin", "ETH": "ethereum", "DOGE": "dogecoin", "FTN": "Fasttoken"}
+        return crypto_id_map[text.upper()]
+    elif text.lower().startswith("add "):
+        return "add"
+    return "unknown"
+
+
+def build_router(timed):
+    router = Router(timed=timed)
+
+    def start(msg):
+        return "start"
+
+    def help(msg):
+        return "help"
+
+    def fiat(msg):
+        return "fiat"
+
+    def crypto(msg):
+        return msg.key
+
+    def add(msg):
+        return "add"
+
+    def unknown(msg):
+        return "unknown"
+
+    router.command("/start")(start)
+    router.command("help")(help)
+    router.command("USD", "EUR")(fiat)
+    router.command("BTC", "ETH", "DOGE", "FTN")(crypto)
+    router.prefix("add")(add)
+    router.default(unknown)
+    return router
+
+
+def main():
+    rnd = random.Random(3)
+    texts = [rnd.choice(TEXTS) for _ in range(COUNT)]
+    messages = [{"chatId": i % 1000, "sender": {}} for i in range(COUNT)]
+
+    start = time.perf_counter()
+    for raw, text in zip(messages, texts):
+        if_elif(raw, text)
+    elapsed = time.perf_counter() - start
+    print(f"if/elif chain:          {COUNT / elapsed:>12,.0f} msg/s")
+
+    for timed in (False, True):
+        router = build_router(timed)
+        start = time.perf_counter()
+        for raw, text in zip(messages, texts):
+            router.dispatch(raw, text)
+        elapsed = time.perf_counter() - start
+        label = "Router (histograms)" if timed else "Router"
+        print(f"{label + ':':<24}{COUNT / elapsed:>12,.0f} msg/s")
+
+    for name, histogram in router.timings.items():
+        snap = histogram.snapshot()
+        print(f"  {name:<10} count={snap['count']:>7}  mean={snap['sum'] / max(1, snap['count']) * 1e9:6.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
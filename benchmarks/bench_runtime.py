@@ -0,0 +1,101 @@
+"""
+Reply latency of the old synchronous poll loop vs. BotRuntime under a local
+load generator. A fraction of the messages simulate a slow upstream call
+(CBA SOAP / CoinGecko); in the sync loop they delay everyone behind them.
+
+    python benchmarks/bench_runtime.py [duration_seconds] [messages_per_second]
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from runtime import BotRuntime  # noqa: E402
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+RATE = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+SLOW_FRACTION = 0.05
+SLOW_SECONDS = 0.5
+SYNC_POLL_INTERVAL = 5.0
+ASYNC_POLL_INTERVAL = 0.01
+
+
+class LoadGenerator:
+    def __init__(self):
+        self.inbox = deque()
+        self.latencies = []
+        self.expected = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        rnd = random.Random(1)
+        self.expected = int(DURATION * RATE)
+
+        def produce():
+            for i in range(self.expected):
+                self.inbox.append({
+                    "chatId": rnd.randrange(1000),
+                    "sent": time.perf_counter(),
+                    "slow": rnd.random() < SLOW_FRACTION,
+                })
+                time.sleep(1.0 / RATE)
+
+        threading.Thread(target=produce, daemon=True).start()
+
+    def fetch(self):
+        updates = []
+        while self.inbox:
+            updates.append(self.inbox.popleft())
+        return updates
+
+    def handle(self, message):
+        if message["slow"]:
+            time.sleep(SLOW_SECONDS)
+        with self.lock:
+            self.latencies.append(time.perf_counter() - message["sent"])
+
+    def done(self):
+        return len(self.latencies) >= self.expected
+
+    def report(self, label):
+        lat = sorted(self.latencies)
+        p50 = lat[len(lat) // 2]
+        p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+        print(f"{label:<12} messages={len(lat):>6}  p50={p50 * 1e3:8.1f} ms  p99={p99 * 1e3:8.1f} ms")
+
+
+def run_sync():
+    gen = LoadGenerator()
+    gen.start()
+    while not gen.done():
+        for message in gen.fetch():
+            gen.handle(message)
+        time.sleep(SYNC_POLL_INTERVAL)
+    gen.report("sync loop")
+
+
+def run_async():
+    gen = LoadGenerator()
+    runtime = BotRuntime(gen.fetch, gen.handle, handlers_in_threads=True,
+                         poll_idle_interval=ASYNC_POLL_INTERVAL)
+
+    async def main():
+        task = asyncio.ensure_future(runtime.main())
+        gen.start()
+        while not gen.done():
+            await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(main())
+    gen.report("BotRuntime")
+
+
+if __name__ == "__main__":
+    print(f"{RATE:.0f} msg/s for {DURATION:.0f} s, {SLOW_FRACTION:.0%} slow ({SLOW_SECONDS * 1e3:.0f} ms)")
+    run_sync()
+    run_async()
@@ -0,0 +1,102 @@
+"""
+Tick cost of the reminder scheduler with a large number of pending reminders.
+
+Compares the heap-backed ReminderScheduler against the old linear scan over a
+list (copy + remove), then measures reminders with several lead-time
+triggers: cancelling one invalidates all of its triggers at once, and the
+stale triggers cost nothing until they surface. Run from the repository root:
+
+    python benchmarks/bench_scheduler.py [pending_count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Reminder  # noqa: E402
+from scheduler import ReminderScheduler  # noqa: E402
+
+PENDING = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+DUE_PER_TICK = 100
+TICKS = 50
+
+
+def make_reminders(now, count):
+    rnd = random.Random(42)
+    return [
+        Reminder(i, "text", now + rnd.randint(3600, 30 * 86400))
+        for i in range(count)
+    ]
+
+
+def linear_tick(reminders, now):
+    fired = 0
+    for r in reminders[:]:
+        if now >= r.final_utc:
+            reminders.remove(r)
+            fired += 1
+    return fired
+
+
+def main():
+    now = 1_735_689_600  # 2025-01-01 UTC
+    items = make_reminders(now, PENDING)
+
+    scheduler = ReminderScheduler()
+    start = time.perf_counter()
+    for r in items:
+        scheduler.push(r)
+    push_s = time.perf_counter() - start
+    print(f"pending reminders:       {PENDING:,}")
+    print(f"heap push:               {push_s / PENDING * 1e6:.2f} us/reminder")
+
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        scheduler.next_deadline()
+        scheduler.pop_due(now)
+    idle_s = (time.perf_counter() - start) / TICKS
+    print(f"heap idle tick:          {idle_s * 1e6:.2f} us")
+
+    # Push DUE_PER_TICK already-due reminders before each tick
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        for i in range(DUE_PER_TICK):
+            scheduler.push(Reminder(i, "due", now))
+        fired = scheduler.pop_due(now)
+        assert len(fired) == DUE_PER_TICK
+    busy_s = (time.perf_counter() - start) / TICKS
+    print(f"heap tick ({DUE_PER_TICK} due):     {busy_s * 1e3:.3f} ms")
+
+    # The old list scan is O(n) per tick even when nothing is due
+    linear = list(items)
+    start = time.perf_counter()
+    linear_tick(linear, now)
+    linear_s = time.perf_counter() - start
+    print(f"linear idle tick:        {linear_s * 1e3:.1f} ms")
+
+    # Three triggers per reminder (3h before, 1h before, at the time)
+    multi = ReminderScheduler()
+    start = time.perf_counter()
+    for r in items:
+        multi.push(r, (r.final_utc - 3 * 3600, r.final_utc - 3600, r.final_utc))
+    multi_push_s = time.perf_counter() - start
+    print(f"push with 3 triggers:    {multi_push_s / PENDING * 1e6:.2f} us/reminder "
+          f"({len(multi._heap):,} triggers, {len(multi):,} records)")
+
+    start = time.perf_counter()
+    for r in items[::2]:
+        multi.cancel(r.reminder_id)
+    cancel_s = time.perf_counter() - start
+    print(f"cancel:                  {cancel_s / len(items[::2]) * 1e6:.2f} us/reminder")
+
+    start = time.perf_counter()
+    fired = multi.pop_due(now + 31 * 86400)
+    drain_s = time.perf_counter() - start
+    assert len(fired) == 3 * (PENDING - len(items[::2]))
+    print(f"drain after cancel:      {drain_s:.2f} s for {len(fired):,} live triggers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Throughput of the sharded reminder bot with 1, 2, 4, ... worker processes.
+An in-process ingest routes synthetic updates (the full /start -> time zone
+-> text -> date -> option flow per chat) through ShardedIngest. Each shard
+runs reminder.py's real handlers against its own temporary database, with
+replies counted instead of sent. Scaling is bounded by the number of cores.
+
+    python benchmarks/bench_sharding.py [chat_count] [max_shards]
+"""
+import base64
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shard import ShardInbox, ShardedIngest, shard_db_path  # noqa: E402
+
+CHATS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+MAX_SHARDS = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+BATCH = 500
+SCRIPT = ["/start", "+4 Armenia", "Pay the rent", "2030-01-01 10:00", "2"]
+
+
+def bench_worker(shard, shards, inbox, acks, db_dir):
+    os.environ["BOT_DB_PATH"] = os.path.join(db_dir, "unused.db")
+    import reminder
+    from storage import Store
+
+    reminder.store = Store(shard_db_path(os.path.join(db_dir, "bench.db"), shard, shards))
+    reminder.update_tracker = ShardInbox(inbox, acks)
+    reminder.send_message = lambda chat_id, text: None
+    while True:
+        try:
+            updates = reminder.update_tracker.fetch()
+        except SystemExit:
+            return
+        for update in updates:
+            reminder.handle_update(update)
+        reminder.store.commit()
+        reminder.update_tracker.flush_acks()
+
+
+def updates():
+    texts = [base64.b64encode(text.encode()).decode() for text in SCRIPT]
+    update_id = 0
+    for text in texts:
+        for chat_id in range(CHATS):
+            update_id += 1
+            yield {"updateId": update_id, "chatId": chat_id, "text": text,
+                   "sender": {"firstName": "Bench"}}
+
+
+def run(shards):
+    with tempfile.TemporaryDirectory() as db_dir:
+        ingest = ShardedIngest(shards, bench_worker, args=(db_dir,)).start()
+        # Let the workers finish importing before the clock starts
+        ingest.route([{"chatId": -shard - 1, "text": ""} for shard in range(shards)])
+        while ingest.acked < shards:
+            ingest.collect_acks(timeout=1)
+        total = CHATS * len(SCRIPT)
+        start = time.perf_counter()
+        batch = []
+        for update in updates():
+            batch.append(update)
+            if len(batch) == BATCH:
+                ingest.route(batch)
+                batch = []
+                ingest.collect_acks()
+        ingest.route(batch)
+        while ingest.acked < total + shards:
+            ingest.collect_acks(timeout=1)
+        elapsed = time.perf_counter() - start
+        ingest.stop()
+    return total / elapsed
+
+
+def main():
+    print(f"{CHATS} chats x {len(SCRIPT)} messages, {os.cpu_count()} CPU(s)")
+    baseline = None
+    shards = 1
+    while shards <= MAX_SHARDS:
+        rate = run(shards)
+        baseline = baseline or rate
+        print(f"{shards:>3} shard(s) {rate:>10,.0f} msg/s  x{rate / baseline:.2f}")
+        shards *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Startup time of bot.py: interpreter start -> module imported -> first reply
+queued. Each run is a fresh interpreter so results can be tracked across
+releases.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import base64
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+# Runs inside the child interpreter; prints timings as JSON
+CHILD = """
+import json, time
+start = time.perf_counter()
+import bot
+imported = time.perf_counter()
+first_reply = []
+bot.outbound.submit = lambda chat_id, text, *args, **kwargs: first_reply.append(time.perf_counter())
+bot.handle_message({"chatId": "bench", "text": %r, "sender": {}})
+print(json.dumps({"import_ms": (imported - start) * 1e3, "first_reply_ms": (first_reply[0] - start) * 1e3}))
+""" % base64.b64encode(b"help").decode()
+
+
+def main():
+    results = []
+    for _ in range(RUNS):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    for key in ("import_ms", "first_reply_ms"):
+        values = sorted(r[key] for r in results)
+        print(f"{key:<16} median={values[len(values) // 2]:8.1f}  min={values[0]:8.1f}  max={values[-1]:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Write throughput and startup recovery time of the SQLite reminder store.
+
+Recovery is measured on the real startup path, reminder.load_state(), which
+loads the users and the reminders due within the load horizon; loading every
+stored reminder into the scheduler is shown for comparison, as is the cost
+of advancing the horizon by one step.
+
+    python benchmarks/bench_storage.py [reminder_count]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# reminder.py opens its store when it is imported; point it at the benchmark's file
+DB_DIR = tempfile.mkdtemp(prefix="bench_storage_")
+os.environ["BOT_DB_PATH"] = os.path.join(DB_DIR, "bench.db")
+
+from records import Reminder, Session  # noqa: E402
+from scheduler import ReminderScheduler  # noqa: E402
+from storage import Store  # noqa: E402
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+CHATS = 50_000
+ZONES = ("UTC", "+04:00", "Asia/Yerevan", "Europe/Berlin", "America/New_York")
+OPTION_SETS = ((0,), (1,), (2,), (4,), (2, 4), (1, 3, 4))
+
+
+def main():
+    rnd = random.Random(7)
+    now = 1_735_689_600  # 2025-01-01 UTC
+    try:
+        store = Store(os.environ["BOT_DB_PATH"])
+
+        start = time.perf_counter()
+        for i in range(COUNT):
+            event = now + rnd.randint(60, 90 * 86400)
+            options = rnd.choice(OPTION_SETS)
+            store.add_reminder(Reminder(
+                f"chat-{i % CHATS}",
+                "Pay the electricity bill",
+                event - 3 * 3600 if 2 in options else event - 900,
+                event,
+                options,
+            ))
+        store.commit()
+        write_s = time.perf_counter() - start
+        print(f"reminders written:   {COUNT:,}")
+        print(f"write throughput:    {COUNT / write_s:,.0f} reminders/s")
+
+        start = time.perf_counter()
+        for i in range(CHATS):
+            store.save_user(f"chat-{i}", Session(2, ZONES[i % len(ZONES)], "Somewhere"))
+        store.commit()
+        print(f"user upserts:        {CHATS / (time.perf_counter() - start):,.0f} users/s")
+        store.close()
+
+        # Simulate a restart: a fresh process opens the file and runs load_state()
+        start = time.perf_counter()
+        import reminder
+        reminder.clock = lambda: now
+        reminder.load_state()
+        recovery_s = time.perf_counter() - start
+        print(f"recovery:            {recovery_s:.2f} s (load_state: {len(reminder.sessions):,} users, "
+              f"{len(reminder.reminders):,} reminders due within "
+              f"{reminder.LOAD_HORIZON // 3600} h)")
+
+        start = time.perf_counter()
+        reminder.clock = lambda: now + reminder.LOAD_STEP
+        reminder.load_upcoming()
+        print(f"horizon step:        {(time.perf_counter() - start) * 1e3:.1f} ms "
+              f"({len(reminder.reminders):,} reminders scheduled)")
+
+        start = time.perf_counter()
+        scheduler = ReminderScheduler()
+        scheduler.load(reminder.store.load_reminders())
+        print(f"full load:           {time.perf_counter() - start:.2f} s ({len(scheduler):,} reminders)")
+
+        start = time.perf_counter()
+        due = reminder.store.due_reminders(now + 3600)
+        print(f"due-index query:     {(time.perf_counter() - start) * 1e3:.2f} ms ({len(due)} rows)")
+        reminder.store.close()
+    finally:
+        shutil.rmtree(DB_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Converting a batch of due reminders to local display time: one
+datetime.fromtimestamp(ts, ZoneInfo(key)) per reminder vs. the cached zones
+and quarter-hour offset buckets of timezones.localize_batch.
+
+    python benchmarks/bench_timezones.py [batch_size]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timezones import localize_batch, utc_to_local  # noqa: E402
+
+BATCH = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+ZONES = ["Asia/Yerevan", "Europe/Berlin", "America/New_York", "Asia/Kolkata", "+05:30", "+04:00", "UTC"]
+TICK = 1_735_689_600
+
+
+def main():
+    rnd = random.Random(3)
+    # Reminders due in one tick: the same few seconds, many zones
+    timestamps = [TICK + rnd.randrange(5) for _ in range(BATCH)]
+    keys = [rnd.choice(ZONES) for _ in range(BATCH)]
+
+    start = time.perf_counter()
+    naive = [
+        datetime.fromtimestamp(ts, ZoneInfo(key) if key[0] not in "+-" else None)
+        for ts, key in zip(timestamps, keys)
+    ]
+    naive_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_item = [utc_to_local(ts, key) for ts, key in zip(timestamps, keys)]
+    cached_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = localize_batch(timestamps, keys)
+    batch_s = time.perf_counter() - start
+    assert batch == per_item and len(naive) == BATCH
+
+    print(f"batch of {BATCH:,} due reminders, {len(ZONES)} zones")
+    print(f"ZoneInfo per item:       {naive_s / BATCH * 1e6:.2f} us/reminder")
+    print(f"cached zone per item:    {cached_s / BATCH * 1e6:.2f} us/reminder")
+    print(f"localize_batch:          {batch_s / BATCH * 1e6:.2f} us/reminder")
+
+
+if __name__ == "__main__":
+    main()
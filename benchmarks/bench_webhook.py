@@ -0,0 +1,122 @@
+"""
+End-to-end latency and CPU per message: polling getUpdates against a local
+stub YoAI server vs. updates pushed to the WebhookServer.
+
+The load generator and stub server run in the same process, so CPU per
+message includes their share (in webhook mode that is one HTTP POST per
+message on the client side).
+
+    python benchmarks/bench_webhook.py [duration_seconds] [messages_per_second]
+"""
+import asyncio
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from runtime import POLL_IDLE_INTERVAL, BotRuntime  # noqa: E402
+from webhook import WebhookServer  # noqa: E402
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+RATE = float(sys.argv[2]) if len(sys.argv) > 2 else 200.0
+WEBHOOK_PORT = 18080
+
+pending = []
+pending_lock = threading.Lock()
+
+
+class StubYoAI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body in one write (see bench_yoai_client.py)
+    wbufsize = -1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with pending_lock:
+            data = list(pending)
+            pending.clear()
+        body = json.dumps({"success": True, "data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_fetch(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+
+    def fetch():
+        conn.request("POST", "/getUpdates", body=b"{}", headers={"Content-Type": "application/json"})
+        return json.loads(conn.getresponse().read())["data"]
+
+    return fetch
+
+
+def produce(push):
+    count = int(DURATION * RATE)
+    for i in range(count):
+        push({"chatId": i % 500, "id": i, "text": "aGk=", "sent": time.time()})
+        time.sleep(1.0 / RATE)
+    return count
+
+
+def run(mode):
+    latencies = []
+    expected = int(DURATION * RATE)
+
+    def handle(message):
+        latencies.append(time.time() - message["sent"])
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubYoAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    webhook = WebhookServer(host="127.0.0.1", port=WEBHOOK_PORT) if mode == "webhook" else None
+    runtime = BotRuntime(make_fetch(server.server_port), handle, webhook=webhook)
+
+    if mode == "webhook":
+        conn = http.client.HTTPConnection("127.0.0.1", WEBHOOK_PORT)
+
+        def push(update):
+            conn.request("POST", "/webhook", body=json.dumps(update), headers={"Content-Type": "application/json"})
+            conn.getresponse().read()
+    else:
+        def push(update):
+            with pending_lock:
+                pending.append(update)
+
+    async def main():
+        task = asyncio.ensure_future(runtime.main())
+        await asyncio.sleep(0.2)
+        cpu_start = time.process_time()
+        producer = threading.Thread(target=produce, args=(push,))
+        producer.start()
+        while len(latencies) < expected:
+            await asyncio.sleep(0.05)
+        cpu = time.process_time() - cpu_start
+        producer.join()
+        if mode == "webhook":
+            conn.close()
+            await asyncio.sleep(0.1)
+        task.cancel()
+        return cpu
+
+    cpu = asyncio.run(main())
+    server.shutdown()
+    lat = sorted(latencies)
+    p50 = lat[len(lat) // 2]
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+    print(f"{mode:<8} messages={len(lat):>6}  p50={p50 * 1e3:8.2f} ms  p99={p99 * 1e3:8.2f} ms  "
+          f"cpu/msg={cpu / len(lat) * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    print(f"{RATE:.0f} msg/s for {DURATION:.0f} s (poll idle interval {POLL_IDLE_INTERVAL} s)")
+    run("polling")
+    run("webhook")
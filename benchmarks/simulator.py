@@ -0,0 +1,329 @@
+"""
+Local stand-ins for the services the bots talk to, for load tests.
+
+One HTTP server answers, per bot API key:
+
+    POST /api/pub/getUpdates     queued user messages (base64 text), from `offset`
+    POST /api/pub/sendMessage    records the bot's reply
+    POST /api/pub/setWebhook     accepted and ignored
+    GET  /cba?wsdl, POST /cba    CBA ExchangeRatesByDate (SOAP 1.1, document/literal)
+    GET  /coingecko/api/v3/simple/price?ids=...&vs_currencies=amd
+
+Point the bots at it with YOAI_BASE_URL, CBA_WSDL_URL and COINGECKO_API
+(see Simulator.bot_env). Run it on its own to poke at a bot by hand:
+
+    python benchmarks/simulator.py [port]
+"""
+import base64
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Fake rates (AMD per unit)
+FIAT_RATES = {"USD": "387.52", "EUR": "421.08", "RUB": "4.31", "GBP": "492.77"}
+CRYPTO_PRICES = {"bitcoin": 38_912_450.0, "ethereum": 1_402_310.0, "dogecoin": 61.2, "Fasttoken": 1_052.4}
+
+# getUpdates returns at most this many updates per call
+UPDATES_LIMIT = 100
+
+# The requested day in an ExchangeRatesByDate call (any namespace prefix)
+CBA_DATE_RE = re.compile(r"<(?:[\w-]+:)?date>(\d{4}-\d{2}-\d{2})")
+
+CBA_WSDL = """<?xml version="1.0" encoding="utf-8"?>
+<wsdl:definitions xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/" xmlns:s="http://www.w3.org/2001/XMLSchema"
+    xmlns:tns="http://www.cba.am/" xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" targetNamespace="http://www.cba.am/">
+  <wsdl:types>
+    <s:schema elementFormDefault="qualified" targetNamespace="http://www.cba.am/">
+      <s:element name="ExchangeRatesByDate">
+        <s:complexType><s:sequence>
+          <s:element minOccurs="1" maxOccurs="1" name="date" type="s:dateTime"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:element name="ExchangeRatesByDateResponse">
+        <s:complexType><s:sequence>
+          <s:element minOccurs="0" maxOccurs="1" name="ExchangeRatesByDateResult" type="tns:ExchangeRates"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:complexType name="ExchangeRates">
+        <s:sequence>
+          <s:element minOccurs="1" maxOccurs="1" name="CurrentDate" type="s:dateTime"/>
+          <s:element minOccurs="1" maxOccurs="1" name="PreviousDate" type="s:dateTime"/>
+          <s:element minOccurs="0" maxOccurs="1" name="Rates" type="tns:ArrayOfExchangeRate"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="ArrayOfExchangeRate">
+        <s:sequence>
+          <s:element minOccurs="0" maxOccurs="unbounded" name="ExchangeRate" type="tns:ExchangeRate"/>
+        </s:sequence>
+      </s:complexType>
+      <s:complexType name="ExchangeRate">
+        <s:sequence>
+          <s:element minOccurs="0" maxOccurs="1" name="ISO" type="s:string"/>
+          <s:element minOccurs="1" maxOccurs="1" name="Amount" type="s:decimal"/>
+          <s:element minOccurs="1" maxOccurs="1" name="Rate" type="s:decimal"/>
+          <s:element minOccurs="1" maxOccurs="1" name="Difference" type="s:decimal"/>
+        </s:sequence>
+      </s:complexType>
+    </s:schema>
+  </wsdl:types>
+  <wsdl:message name="ExchangeRatesByDateSoapIn">
+    <wsdl:part name="parameters" element="tns:ExchangeRatesByDate"/>
+  </wsdl:message>
+  <wsdl:message name="ExchangeRatesByDateSoapOut">
+    <wsdl:part name="parameters" element="tns:ExchangeRatesByDateResponse"/>
+  </wsdl:message>
+  <wsdl:portType name="ExchangeRatesSoap">
+    <wsdl:operation name="ExchangeRatesByDate">
+      <wsdl:input message="tns:ExchangeRatesByDateSoapIn"/>
+      <wsdl:output message="tns:ExchangeRatesByDateSoapOut"/>
+    </wsdl:operation>
+  </wsdl:portType>
+  <wsdl:binding name="ExchangeRatesSoap" type="tns:ExchangeRatesSoap">
+    <soap:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+    <wsdl:operation name="ExchangeRatesByDate">
+      <soap:operation soapAction="http://www.cba.am/ExchangeRatesByDate" style="document"/>
+      <wsdl:input><soap:body use="literal"/></wsdl:input>
+      <wsdl:output><soap:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+  </wsdl:binding>
+  <wsdl:service name="ExchangeRates">
+    <wsdl:port name="ExchangeRatesSoap" binding="tns:ExchangeRatesSoap">
+      <soap:address location="{location}"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+"""
+
+CBA_RESPONSE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>
+<ExchangeRatesByDateResponse xmlns="http://www.cba.am/"><ExchangeRatesByDateResult>
+<CurrentDate>{date}T00:00:00</CurrentDate><PreviousDate>{date}T00:00:00</PreviousDate><Rates>{rates}</Rates>
+</ExchangeRatesByDateResult></ExchangeRatesByDateResponse>
+</soap:Body></soap:Envelope>
+"""
+
+CBA_RATE = "<ExchangeRate><ISO>{iso}</ISO><Amount>1</Amount><Rate>{rate}</Rate><Difference>0</Difference></ExchangeRate>"
+
+
+class VirtualClock:
+    """
+    Epoch time that starts at `start` and runs `speed` times faster than the
+    wall clock from the real instant `anchor`. Processes given the same three
+    numbers (see env()) agree on the virtual time without talking to each other.
+    """
+
+    def __init__(self, start=None, speed=1.0, anchor=None):
+        self.anchor = time.time() if anchor is None else anchor
+        self.start = self.anchor if start is None else start
+        self.speed = speed
+        self._real = time.time
+
+    def __call__(self):
+        return self.start + (self._real() - self.anchor) * self.speed
+
+    def env(self):
+        return {"SIM_CLOCK_START": repr(self.start), "SIM_CLOCK_SPEED": repr(self.speed),
+                "SIM_CLOCK_ANCHOR": repr(self.anchor)}
+
+    @classmethod
+    def from_env(cls, environ):
+        if "SIM_CLOCK_START" not in environ:
+            return None
+        return cls(float(environ["SIM_CLOCK_START"]), float(environ["SIM_CLOCK_SPEED"]),
+                   float(environ["SIM_CLOCK_ANCHOR"]))
+
+
+class Channel:
+    """getUpdates queue and sendMessage log of one bot (one API key)."""
+
+    def __init__(self):
+        self.updates = []
+        self.next_id = 1
+        self.polls = 0
+        self.sent = 0
+
+    def push(self, chat_id, text, first_name="Sim"):
+        update = {
+            "updateId": self.next_id,
+            "chatId": chat_id,
+            "text": base64.b64encode(text.encode()).decode(),
+            "sender": {"firstName": first_name, "lastName": str(chat_id)},
+        }
+        self.next_id += 1
+        self.updates.append(update)
+        return update["updateId"]
+
+    def fetch(self, offset):
+        """Updates from `offset` on; older ones count as confirmed and are dropped."""
+        self.polls += 1
+        if offset is not None:
+            drop = 0
+            while drop < len(self.updates) and self.updates[drop]["updateId"] < offset:
+                drop += 1
+            del self.updates[:drop]
+        return self.updates[:UPDATES_LIMIT]
+
+
+class Simulator:
+    """
+    Fake YoAI, CBA and CoinGecko behind one ThreadingHTTPServer.
+
+    on_send(bot, chat_id, text) is called for every sendMessage (from the
+    server threads, under the simulator lock). `send_latency` delays each
+    sendMessage answer and `throttle` is the share of sendMessage calls
+    answered with 429.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, on_send=None, send_latency=0.0, throttle=0.0, seed=1):
+        self.on_send = on_send
+        self.send_latency = send_latency
+        self.throttle = throttle
+        self.channels = {}
+        self.keys = {}
+        self.lock = threading.Lock()
+        self.cba_calls = 0
+        self.coingecko_calls = 0
+        self._random = random.Random(seed)
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body leave in one write; written separately on a
+            # keep-alive connection, Nagle and delayed ACKs add ~40 ms per call
+            wbufsize = -1
+
+            def do_GET(self):
+                simulator._handle(self, "GET")
+
+            def do_POST(self):
+                simulator._handle(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    # ----- Setup -----
+    def add_bot(self, name, api_key=None):
+        """Register a bot; returns its API key."""
+        api_key = api_key or f"sim-{name}"
+        self.keys[api_key] = name
+        self.channels[name] = Channel()
+        return api_key
+
+    def bot_env(self, name):
+        """Environment that points a bot process at this simulator."""
+        api_key = next(key for key, bot in self.keys.items() if bot == name)
+        return {
+            "YOAI_API_KEY": api_key,
+            "YOAI_BASE_URL": f"{self.url}/api/pub",
+            "CBA_WSDL_URL": f"{self.url}/cba?wsdl",
+            "COINGECKO_API": f"{self.url}/coingecko/api/v3/simple/price",
+        }
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="simulator", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def push(self, bot, chat_id, text):
+        """Queue a user message for a bot's next getUpdates."""
+        with self.lock:
+            return self.channels[bot].push(chat_id, text)
+
+    # ----- HTTP -----
+    def _handle(self, request, method):
+        url = urlsplit(request.path)
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        if url.path.startswith("/api/pub/"):
+            status, content_type, payload = self._yoai(request, url.path[len("/api/pub/"):], body)
+        elif url.path == "/cba":
+            status, content_type, payload = self._cba(request, method, url.query, body)
+        elif url.path == "/coingecko/api/v3/simple/price":
+            status, content_type, payload = self._coingecko(parse_qs(url.query))
+        else:
+            status, content_type, payload = 404, "text/plain", b"not found"
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(payload)))
+        request.end_headers()
+        request.wfile.write(payload)
+
+    def _yoai(self, request, endpoint, body):
+        bot = self.keys.get(request.headers.get("X-YoAI-API-Key"))
+        if bot is None:
+            return 401, "application/json", b'{"success": false}'
+        data = json.loads(body or b"{}")
+        if endpoint == "getUpdates":
+            with self.lock:
+                updates = self.channels[bot].fetch(data.get("offset"))
+                payload = {"success": True, "data": updates}
+            return 200, "application/json", json.dumps(payload).encode()
+        if endpoint == "sendMessage":
+            if self.send_latency:
+                time.sleep(self.send_latency)
+            if self.throttle and self._random.random() < self.throttle:
+                return 429, "application/json", b'{"success": false}'
+            with self.lock:
+                self.channels[bot].sent += 1
+                if self.on_send is not None:
+                    self.on_send(bot, data.get("to"), data.get("text", ""))
+            return 200, "application/json", b'{"success": true}'
+        if endpoint == "setWebhook":
+            return 200, "application/json", b'{"success": true}'
+        return 404, "application/json", b'{"success": false}'
+
+    def _cba(self, request, method, query, body):
+        if method == "GET":
+            location = f"http://{request.headers.get('Host')}/cba"
+            return 200, "text/xml; charset=utf-8", CBA_WSDL.replace("{location}", location).encode()
+        self.cba_calls += 1
+        match = CBA_DATE_RE.search(body.decode("utf-8", "replace"))
+        date = match.group(1) if match else time.strftime("%Y-%m-%d")
+        rates = "".join(CBA_RATE.format(iso=iso, rate=rate) for iso, rate in FIAT_RATES.items())
+        return 200, "text/xml; charset=utf-8", CBA_RESPONSE.format(date=date, rates=rates).encode()
+
+    def _coingecko(self, params):
+        self.coingecko_calls += 1
+        ids = ",".join(params.get("ids", [""])).split(",")
+        currency = params.get("vs_currencies", ["amd"])[0]
+        prices = {crypto_id: {currency: CRYPTO_PRICES[crypto_id]} for crypto_id in ids if crypto_id in CRYPTO_PRICES}
+        return 200, "application/json", json.dumps(prices).encode()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8900
+
+    def show(bot, chat_id, text):
+        print(f"[{bot} -> {chat_id}] {text}")
+
+    simulator = Simulator(port=port, on_send=show)
+    for name in ("bot", "todo", "reminder"):
+        simulator.add_bot(name)
+    simulator.start()
+    print(f"Simulator on {simulator.url}. Start a bot with:")
+    for name in ("bot", "todo", "reminder"):
+        env = " ".join(f"{key}={value}" for key, value in simulator.bot_env(name).items())
+        print(f"  {env} python {'Todo' if name == 'todo' else name}.py")
+    print("Then type '<bot> <chat_id> <text>' to send a message, e.g. 'reminder 1 /start'.")
+    for line in sys.stdin:
+        parts = line.strip().split(" ", 2)
+        if len(parts) == 3 and parts[0] in simulator.channels:
+            simulator.push(parts[0], int(parts[1]) if parts[1].isdigit() else parts[1], parts[2])
+        elif line.strip():
+            print("usage: <bot> <chat_id> <text>")
+
+
+if __name__ == "__main__":
+    main()
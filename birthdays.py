@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+# Slot of February 29th in the 366-day calendar index
+FEB_29 = date(2000, 2, 29).timetuple().tm_yday - 1
+
+
+def day_slot(d):
+    """Slot 0..365 of a month/day in a leap-year calendar (the year is ignored)."""
+    return date(2000, d.month, d.day).timetuple().tm_yday - 1
+
+
+def is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def next_occurrence(born, today):
+    """Next date (today or later) on which a yearly event born on `born` falls."""
+    for year in (today.year, today.year + 1):
+        if born.month == 2 and born.day == 29 and not is_leap(year):
+            candidate = date(year, 2, 28)
+        else:
+            candidate = date(year, born.month, born.day)
+        if candidate >= today:
+            return candidate
+    return candidate
+
+
+class BirthdayCalendar:
+    """
+    Yearly events (birthdays) owned by chats.
+
+    Dates are kept as date ordinals and indexed by month/day in 366 slots, so
+    "which events fall in the next N days" looks at N slots instead of every
+    stored event. Each chat only sees its own events.
+    """
+
+    def __init__(self):
+        self._owners = {}                        # chat_id -> {name: date ordinal}
+        self._slots = [set() for _ in range(366)]  # slot -> {(chat_id, name)}
+
+    def __len__(self):
+        return sum(len(events) for events in self._owners.values())
+
+    def add(self, chat_id, name, born):
+        """Add or replace the event `name` of chat_id."""
+        self.remove(chat_id, name)
+        self._owners.setdefault(chat_id, {})[name] = born.toordinal()
+        self._slots[day_slot(born)].add((chat_id, name))
+
+    def remove(self, chat_id, name):
+        """Remove an event. Returns False if the chat has no event with that name."""
+        events = self._owners.get(chat_id)
+        if not events or name not in events:
+            return False
+        born = date.fromordinal(events.pop(name))
+        self._slots[day_slot(born)].discard((chat_id, name))
+        if not events:
+            del self._owners[chat_id]
+        return True
+
+    def get(self, chat_id, name):
+        ordinal = self._owners.get(chat_id, {}).get(name)
+        return date.fromordinal(ordinal) if ordinal is not None else None
+
+    def upcoming(self, today, days=7):
+        """
+        Events falling within [today, today + days], as
+        (next_date, chat_id, name, born) tuples ordered by next_date.
+        """
+        found = []
+        for offset in range(days + 1):
+            day = today + timedelta(days=offset)
+            slots = [day_slot(day)]
+            # Feb 29 events are celebrated on Feb 28 in non-leap years
+            if day.month == 2 and day.day == 28 and not is_leap(day.year):
+                slots.append(FEB_29)
+            for slot in slots:
+                for chat_id, name in self._slots[slot]:
+                    born = date.fromordinal(self._owners[chat_id][name])
+                    found.append((day, chat_id, name, born))
+        return found
+
+    def for_owner(self, chat_id, today):
+        """All events of chat_id as (next_date, name, born), soonest first."""
+        events = self._owners.get(chat_id, {})
+        rows = []
+        for name, ordinal in events.items():
+            born = date.fromordinal(ordinal)
+            rows.append((next_occurrence(born, today), name, born))
+        rows.sort()
+        return rows
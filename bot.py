@@ -1,29 +1,67 @@
 import requests
 import base64
+import os
+import re
+import threading
 import time
-from datetime import datetime, timedelta
-from decimal import Decimal
-import zeep
+from datetime import date, datetime, timedelta
+from decimal import Context, Decimal, InvalidOperation
+from alerts import ABOVE, BELOW, Alert, AlertBook, AlertNotifier
+from cache import TTLCache
+from crossrates import CrossRates
+from metrics import (METRICS_PORT, CallStats, MetricsServer, Registry, register_outbound,
+                     register_router, register_runtime, register_upstream, register_yoai)
+from prices import CryptoPriceService, RateLimited
+from ratehistory import RateHistory
+from router import Router
+from runtime import BotRuntime
+from storage import Store
+from updates import UpdateTracker
+from outbound import OutboundQueue
+from yoai_client import YoAIClient
 
 # YoAI API Key
-YOAI_API_KEY = "01945ae0-be7b-704c-a643-bd69dc13e439:95f82b9aa60db092312f5fc6ca4425412f8c544be879446f6cbb35ea9dac9152"
+YOAI_API_KEY = os.environ.get(
+    "YOAI_API_KEY",
+    "01945ae0-be7b-704c-a643-bd69dc13e439:95f82b9aa60db092312f5fc6ca4425412f8c544be879446f6cbb35ea9dac9152",
+)
 
-# YoAI API Endpoints
-GET_UPDATES_URL = "https://yoai.yophone.com/api/pub/getUpdates"
-SEND_MESSAGE_URL = "https://yoai.yophone.com/api/pub/sendMessage"
+# Shared YoAI client: pooled keep-alive connections, timeouts and retries
+yoai = YoAIClient(YOAI_API_KEY)
 
-# Headers for API requests
-HEADERS = {
-    "Content-Type": "application/json",
-    "X-YoAI-API-Key": YOAI_API_KEY,
-}
+# Outgoing messages are rate limited (globally and per chat) and retried
+# from a bounded queue, so a burst of replies does not trip YoAI's limits
+outbound = OutboundQueue(yoai.deliver)
 
-# SOAP client setup for fiat currency rates
-WSDL_URL = 'http://api.cba.am/exchangerates.asmx?wsdl'
-client = zeep.Client(wsdl=WSDL_URL)
+# getUpdates cursor (persisted) and de-duplication of redelivered updates
+store = Store()
+update_tracker = UpdateTracker(store, "bot")
+
+# SOAP client setup for fiat currency rates. The client is built lazily on the
+# first fiat query (see get_soap_client), and the WSDL/XSD documents are cached
+# on disk so later starts don't need the network to build it.
+WSDL_URL = os.environ.get("CBA_WSDL_URL", 'http://api.cba.am/exchangerates.asmx?wsdl')
+WSDL_CACHE_PATH = os.environ.get("WSDL_CACHE_PATH", os.path.join(".wsdl_cache", "zeep.sqlite"))
+WSDL_CACHE_TTL = 30 * 24 * 60 * 60
+_soap_client = None
+_soap_client_lock = threading.Lock()
 
 # CoinGecko API URL for cryptocurrency rates
-COINGECKO_API = "https://api.coingecko.com/api/v3/simple/price"
+COINGECKO_API = os.environ.get("COINGECKO_API", "https://api.coingecko.com/api/v3/simple/price")
+COINGECKO_TIMEOUT = (3.05, 10)
+
+# Supported fiat currencies (rates from CBA, quoted in AMD)
+FIAT_CURRENCIES = ("USD", "EUR")
+
+# Supported crypto symbols and their CoinGecko ids
+CRYPTO_ID_MAP = {"BTC": "bitcoin", "ETH": "ethereum", "DOGE": "dogecoin", "FTN": "Fasttoken"}
+
+# How often all crypto prices are refreshed in the background (seconds)
+CRYPTO_REFRESH_INTERVAL = 60
+
+# Latency and outcomes of the rate upstreams (exported on /metrics)
+cba_calls = CallStats()
+coingecko_calls = CallStats()
 
 
 def decode_base64(text):
@@ -36,6 +74,108 @@ def decode_base64(text):
         return text
 
 
+def get_soap_client():
+    """
+    Return the CBA SOAP client, creating it on first use.
+    """
+    global _soap_client
+    if _soap_client is None:
+        with _soap_client_lock:
+            if _soap_client is None:
+                # zeep is only imported when the first fiat rate is requested
+                import zeep
+                from zeep.cache import SqliteCache
+                from zeep.transports import Transport
+
+                os.makedirs(os.path.dirname(WSDL_CACHE_PATH) or ".", exist_ok=True)
+                transport = Transport(cache=SqliteCache(path=WSDL_CACHE_PATH, timeout=WSDL_CACHE_TTL))
+                _soap_client = zeep.Client(wsdl=WSDL_URL, transport=transport)
+    return _soap_client
+
+
+@cba_calls.timed
+def fetch_rate_table(date_str):
+    """
+    Fetch the full CBA exchange-rate table for a date as an ISO -> Decimal dict
+    (AMD per one unit; CBA quotes some currencies per `Amount` units).
+    """
+    response = get_soap_client().service.ExchangeRatesByDate(date_str)
+    return {
+        rate['ISO']: Decimal(rate['Rate']) / Decimal(rate['Amount'] or 1)
+        for rate in response['Rates']['ExchangeRate']
+    }
+
+
+# CBA publishes rates once a day, so whole tables are cached per date. Stale
+# tables are served while a background refresh runs, and concurrent misses
+# share a single SOAP call. rate_tables.stats() exposes hit/miss counters.
+RATE_TABLE_TTL = 60 * 60
+rate_tables = TTLCache(fetch_rate_table, ttl=RATE_TABLE_TTL, max_entries=4)
+
+
+# Local history of the daily CBA tables for date and range queries ("USD
+# 2024-03-01", "EUR 30d", "USD % change over a week"). It is filled by
+# `python ratehistory.py backfill START` and then appended by a background
+# thread; queries never touch the network.
+RATE_HISTORY_INTERVAL = 60 * 60
+_rate_history = None
+_rate_history_lock = threading.Lock()
+
+# "<n><unit> [min|max|avg|change]" or "% change over a week"
+HISTORY_PERIOD_RE = re.compile(
+    r"^(?P<change>%|change|% change)?\s*(?:over\s+)?(?:(?:the\s+)?(?:last|past)\s+)?(?:an?\s+)?"
+    r"(?P<count>\d+)?\s*(?P<unit>d|days?|w|weeks?|m|months?|y|years?)"
+    r"(?:\s+(?P<stat>min/max/avg|min|max|avg|change|%))?$"
+)
+HISTORY_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+PERIOD_DAYS = {"d": 1, "w": 7, "m": 30, "y": 365}
+
+
+def get_rate_history():
+    """
+    Return the rate history, opening (or creating) its file on first use.
+    """
+    global _rate_history
+    if _rate_history is None:
+        with _rate_history_lock:
+            if _rate_history is None:
+                _rate_history = RateHistory()
+    return _rate_history
+
+
+def record_rate_history():
+    """
+    Append yesterday's CBA table to the rate history unless it is already there.
+    """
+    day = (datetime.now() - timedelta(days=1)).date()
+    history = get_rate_history()
+    if not history.has(day):
+        history.record(day, rate_tables.get(day.strftime('%Y-%m-%d')))
+        history.flush()
+
+
+def start_rate_history_recorder(interval=RATE_HISTORY_INTERVAL):
+    """
+    Record the daily table in a daemon thread every `interval` seconds, and
+    check the fiat price alerts against the current rates on every pass.
+    """
+    def loop():
+        while True:
+            try:
+                record_rate_history()
+            except Exception as e:
+                print(f"Error recording rate history: {e}")
+            try:
+                check_fiat_alerts()
+            except Exception as e:
+                print(f"Error checking fiat alerts: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="rate-history", daemon=True)
+    thread.start()
+    return thread
+
+
 def get_currency_rate(currency_iso):
     """
     Fetch the exchange rate for a given fiat currency ISO code (e.g., USD, EUR).
@@ -43,66 +183,98 @@ def get_currency_rate(currency_iso):
     try:
         previous_date = datetime.now() - timedelta(days=1)
         previous_date_str = previous_date.strftime('%Y-%m-%d')
-
-        # Fetch exchange rates from CBA
-        response = client.service.ExchangeRatesByDate(previous_date_str)
-        rates = response['Rates']['ExchangeRate']
-
-        for rate in rates:
-            if rate['ISO'] == currency_iso:
-                return Decimal(rate['Rate'])
+        return rate_tables.get(previous_date_str).get(currency_iso)
     except Exception as e:
         return None
 
 
+@coingecko_calls.timed
+def fetch_crypto_prices(crypto_ids):
+    """
+    Fetch AMD prices for several CoinGecko ids with a single request.
+    """
+    response = requests.get(
+        COINGECKO_API,
+        params={"ids": ",".join(crypto_ids), "vs_currencies": "amd"},
+        timeout=COINGECKO_TIMEOUT,
+    )
+    if response.status_code == 429:
+        retry_after = response.headers.get("Retry-After")
+        raise RateLimited(int(retry_after) if retry_after and retry_after.isdigit() else None)
+    response.raise_for_status()
+    data = response.json()
+    return {
+        crypto_id: data[crypto_id]["amd"]
+        for crypto_id in crypto_ids
+        if crypto_id in data and "amd" in data[crypto_id]
+    }
+
+
+# All supported ids are refreshed together; user queries are answered from memory
+crypto_prices = CryptoPriceService(fetch_crypto_prices, CRYPTO_ID_MAP.values())
+
+
 def get_crypto_rate(crypto_id):
     """
-    Fetch the cryptocurrency rate in AMD using CoinGecko API.
+    Return the cryptocurrency rate in AMD from the shared price snapshot.
     """
+    return crypto_prices.get(crypto_id)
+
+
+# Cross rates between every ISO code of the current CBA table, AMD and the
+# configured crypto symbols ("100 USD to EUR", "0.5 BTC in USD"). The matrix
+# is rebuilt when the CBA table or the crypto snapshot has been replaced
+# (eagerly after each crypto refresh), so a conversion is a lookup.
+CONVERT_RE = re.compile(
+    r"^(?:convert\s+)?(?P<amount>\d{1,15}(?:\.\d{1,18})?)\s*(?P<source>[a-z]{2,6})"
+    r"\s+(?:to|in|into|=|->)\s+(?P<target>[a-z]{2,6})$"
+)
+# Significant digits of the unit rate shown with a conversion
+CONVERSION_RATE_CONTEXT = Context(prec=6)
+_cross_rates = CrossRates(sources=(None, None))
+_cross_rates_lock = threading.Lock()
+cross_rate_rebuilds = 0
+
+
+def get_cross_rates():
+    """
+    Return the cross rates of the current CBA table and crypto snapshot,
+    rebuilding the matrix if either has changed since it was built.
+    """
+    global _cross_rates, cross_rate_rebuilds
     try:
-        response = requests.get(
-            COINGECKO_API,
-            params={"ids": crypto_id, "vs_currencies": "amd"}
-        )
-        response.raise_for_status()
-        data = response.json()
-        if crypto_id in data and "amd" in data[crypto_id]:
-            return data[crypto_id]["amd"]
-        return None
-    except Exception as e:
-        return None
+        table = rate_tables.get((datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'))
+    except Exception:
+        table = None
+    snapshot = crypto_prices.snapshot()
+    built_from = _cross_rates.sources
+    if built_from[0] is not table or built_from[1] is not snapshot:
+        with _cross_rates_lock:
+            built_from = _cross_rates.sources
+            if built_from[0] is not table or built_from[1] is not snapshot:
+                crypto = {symbol: snapshot.get(crypto_id) for symbol, crypto_id in CRYPTO_ID_MAP.items()}
+                _cross_rates = CrossRates(table, crypto, sources=(table, snapshot))
+                cross_rate_rebuilds += 1
+    return _cross_rates
+
+
+@crypto_prices.on_refresh
+def rebuild_cross_rates(prices):
+    get_cross_rates()
 
 
 def get_updates():
     """
-    Fetches updates from YoAI.
+    Fetches new updates from YoAI, skipping ones that were already processed.
     """
-    try:
-        response = requests.post(GET_UPDATES_URL, json={}, headers=HEADERS)
-        if response.status_code == 200:
-            updates = response.json()
-            if updates.get("success") and updates.get("data"):
-                return updates["data"]
-            else:
-
-                return []
-        elif response.status_code == 204:
-            return []
-        else:
-            return []
-    except Exception as e:
-        return []
+    return update_tracker.filter(yoai.get_updates(offset=update_tracker.next_offset()))
 
 
 def send_message(chat_id, text):
     """
-    Sends a message to a specific chat ID via YoAI.
+    Queues a message to a specific chat ID for rate-limited delivery.
     """
-    payload = {"to": chat_id, "text": text}
-    try:
-        response = requests.post(SEND_MESSAGE_URL, json=payload, headers=HEADERS)
-    except Exception as e:
-        print(f"Error sending message: {e}")
+    outbound.submit(chat_id, text)
 
 
 def process_updates():
@@ -113,55 +285,272 @@ def process_updates():
     # if not updates:
     #     print("No updates to process.")
     for message in updates:
-        chat_id = message.get("chatId")
-        encoded_text = message.get("text", "")
-        sender = message.get("sender", {})
-        sender_name = f"{sender.get('firstName', '')} {sender.get('lastName', '')}".strip()
-
-        # Decode the Base64 message text
-        text = decode_base64(encoded_text)
-
-
-        # Respond based on the message content
-        if text.lower() == "/start":
-            response_text = (
-                f"Welcome, {sender_name}! 👋\n"
-                "I am your Real-Time Rate Bot. Type 'help' for commands or send me a currency/crypto code."
-            )
-        elif text.lower() == "help":
-            response_text = (
-                "Available commands:\n"
-                "- /start: Start the bot\n"
-                "- USD/EUR: Get currency exchange rates\n"
-                "- BTC/ETH/FTN: Get cryptocurrency rates\n"
-                "- help: Show this help message"
-            )
-        elif text.upper() in ["USD", "EUR"]:
-            # Fetch fiat currency rates
-            rate = get_currency_rate(text.upper())
-            if rate is not None:
-                response_text = f"The real-time exchange rate for {text.upper()} is {rate} AMD."
-            else:
-                response_text = f"Sorry, I couldn't fetch the exchange rate for {text.upper()}."
-        elif text.upper() in ["BTC", "ETH", "DOGE", "FTN"]:
-            # Fetch crypto rates
-            crypto_id_map = {"BTC": "bitcoin", "ETH": "ethereum", "DOGE": "dogecoin", "FTN": "Fasttoken"}
-            crypto_id = crypto_id_map[text.upper()]
-            rate = get_crypto_rate(crypto_id)
-            if rate is not None:
-                response_text = f"The real-time rate for {text.upper()} is {rate} AMD."
-            else:
-                response_text = f"Sorry, I couldn't fetch the rate for {text.upper()}."
-        else:
-            response_text = f"Sorry, I didn't understand that. You said: {text}"
-
-        # Send the response back to the user
-        send_message(chat_id, response_text)
+        handle_message(message)
 
 
-if __name__ == "__main__":
+# ----- Price alerts -----
+# "alert BTC above 30000000" / "alert USD below 380". Pending alerts are
+# evaluated against every new price snapshot (crypto on each CoinGecko
+# refresh, fiat in the rate-history thread), so waiting for a price costs
+# no upstream calls. All alerts fired by one snapshot are sent as one
+# message per chat.
+price_alerts = AlertBook()
+alert_notifier = AlertNotifier(send_message, unit="AMD")
+MAX_ALERTS_PER_CHAT = 50
+ALERT_RE = re.compile(r"^(?P<symbol>[a-z]+)\s+(?P<direction>above|below|>|<)\s*(?P<threshold>\d+(?:\.\d+)?)$")
+ALERT_DIRECTIONS = {"above": ABOVE, ">": ABOVE, "below": BELOW, "<": BELOW}
+
+
+def fire_alerts(prices):
+    """
+    Evaluate the alerts against a {symbol: price} snapshot, notify the chats
+    and delete the fired alerts. Returns the fired alerts.
+    """
+    fired = price_alerts.evaluate_all(prices)
+    if fired:
+        alert_notifier.notify(fired, prices)
+        store.delete_alerts([alert.alert_id for alert in fired])
+    return fired
+
+
+@crypto_prices.on_refresh
+def check_crypto_alerts(prices):
+    fire_alerts({symbol: prices.get(crypto_id) for symbol, crypto_id in CRYPTO_ID_MAP.items()})
+
+
+def check_fiat_alerts():
+    fire_alerts({iso: get_currency_rate(iso) for iso in FIAT_CURRENCIES})
+
+
+def current_price(symbol):
+    if symbol in CRYPTO_ID_MAP:
+        return get_crypto_rate(CRYPTO_ID_MAP[symbol])
+    return get_currency_rate(symbol)
+
+
+# ----- Command handlers -----
+router = Router()
+
+
+@router.command("/start")
+def handle_start(msg):
+    return (
+        f"Welcome, {msg.sender_name}! 👋\n"
+        "I am your Real-Time Rate Bot. Type 'help' for commands or send me a currency/crypto code."
+    )
+
+
+@router.command("help")
+def handle_help(msg):
+    return (
+        "Available commands:\n"
+        "- /start: Start the bot\n"
+        "- USD/EUR: Get currency exchange rates\n"
+        "- USD 2024-03-01: Rate on a past day\n"
+        "- EUR 30d: Min/max/average over the last 30 days (also 2w, 6m, 1y)\n"
+        "- USD % change over a week: Change over a period\n"
+        "- BTC/ETH/FTN: Get cryptocurrency rates\n"
+        "- 100 USD to EUR / 0.5 BTC in USD: Convert between any CBA currency, AMD and crypto\n"
+        "- alert BTC above 30000000 / alert USD below 380: Get notified once a price crosses a threshold\n"
+        "- alerts: List your alerts; alert cancel <id>: Remove one\n"
+        "- help: Show this help message"
+    )
+
+
+@router.command(*FIAT_CURRENCIES)
+def handle_fiat(msg):
+    currency = msg.key.upper()
+    rate = get_currency_rate(currency)
+    if rate is not None:
+        return f"The real-time exchange rate for {currency} is {rate} AMD."
+    return f"Sorry, I couldn't fetch the exchange rate for {currency}."
+
+
+def handle_history(msg):
+    currency = msg.key.split()[0].upper()
+    args = msg.args.lower()
+    history = get_rate_history()
+    end = history.last_day
+    if end is None:
+        return "Rate history is not available yet."
+
+    if HISTORY_DATE_RE.match(args):
+        try:
+            day = date.fromisoformat(args)
+        except ValueError:
+            return f"Sorry, {args} is not a valid date."
+        found = history.rate_on(currency, day)
+        if found is None:
+            return f"Sorry, I have no {currency} rate for {args}."
+        published, rate = found
+        note = "" if published == day else f" (last published {published.isoformat()})"
+        return f"The exchange rate for {currency} on {args} was {rate:.2f} AMD{note}."
+
+    match = HISTORY_PERIOD_RE.match(args)
+    if match is None:
+        return f"Try '{currency} 2024-03-01', '{currency} 30d' or '{currency} % change over a week'."
+    days = int(match.group("count") or 1) * PERIOD_DAYS[match.group("unit")[0]]
+    stat = match.group("stat")
+
+    if match.group("change") or stat in ("change", "%"):
+        result = history.change(currency, end - timedelta(days=days), end)
+        if result is None:
+            return f"Sorry, I have no {currency} rates for the last {days} days."
+        percent, stats = result
+        return (
+            f"{currency} changed {percent:+.2f}% over the last {days} days "
+            f"({stats['first_day'].isoformat()}: {stats['first']:.2f} -> "
+            f"{stats['last_day'].isoformat()}: {stats['last']:.2f} AMD)."
+        )
+
+    stats = history.stats(currency, end - timedelta(days=days - 1), end)
+    if stats is None:
+        return f"Sorry, I have no {currency} rates for the last {days} days."
+    span = f"{stats['first_day'].isoformat()} to {stats['last_day'].isoformat()}"
+    if stat in ("min", "max", "avg"):
+        return f"{currency} {stat} over the last {days} days ({span}): {stats[stat]:.2f} AMD."
+    return (
+        f"{currency} over the last {days} days ({span}):\n"
+        f"min {stats['min']:.2f}, max {stats['max']:.2f}, avg {stats['avg']:.2f} AMD"
+    )
+
 
-    # Use polling to fetch updates
-    while True:
-        process_updates()
-        time.sleep(5)
+for _currency in FIAT_CURRENCIES:
+    router.prefix(_currency.lower())(handle_history)
+
+
+@router.command(*CRYPTO_ID_MAP)
+def handle_crypto(msg):
+    symbol = msg.key.upper()
+    rate = get_crypto_rate(CRYPTO_ID_MAP[symbol])
+    if rate is not None:
+        return f"The real-time rate for {symbol} is {rate} AMD."
+    return f"Sorry, I couldn't fetch the rate for {symbol}."
+
+
+@router.prefix("alert")
+def handle_alert(msg):
+    args = msg.args.lower().split()
+    if args and args[0] in ("cancel", "remove", "delete") and len(args) == 2:
+        alert_id = args[1].lstrip("#")
+        alert = price_alerts.get(int(alert_id)) if alert_id.isdigit() else None
+        if alert is None or alert.chat_id != msg.chat_id:
+            return "No such alert. Send 'alerts' to see yours."
+        price_alerts.cancel(alert.alert_id)
+        store.delete_alerts([alert.alert_id])
+        return f"Alert #{alert.alert_id} cancelled: {alert.symbol} {alert.direction} {alert.threshold} AMD."
+
+    match = ALERT_RE.match(" ".join(args))
+    symbol = match.group("symbol").upper() if match else None
+    if symbol not in CRYPTO_ID_MAP and symbol not in FIAT_CURRENCIES:
+        return "Try 'alert BTC above 30000000' or 'alert USD below 380'."
+    threshold = Decimal(match.group("threshold"))
+    direction = ALERT_DIRECTIONS[match.group("direction")]
+    if price_alerts.count_for_chat(msg.chat_id) >= MAX_ALERTS_PER_CHAT:
+        return f"You already have {MAX_ALERTS_PER_CHAT} alerts. Cancel one first ('alerts' lists them)."
+
+    price = current_price(symbol)
+    if price is not None and (price >= threshold if direction == ABOVE else price <= threshold):
+        return f"{symbol} is already {direction} {threshold} AMD (now {price} AMD)."
+    alert = Alert(msg.chat_id, symbol, direction, threshold)
+    store.add_alert(alert)
+    price_alerts.add(alert)
+    return f"Alert #{alert.alert_id} set: I'll tell you when {symbol} is {direction} {threshold} AMD."
+
+
+@router.command("alerts")
+def handle_alerts(msg):
+    pending = price_alerts.for_chat(msg.chat_id)
+    if not pending:
+        return "You have no price alerts. Try 'alert BTC above 30000000'."
+    lines = ["Your price alerts:"]
+    lines += [f"#{a.alert_id} {a.symbol} {a.direction} {a.threshold} AMD" for a in pending]
+    return "\n".join(lines)
+
+
+def handle_convert(msg, match):
+    amount = Decimal(match.group("amount"))
+    source, target = match.group("source").upper(), match.group("target").upper()
+    rates = get_cross_rates()
+    unknown = [symbol for symbol in (source, target) if symbol not in rates]
+    if unknown:
+        return (
+            f"Sorry, I have no rate for {', '.join(unknown)}. "
+            f"I can convert between: {', '.join(rates.symbols)}."
+        )
+    try:
+        converted = rates.convert(amount, source, target)
+    except InvalidOperation:
+        return f"Sorry, {amount} {source} is too large an amount to convert to {target}."
+    rate = CONVERSION_RATE_CONTEXT.plus(rates.rate(source, target)).normalize()
+    return f"{amount} {source} = {converted} {target} (1 {source} = {rate:f} {target})."
+
+
+@router.default
+def handle_unknown(msg):
+    match = CONVERT_RE.match(msg.key)
+    if match is not None:
+        return handle_convert(msg, match)
+    return f"Sorry, I didn't understand that. You said: {msg.text}"
+
+
+def handle_message(message):
+    """
+    Decodes a single message and sends the appropriate response.
+    """
+    try:
+        text = decode_base64(message.get("text", ""))
+        response_text = router.dispatch(message, text)
+        send_message(message.get("chatId"), response_text)
+    finally:
+        # Also when the handler failed, so one bad update cannot hold the cursor
+        update_tracker.ack(message)
+
+
+# ----- Metrics -----
+registry = Registry()
+register_router(registry, router)
+register_outbound(registry, outbound)
+register_yoai(registry, yoai)
+register_upstream(registry, "cba", "ExchangeRatesByDate", cba_calls)
+register_upstream(registry, "coingecko", "simple/price", coingecko_calls)
+registry.counter("bot_rate_cache_total", "CBA rate table lookups by result",
+                 lambda: (((key,), value) for key, value in rate_tables.stats().items() if key != "entries"),
+                 labels=("result",))
+registry.value("counter", "bot_crypto_refreshes_total", "CoinGecko refresh attempts",
+               lambda: crypto_prices.upstream_calls)
+registry.value("gauge", "bot_crypto_snapshot_age_seconds", "Age of the crypto price snapshot",
+               lambda: crypto_prices.clock() - crypto_prices.updated_at if crypto_prices.updated_at else float("inf"))
+registry.value("counter", "bot_cross_rate_rebuilds_total", "Cross-rate matrix rebuilds",
+               lambda: cross_rate_rebuilds)
+registry.value("gauge", "bot_cross_rate_symbols", "Symbols in the cross-rate matrix", lambda: len(_cross_rates))
+registry.value("gauge", "bot_price_alerts", "Pending price alerts", lambda: len(price_alerts))
+registry.value("counter", "bot_price_alerts_fired_total", "Price alerts fired", lambda: price_alerts.fired)
+registry.value("counter", "bot_price_alert_messages_total", "Alert notification messages queued",
+               lambda: alert_notifier.messages)
+
+
+def main():
+    """Start the background services and run the bot until interrupted."""
+    price_alerts.load(store.load_alerts())
+    outbound.start()
+    crypto_prices.start(CRYPTO_REFRESH_INTERVAL)
+    start_rate_history_recorder()
+
+    # Each update is handled in its own task; rate lookups block on the network,
+    # so handlers run in worker threads and one slow upstream call no longer
+    # delays replies to other chats.
+    runtime = BotRuntime(
+        get_updates,
+        handle_message,
+        handlers_in_threads=True,
+        periodic=[(store.flush, store.commit_interval)],
+    )
+    if METRICS_PORT:
+        register_runtime(registry, runtime)
+        MetricsServer(registry, health=runtime.health).start()
+    runtime.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """
+    Thread-safe keyed cache in front of a slow loader function.
+
+    - entries are fresh for `ttl` seconds; after that they are still served
+      ("stale") while a single background refresh runs
+    - concurrent misses for the same key share one in-flight load
+      (single-flight), so N callers cause one upstream call
+    - at most `max_entries` keys are kept (oldest inserted is evicted first)
+    - hit/miss counters are available through stats()
+    """
+
+    def __init__(self, loader, ttl, max_entries=16, clock=time.monotonic):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()   # key -> (value, loaded_at)
+        self._inflight = {}             # key -> Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.errors = 0
+
+    def get(self, key):
+        """Return the cached value for key, loading it if needed. Loader errors propagate."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                if self.clock() - loaded_at < self.ttl:
+                    self.hits += 1
+                    return value
+                # Stale: serve it and refresh in the background (once)
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    future = self._inflight[key] = Future()
+                    threading.Thread(target=self._load, args=(key, future), daemon=True).start()
+                return value
+
+            self.misses += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if leader:
+            self._load(key, future)
+        return future.result()
+
+    def _load(self, key, future):
+        try:
+            value = self.loader(key)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                del self._inflight[key]
+            future.set_exception(e)
+            return
+        with self._lock:
+            self.loads += 1
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._inflight[key]
+        future.set_result(value)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "errors": self.errors,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,82 @@
+"""
+Cross-rate conversion between every currency the bot has a price for.
+
+Both upstreams quote in AMD: the CBA table gives AMD per unit of each ISO
+code and CoinGecko gives AMD per coin. CrossRates turns one such set of
+quotes into a square matrix of Decimal cross rates (units of the target per
+unit of the source), built once when the quotes change. A conversion is
+then two dict lookups, one list index and one Decimal multiplication,
+rounded half-up to the target's number of places.
+
+The symbols are whatever the quotes contain; nothing is hard-coded here
+except the base currency.
+"""
+from decimal import ROUND_HALF_UP, Context, Decimal
+
+BASE = "AMD"
+
+# Digits after the decimal point in converted amounts
+FIAT_PLACES = 2
+CRYPTO_PLACES = 8
+
+# Significant digits of the precomputed cross rates
+PRECISION = 28
+
+_context = Context(prec=PRECISION, rounding=ROUND_HALF_UP)
+
+
+def to_decimal(value):
+    """Decimal of a price; floats (CoinGecko JSON) go through str() to keep their printed digits."""
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class CrossRates:
+    """
+    Immutable cross-rate matrix of one set of quotes.
+
+    fiat, crypto: {symbol: price in BASE}; zero or missing prices are skipped.
+    sources:      whatever the quotes were built from; the caller compares it
+                  to decide when a rebuild is due.
+    """
+
+    def __init__(self, fiat=None, crypto=None, sources=None):
+        quotes = {BASE: Decimal(1)}
+        places = {BASE: FIAT_PLACES}
+        for table, digits in ((fiat or {}, FIAT_PLACES), (crypto or {}, CRYPTO_PLACES)):
+            for symbol, price in table.items():
+                if price:
+                    quotes[symbol.upper()] = to_decimal(price)
+                    places[symbol.upper()] = digits
+        self.sources = sources
+        self.symbols = sorted(quotes)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._exponents = {symbol: Decimal(1).scaleb(-digits) for symbol, digits in places.items()}
+        # matrix[i * n + j]: units of symbols[j] per unit of symbols[i]
+        values = [quotes[symbol] for symbol in self.symbols]
+        divide = _context.divide
+        self.matrix = [divide(source, target) for source in values for target in values]
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def rate(self, source, target):
+        """Units of `target` per unit of `source`, or None if either symbol is unknown."""
+        i = self.index.get(source)
+        j = self.index.get(target)
+        if i is None or j is None:
+            return None
+        return self.matrix[i * len(self.symbols) + j]
+
+    def convert(self, amount, source, target):
+        """
+        `amount` of `source` in `target`, rounded to the target's places; None if unknown.
+        Raises decimal.InvalidOperation when the result needs more than PRECISION digits.
+        """
+        rate = self.rate(source, target)
+        if rate is None:
+            return None
+        return _context.multiply(to_decimal(amount), rate).quantize(
+            self._exponents[target], rounding=ROUND_HALF_UP, context=_context)
@@ -0,0 +1,140 @@
+"""
+Date/time parser for reminder prompts.
+
+Understands, case-insensitively:
+
+    2025-01-01 10:00        absolute date and time
+    in 2h / in 90 min / in 1h30m / in 3 days / in 1 week
+    18:00 / 9am / 9:30pm    today, or tomorrow if that time has passed
+    today 18:00 / tomorrow 9:00 / tomorrow at 9
+    mon 14:30 / monday      the coming Monday (today if the time is still ahead)
+    next mon 14:30          the Monday after today (1-7 days ahead)
+    25.12 18:00 / 25.12.2025 18:00 / 25/12
+                            day.month (this year, or next year once passed)
+
+A missing time means DEFAULT_HOUR:00. Every form is one precompiled regex
+match plus a little arithmetic; there is no general-purpose parser on the
+hot path.
+"""
+import re
+from datetime import date, datetime, time, timedelta, timezone
+
+from timezones import get_zone
+
+# Time of day used when only a day is given ("tomorrow", "next mon")
+DEFAULT_HOUR = 9
+
+WEEKDAYS = {
+    "mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5, "sun": 6, "sunday": 6,
+}
+
+UNITS = {
+    "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+    "h": 3600, "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600,
+    "d": 86400, "day": 86400, "days": 86400,
+    "w": 604800, "week": 604800, "weeks": 604800,
+}
+
+_TIME = r"(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<ampm>am|pm)?"
+
+ISO_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})(?:[ t]+(\d{1,2}):(\d{2}))?$")
+RELATIVE_RE = re.compile(r"^in\s+((?:\d+\s*[a-z]+\s*)+)$")
+RELATIVE_PART_RE = re.compile(r"(\d+)\s*([a-z]+)")
+DAY_TIME_RE = re.compile(
+    r"^(?:(?P<day>today|tomorrow|(?P<next>next\s+)?(?P<weekday>[a-z]{3,9}))"
+    r"|(?P<dd>\d{1,2})[./](?P<mm>\d{1,2})(?:[./](?P<yyyy>\d{4}))?)?"
+    r"(?:\s*(?:at\s+)?" + _TIME + r")?$"
+)
+
+
+def _time_of_day(match):
+    """(hour, minute) from the time groups of a match, None if absent, False if invalid."""
+    if match.group("hour") is None:
+        return None
+    hour = int(match.group("hour"))
+    minute = int(match.group("minute") or 0)
+    ampm = match.group("ampm")
+    if ampm:
+        if not 1 <= hour <= 12:
+            return False
+        hour = hour % 12 + (12 if ampm == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return False
+    return hour, minute
+
+
+def parse_when(text, zone_key="UTC", now=None):
+    """
+    Parse a reminder time typed by a user in zone `zone_key`.
+    `now` is epoch seconds (defaults to the current time).
+    Returns an aware datetime in the user's zone, or None if not understood.
+    """
+    zone = get_zone(zone_key)
+    current = datetime.fromtimestamp(now, zone) if now is not None else datetime.now(zone)
+    text = text.strip().lower()
+
+    match = ISO_RE.match(text)
+    if match:
+        year, month, day, hour, minute = match.groups()
+        try:
+            return datetime(int(year), int(month), int(day),
+                            int(hour) if hour else DEFAULT_HOUR, int(minute or 0), tzinfo=zone)
+        except ValueError:
+            return None
+
+    match = RELATIVE_RE.match(text)
+    if match:
+        seconds = 0
+        for amount, unit in RELATIVE_PART_RE.findall(match.group(1)):
+            if unit not in UNITS:
+                return None
+            seconds += int(amount) * UNITS[unit]
+        # Relative times are exact durations, so do the arithmetic in UTC
+        return (current.astimezone(timezone.utc) + timedelta(seconds=seconds)).astimezone(zone)
+
+    match = DAY_TIME_RE.match(text)
+    if not match or not text:
+        return None
+    time_of_day = _time_of_day(match)
+    if time_of_day is False:
+        return None
+    hour, minute = time_of_day or (DEFAULT_HOUR, 0)
+    today = current.date()
+    day_word = match.group("day")
+
+    if match.group("dd"):
+        year = int(match.group("yyyy") or today.year)
+        try:
+            target = date(year, int(match.group("mm")), int(match.group("dd")))
+        except ValueError:
+            return None
+        if match.group("yyyy") is None and target < today:
+            try:
+                target = target.replace(year=year + 1)
+            except ValueError:
+                return None
+    elif day_word == "today":
+        target = today
+    elif day_word == "tomorrow":
+        target = today + timedelta(days=1)
+    elif day_word is not None:
+        weekday = WEEKDAYS.get(match.group("weekday"))
+        if weekday is None:
+            return None
+        ahead = (weekday - today.weekday()) % 7
+        if match.group("next"):
+            ahead = ahead or 7
+        elif ahead == 0 and (hour, minute) <= (current.hour, current.minute):
+            ahead = 7
+        target = today + timedelta(days=ahead)
+    else:
+        # A bare time: the next time the clock shows it
+        if time_of_day is None:
+            return None
+        target = today
+        if (hour, minute) <= (current.hour, current.minute):
+            target += timedelta(days=1)
+
+    return datetime.combine(target, time(hour, minute), tzinfo=zone)
@@ -0,0 +1,266 @@
+import functools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from router import LATENCY_BUCKETS, LatencyHistogram
+
+# Port of the /metrics and /healthz endpoint (0 = disabled)
+METRICS_HOST = os.environ.get("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Upper bounds (seconds) for how late a scheduled job or reminder ran
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class CallStats:
+    """
+    Latency and outcome counts of calls to one upstream endpoint.
+    Outcomes are "ok", an HTTP status ("429", "503") or an exception name.
+    """
+
+    __slots__ = ("latency", "outcomes")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.latency = LatencyHistogram(buckets)
+        self.outcomes = {}
+
+    def observe(self, seconds, outcome="ok"):
+        self.latency.observe(seconds)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    @property
+    def errors(self):
+        return sum(count for outcome, count in self.outcomes.items() if outcome != "ok")
+
+    def timed(self, func):
+        """Decorator: record every call of func; exceptions are counted by type and re-raised."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.observe(time.perf_counter() - start, type(e).__name__)
+                raise
+            self.observe(time.perf_counter() - start)
+            return result
+        return wrapper
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(int(value))
+
+
+class Registry:
+    """
+    Metrics rendered in the Prometheus text format.
+
+    Nothing is recorded through the registry: components keep plain counters
+    and LatencyHistograms (OutboundQueue.stats(), Router.timings, CallStats,
+    ...) and the registry reads them when /metrics is scraped. Recording
+    stays an integer add or a bisect on the hot path, and the cost of
+    formatting is paid per scrape, not per message.
+
+    A source is a callable returning the samples of a metric as an iterable
+    of (label values, value) pairs; histogram values are LatencyHistograms.
+    Adding the same name again adds another source to that metric.
+    """
+
+    def __init__(self):
+        self._families = {}
+
+    def _add(self, kind, name, help_text, source, labels):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, help_text, tuple(labels), [])
+        elif family[0] != kind or family[2] != tuple(labels):
+            raise ValueError(f"metric {name} already registered as a different {family[0]}")
+        family[3].append(source)
+
+    def counter(self, name, help_text, source, labels=()):
+        self._add("counter", name, help_text, source, labels)
+
+    def gauge(self, name, help_text, source, labels=()):
+        self._add("gauge", name, help_text, source, labels)
+
+    def histogram(self, name, help_text, source, labels=()):
+        self._add("histogram", name, help_text, source, labels)
+
+    def value(self, kind, name, help_text, func):
+        """Unlabelled counter or gauge read from func() on every scrape."""
+        self._add(kind, name, help_text, lambda: (((), func()),), ())
+
+    def render(self):
+        lines = []
+        for name, (kind, help_text, label_names, sources) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for source in sources:
+                try:
+                    samples = list(source())
+                except Exception as e:
+                    print(f"Error collecting metric {name}: {e}")
+                    continue
+                for values, value in samples:
+                    if kind != "histogram":
+                        lines.append(f"{name}{_labels(label_names, values)} {_number(value)}")
+                        continue
+                    snapshot = value.snapshot()
+                    for bound, count in snapshot["buckets"]:
+                        le = 'le="' + _number(bound) + '"'
+                        lines.append(f"{name}_bucket{_labels(label_names, values, le)} {count}")
+                    lines.append(f"{name}_sum{_labels(label_names, values)} {_number(snapshot['sum'])}")
+                    lines.append(f"{name}_count{_labels(label_names, values)} {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# ----- Standard metrics of the bots -----
+def register_runtime(registry, runtime):
+    """Polling, handler errors and periodic-job lag of a BotRuntime."""
+    registry.value("counter", "bot_polls_total", "getUpdates polls", lambda: runtime.polls)
+    registry.value("counter", "bot_poll_errors_total", "Polls that raised", lambda: runtime.poll_errors)
+    registry.value("counter", "bot_updates_total", "Updates received", lambda: runtime.updates_received)
+    registry.histogram("bot_poll_seconds", "getUpdates round trip", lambda: (((), runtime.poll_latency),))
+    registry.value("counter", "bot_handler_errors_total", "Messages whose handler raised",
+                   lambda: runtime.handler_errors)
+    registry.value("gauge", "bot_chats_in_progress", "Chats with queued or running messages",
+                   lambda: len(runtime._chat_queues))
+    registry.histogram("bot_periodic_lag_seconds", "How late periodic jobs started",
+                       lambda: (((job,), h) for job, h in list(runtime.periodic_lag.items())), labels=("job",))
+    registry.counter("bot_periodic_errors_total", "Periodic job runs that raised",
+                     lambda: (((job,), n) for job, n in list(runtime.periodic_errors.items())), labels=("job",))
+
+
+def register_ingest(registry, ingest):
+    """Routing and acknowledgement counters of a shard.ShardedIngest."""
+    registry.value("counter", "bot_ingest_routed_total", "Updates routed to shards", lambda: ingest.routed)
+    registry.value("counter", "bot_ingest_acked_total", "Updates acknowledged by shards", lambda: ingest.acked)
+    registry.value("gauge", "bot_ingest_unacked", "Routed updates not acknowledged yet",
+                   lambda: ingest.unacked)
+    registry.value("counter", "bot_ingest_restarts_total", "Shard processes restarted", lambda: ingest.restarts)
+    registry.value("counter", "bot_ingest_redelivered_total", "Updates handed again to a restarted shard",
+                   lambda: ingest.redelivered)
+    registry.value("counter", "bot_ingest_dropped_total", "Updates given up on after repeated shard crashes",
+                   lambda: ingest.dropped)
+
+
+def register_router(registry, router):
+    """Per-handler run time (Router.timings)."""
+    registry.histogram("bot_handler_seconds", "Run time of message handlers",
+                       lambda: (((name,), h) for name, h in list(router.timings.items())), labels=("handler",))
+
+
+def register_outbound(registry, outbound):
+    """Queue depth, delivery counters and latency of an OutboundQueue."""
+    for key, kind, help_text in (
+        ("depth", "gauge", "Messages waiting for delivery"),
+        ("in_flight", "gauge", "Messages being sent"),
+        ("sent", "counter", "Messages delivered"),
+        ("retried", "counter", "Delivery attempts that will be retried"),
+        ("failed", "counter", "Messages that failed for good"),
+        ("dropped", "counter", "Messages rejected because the queue was full"),
+    ):
+        suffix = "_total" if kind == "counter" else ""
+        registry.value(kind, f"bot_outbound_{key}{suffix}", help_text,
+                       lambda key=key: outbound.stats()[key])
+    registry.histogram("bot_outbound_send_seconds", "sendMessage attempt latency",
+                       lambda: (((), outbound.send_latency),))
+    registry.histogram("bot_outbound_queue_seconds", "Time from submit to first send attempt",
+                       lambda: (((), outbound.queue_latency),))
+
+
+def register_upstream(registry, upstream, endpoint, stats):
+    """Latency and outcomes of one upstream endpoint (a CallStats)."""
+    labels = ("upstream", "endpoint")
+    registry.histogram("bot_upstream_seconds", "Upstream call latency",
+                       lambda: (((upstream, endpoint), stats.latency),), labels)
+    registry.counter("bot_upstream_calls_total", "Upstream calls by outcome",
+                     lambda: (((upstream, endpoint, outcome), count)
+                              for outcome, count in list(stats.outcomes.items())),
+                     labels + ("outcome",))
+
+
+def register_yoai(registry, client):
+    """Every YoAI endpoint the client has called (YoAIClient.calls)."""
+    labels = ("upstream", "endpoint")
+    registry.histogram("bot_upstream_seconds", "Upstream call latency",
+                       lambda: ((("yoai", endpoint), stats.latency)
+                                for endpoint, stats in list(client.calls.items())), labels)
+    registry.counter("bot_upstream_calls_total", "Upstream calls by outcome",
+                     lambda: ((("yoai", endpoint, outcome), count)
+                              for endpoint, stats in list(client.calls.items())
+                              for outcome, count in list(stats.outcomes.items())),
+                     labels + ("outcome",))
+
+
+# ----- HTTP endpoint -----
+class MetricsServer:
+    """
+    Serves GET /metrics (Prometheus text) and GET /healthz from a daemon
+    thread, so it works the same for the asyncio bots and the shard workers.
+    `health` is an optional () -> (ok, details dict); /healthz answers 503
+    when ok is false.
+    """
+
+    def __init__(self, registry, port=METRICS_PORT, host=METRICS_HOST, health=None):
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.health = health
+        self.server = None
+
+    def _response(self, path):
+        if path == "/metrics":
+            return 200, CONTENT_TYPE, self.registry.render().encode()
+        if path == "/healthz":
+            ok, details = self.health() if self.health is not None else (True, {})
+            body = json.dumps({"ok": ok, **details}).encode()
+            return (200 if ok else 503), "application/json", body
+        return 404, "text/plain", b"not found\n"
+
+    def start(self):
+        metrics_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    status, content_type, body = metrics_server._response(self.path.split("?", 1)[0])
+                except Exception as e:
+                    status, content_type, body = 500, "text/plain", f"{e}\n".encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
@@ -0,0 +1,259 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from router import LatencyHistogram
+
+# Bounded number of messages waiting for delivery
+MAX_PENDING = 10000
+
+# Sender threads (each holds at most one in-flight request)
+SEND_WORKERS = 8
+
+# Global and per-chat rate limits (messages per second, burst size)
+GLOBAL_RATE = float(os.environ.get("OUTBOUND_GLOBAL_RATE", "25"))
+GLOBAL_BURST = int(os.environ.get("OUTBOUND_GLOBAL_BURST", "25"))
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+
+# Retries for transient failures, with exponential jittered backoff
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# How many permanently failed messages are kept for inspection
+DEAD_LETTER_SIZE = 1000
+
+
+class PermanentSendError(Exception):
+    """Raised by a send function when retrying cannot help (e.g. HTTP 400/403)."""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `capacity` stored."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class OutboundQueue:
+    """
+    Outbound message delivery with rate limiting and retries.
+
+    Messages are queued per chat. A dispatcher thread picks the chat whose
+    next message may go out soonest (per-chat token bucket, retry backoff),
+    waits for the global token bucket and hands the message to a pool of
+    sender threads. A chat has at most one message in flight, so messages
+    to one chat are delivered in order, while a slow or throttled chat does
+    not hold up the others.
+
+    `send(chat_id, text)` returns True on success and False (or raises) on a
+    transient failure, which is retried with backoff up to MAX_ATTEMPTS; it
+    raises PermanentSendError when retrying cannot help. Messages that fail
+    for good end up in `dead_letters`.
+    """
+
+    def __init__(self, send, workers=SEND_WORKERS, max_pending=MAX_PENDING,
+                 global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 chat_rate=CHAT_RATE, chat_burst=CHAT_BURST,
+                 max_attempts=MAX_ATTEMPTS, clock=time.monotonic):
+        self.send = send
+        self.workers = workers
+        self.max_pending = max_pending
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock())
+
+        self._chats = {}          # chat_id -> deque of [text, attempts, enqueued_at, on_sent]
+        self._chat_buckets = {}   # chat_id -> TokenBucket
+        self._ready = []          # heap of (not_before, seq, chat_id); one entry per idle chat
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._executor = None
+        self._dispatcher = None
+        self._running = False
+
+        self.dead_letters = deque(maxlen=DEAD_LETTER_SIZE)
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+        self.send_latency = LatencyHistogram()
+        self.queue_latency = LatencyHistogram()
+
+    # ----- Public API -----
+    def start(self):
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="outbound")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="outbound-dispatch", daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def submit(self, chat_id, text, on_sent=None):
+        """
+        Queue a message. Returns False (and counts a drop) when the queue is full.
+        on_sent: optional () -> None, called from a sender thread once the message is delivered.
+        """
+        with self._cond:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                self.dead_letters.append((chat_id, text, "queue full"))
+                return False
+            queue = self._chats.get(chat_id)
+            if queue is None:
+                queue = self._chats[chat_id] = deque()
+                self._schedule(chat_id, self.clock())
+            queue.append([text, 0, self.clock(), on_sent])
+            self._pending += 1
+            self._cond.notify_all()
+            return True
+
+    @property
+    def depth(self):
+        """Messages waiting or in flight."""
+        return self._pending
+
+    def join(self, timeout=None):
+        """Wait until every queued message is delivered or dead-lettered."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout=None):
+        self.join(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            "depth": self._pending,
+            "in_flight": self._in_flight,
+            "chats": len(self._chats),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "dead_letters": len(self.dead_letters),
+        }
+
+    # ----- Dispatcher -----
+    def _schedule(self, chat_id, not_before):
+        heapq.heappush(self._ready, (not_before, next(self._seq), chat_id))
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while self._running:
+                if not self._ready or self._in_flight >= self.workers:
+                    self._cond.wait()
+                    continue
+                now = self.clock()
+                not_before, _, chat_id = self._ready[0]
+                if not_before > now:
+                    self._cond.wait(not_before - now)
+                    continue
+                bucket = self._chat_buckets.get(chat_id)
+                if bucket is None:
+                    bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+                chat_wait = bucket.delay(now)
+                if chat_wait > 0:
+                    # Throttled chat: move it back by its own delay and look at the next one
+                    heapq.heapreplace(self._ready, (now + chat_wait, next(self._seq), chat_id))
+                    continue
+                global_wait = self.global_bucket.delay(now)
+                if global_wait > 0:
+                    self._cond.wait(global_wait)
+                    continue
+                heapq.heappop(self._ready)
+                bucket.take(now)
+                self.global_bucket.take(now)
+                item = self._chats[chat_id][0]
+                self._in_flight += 1
+                self._executor.submit(self._deliver, chat_id, item)
+
+    def _prune_buckets(self, now):
+        """Drop the buckets of idle chats that have refilled completely (no state is lost)."""
+        for chat_id in list(self._chat_buckets):
+            if chat_id not in self._chats:
+                bucket = self._chat_buckets[chat_id]
+                bucket.delay(now)
+                if bucket.tokens >= bucket.capacity:
+                    del self._chat_buckets[chat_id]
+
+    def _deliver(self, chat_id, item):
+        text, attempts, enqueued_at, on_sent = item
+        start = self.clock()
+        if attempts == 0:
+            self.queue_latency.observe(start - enqueued_at)
+        permanent = None
+        try:
+            ok = bool(self.send(chat_id, text))
+        except PermanentSendError as e:
+            ok, permanent = False, str(e) or "permanent failure"
+        except Exception:
+            ok = False
+        self.send_latency.observe(self.clock() - start)
+
+        with self._cond:
+            self._in_flight -= 1
+            queue = self._chats[chat_id]
+            now = self.clock()
+            if ok or permanent or attempts + 1 >= self.max_attempts:
+                queue.popleft()
+                self._pending -= 1
+                if ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                    self.dead_letters.append((chat_id, text, permanent or "retries exhausted"))
+                if queue:
+                    self._schedule(chat_id, now)
+                else:
+                    del self._chats[chat_id]
+                    if len(self._chat_buckets) > 2 * len(self._chats) + 1000:
+                        self._prune_buckets(now)
+            else:
+                item[1] = attempts + 1
+                self.retried += 1
+                backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempts)))
+                self._schedule(chat_id, now + backoff)
+            self._cond.notify_all()
+        if ok and on_sent is not None:
+            try:
+                on_sent()
+            except Exception as e:
+                print(f"Error after delivering a message to {chat_id}: {e}")
@@ -0,0 +1,127 @@
+import threading
+import time
+
+# Answer from memory while the last snapshot is younger than this (seconds)
+PRICE_TTL = 30
+
+# Background refresh interval (seconds)
+REFRESH_INTERVAL = 60
+
+# Backoff after a failed fetch (a 429 without Retry-After, a network error or
+# a timeout): doubles on every failure in a row, up to the cap
+BACKOFF_INITIAL = 30
+BACKOFF_MAX = 15 * 60
+
+
+class RateLimited(Exception):
+    """Raised by a price fetcher when the upstream answers 429."""
+
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.retry_after = retry_after
+
+
+class CryptoPriceService:
+    """
+    In-memory price snapshot for a fixed set of crypto ids.
+
+    All ids are refreshed together with one multi-id request, either by the
+    background refresher thread (start()) or on demand when the snapshot is
+    older than `ttl`. Concurrent callers share one refresh. After a failed
+    fetch (429, network error, timeout) the service stops calling upstream
+    until the backoff expires and keeps answering from the last snapshot.
+    Functions added with on_refresh() are called with every new snapshot,
+    one at a time and outside the fetch lock; after an on-demand refresh
+    they run in a separate thread, so a slow listener never holds up
+    callers of get().
+    """
+
+    def __init__(self, fetch, ids, ttl=PRICE_TTL, clock=time.monotonic):
+        """
+        fetch: (list of ids) -> {id: price}; raises RateLimited on 429
+        """
+        self.fetch = fetch
+        self.ids = list(ids)
+        self.ttl = ttl
+        self.clock = clock
+        self.prices = {}
+        self.updated_at = None
+        self.upstream_calls = 0
+        self._backoff = 0
+        self._backoff_until = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._listener_lock = threading.Lock()
+
+    def on_refresh(self, func):
+        """Call func({id: price}) after every successful refresh."""
+        self._listeners.append(func)
+        return func
+
+    def is_fresh(self):
+        return self.updated_at is not None and self.clock() - self.updated_at < self.ttl
+
+    def _fetch(self):
+        """Fetch all ids in one request, unless backing off. Call with the lock held."""
+        if self.clock() < self._backoff_until:
+            return None
+        self.upstream_calls += 1
+        try:
+            prices = self.fetch(self.ids)
+        except Exception as e:
+            if isinstance(e, RateLimited) and e.retry_after is not None:
+                delay = float(e.retry_after)
+            else:
+                delay = min(BACKOFF_MAX, self._backoff * 2 or BACKOFF_INITIAL)
+            self._backoff = delay
+            self._backoff_until = self.clock() + delay
+            return None
+        self._backoff = 0
+        self.prices = prices
+        self.updated_at = self.clock()
+        return prices
+
+    def _notify(self, prices):
+        with self._listener_lock:
+            for listener in self._listeners:
+                try:
+                    listener(prices)
+                except Exception as e:
+                    print(f"Error in price listener {listener.__name__}: {e}")
+
+    def refresh(self):
+        """Fetch all ids in one request, unless backing off. Returns True on success."""
+        with self._lock:
+            prices = self._fetch()
+        if prices is None:
+            return False
+        self._notify(prices)
+        return True
+
+    def snapshot(self):
+        """Return the latest {id: price} snapshot, refreshing it first if it is stale."""
+        if not self.is_fresh():
+            prices = None
+            with self._lock:
+                # Another caller may have refreshed while we waited for the lock
+                if not self.is_fresh():
+                    prices = self._fetch()
+            if prices is not None:
+                threading.Thread(target=self._notify, args=(prices,), name="crypto-listeners",
+                                 daemon=True).start()
+        return self.prices
+
+    def get(self, crypto_id):
+        """Return the latest known price for crypto_id, or None."""
+        return self.snapshot().get(crypto_id)
+
+    def start(self, interval=REFRESH_INTERVAL):
+        """Refresh in a daemon thread every `interval` seconds."""
+        def loop():
+            while True:
+                self.refresh()
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name="crypto-prices", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,238 @@
+"""
+Local history of the CBA exchange-rate table.
+
+The rates live in one memory-mapped file laid out by column: a fixed slot
+of float64 values per currency, one value per day counted from the file's
+first day, 0 where nothing was recorded (a rate is never 0, and unwritten
+parts of the file stay sparse). A range query for one currency reads one
+contiguous slice of the mapping; nothing is parsed and there is no network
+traffic.
+
+Aggregation runs on a NumPy view of the mapping when NumPy is installed
+and on a memoryview of the same bytes otherwise (slower, same answers).
+
+The file is filled once in bulk (while the bot is stopped) and then
+appended daily by the bot:
+
+    python ratehistory.py backfill 2015-01-01 [END] [path]
+"""
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # optional: aggregation falls back to plain Python
+    np = None
+
+RATE_HISTORY_PATH = os.environ.get("RATE_HISTORY_PATH", "rates.history")
+
+# First day of a new file, and the days and currencies it has room for.
+# The file is sparse, so unused room costs no disk space.
+FIRST_DAY = date(1995, 1, 1)
+CAPACITY_DAYS = 80 * 366
+MAX_CURRENCIES = 64
+
+# Parallel SOAP calls during a backfill
+BACKFILL_WORKERS = 4
+
+MAGIC = b"BOTYORH1"
+# magic, first day (ordinal), capacity in days, currency count, days recorded
+HEADER = struct.Struct("<8siIII")
+ISO_OFFSET = HEADER.size
+DATA_OFFSET = 4096
+VALUE_SIZE = 8
+
+
+class RateHistory:
+    """
+    Date x currency matrix of rates in a memory-mapped file.
+
+    record() writes one day's table; rate_on(), stats() and change() answer
+    from the mapping. All days are dates (datetime.date).
+    """
+
+    def __init__(self, path=RATE_HISTORY_PATH, first_day=FIRST_DAY, capacity=CAPACITY_DAYS):
+        self.path = path
+        if not os.path.exists(path):
+            self._create(first_day, capacity)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, first, self.capacity, count, self.days = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a rate history file")
+        self.first_day = date.fromordinal(first)
+        raw = self._map[ISO_OFFSET:ISO_OFFSET + 4 * count]
+        self.isos = {raw[i:i + 4].rstrip(b"\0").decode(): i // 4 for i in range(0, len(raw), 4)}
+        self._values = memoryview(self._map)[DATA_OFFSET:].cast("d")
+        self._matrix = None
+        if np is not None:
+            self._matrix = np.frombuffer(self._map, dtype=np.float64, offset=DATA_OFFSET,
+                                         count=MAX_CURRENCIES * self.capacity).reshape(MAX_CURRENCIES, -1)
+
+    def _create(self, first_day, capacity):
+        with open(self.path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, first_day.toordinal(), capacity, 0, 0))
+            f.truncate(DATA_OFFSET + MAX_CURRENCIES * capacity * VALUE_SIZE)
+
+    def close(self):
+        self._matrix = None
+        self._values.release()
+        self._map.close()
+        self._file.close()
+
+    # ----- Writing -----
+    def _index(self, day):
+        index = day.toordinal() - self.first_day.toordinal()
+        if not 0 <= index < self.capacity:
+            raise ValueError(f"{day} is outside {self.first_day} + {self.capacity} days")
+        return index
+
+    def _slot(self, iso):
+        slot = self.isos.get(iso)
+        if slot is None:
+            if len(self.isos) >= MAX_CURRENCIES:
+                return None
+            slot = self.isos[iso] = len(self.isos)
+            self._map[ISO_OFFSET + 4 * slot:ISO_OFFSET + 4 * slot + 4] = iso.encode()[:4].ljust(4, b"\0")
+            self._write_header()
+        return slot
+
+    def _write_header(self):
+        HEADER.pack_into(self._map, 0, MAGIC, self.first_day.toordinal(), self.capacity,
+                         len(self.isos), self.days)
+
+    def record(self, day, table):
+        """Store one day's rate table (ISO -> rate)."""
+        index = self._index(day)
+        for iso, rate in table.items():
+            slot = self._slot(iso)
+            if slot is not None:
+                self._values[slot * self.capacity + index] = float(rate)
+        if index >= self.days:
+            self.days = index + 1
+            self._write_header()
+
+    def has(self, day):
+        index = day.toordinal() - self.first_day.toordinal()
+        return 0 <= index < self.days and any(
+            self._values[slot * self.capacity + index] for slot in self.isos.values()
+        )
+
+    def flush(self):
+        self._map.flush()
+
+    @property
+    def last_day(self):
+        """The latest recorded day, or None."""
+        return self.first_day + timedelta(days=self.days - 1) if self.days else None
+
+    # ----- Queries -----
+    def _bounds(self, start, end):
+        first = max(0, start.toordinal() - self.first_day.toordinal())
+        last = min(self.days - 1, end.toordinal() - self.first_day.toordinal())
+        return first, last
+
+    def rate_on(self, iso, day, max_gap=10):
+        """(day, rate) published on `day` or up to max_gap days before it, or None."""
+        slot = self.isos.get(iso)
+        if slot is None:
+            return None
+        first, last = self._bounds(day - timedelta(days=max_gap), day)
+        base = slot * self.capacity
+        for index in range(last, first - 1, -1):
+            value = self._values[base + index]
+            if value:
+                return self.first_day + timedelta(days=index), value
+        return None
+
+    def stats(self, iso, start, end):
+        """
+        Aggregates of `iso` over [start, end]: a dict with min, max, avg,
+        first/last (the earliest and latest recorded values), first_day,
+        last_day and count; None if nothing was recorded in the range.
+        """
+        slot = self.isos.get(iso)
+        if slot is None:
+            return None
+        first, last = self._bounds(start, end)
+        if last < first:
+            return None
+        if self._matrix is not None:
+            window = self._matrix[slot, first:last + 1]
+            present = np.flatnonzero(window)
+            if present.size == 0:
+                return None
+            values = window[present]
+            low, high, avg = float(values.min()), float(values.max()), float(values.mean())
+            i, j = int(present[0]), int(present[-1])
+            head, tail, count = float(values[0]), float(values[-1]), int(values.size)
+        else:
+            base = slot * self.capacity + first
+            window = self._values[base:base + last - first + 1]
+            values = [value for value in window if value]
+            if not values:
+                return None
+            low, high, avg = min(values), max(values), sum(values) / len(values)
+            # The first and last recorded days are near the ends of the window
+            i = next(k for k in range(len(window)) if window[k])
+            j = next(k for k in range(len(window) - 1, -1, -1) if window[k])
+            head, tail, count = values[0], values[-1], len(values)
+        return {
+            "min": low, "max": high, "avg": avg, "first": head, "last": tail, "count": count,
+            "first_day": self.first_day + timedelta(days=first + i),
+            "last_day": self.first_day + timedelta(days=first + j),
+        }
+
+    def change(self, iso, start, end):
+        """
+        (percent, stats) for the change of `iso` from its first to its last
+        recorded value in [start, end], or None.
+        """
+        result = self.stats(iso, start, end)
+        if result is None or not result["first"]:
+            return None
+        return (result["last"] / result["first"] - 1) * 100, result
+
+
+def backfill(history, fetch_table, start, end, workers=BACKFILL_WORKERS):
+    """
+    Record every day in [start, end] that the history does not have yet.
+    fetch_table(date string 'YYYY-MM-DD') -> {ISO: rate}. Returns the number of days fetched.
+    """
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    missing = [day for day in days if not history.has(day)]
+
+    def fetch(day):
+        try:
+            return day, fetch_table(day.strftime("%Y-%m-%d"))
+        except Exception as e:
+            print(f"Could not fetch rates for {day}: {e}")
+            return day, None
+
+    fetched = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for day, table in pool.map(fetch, missing):
+            if table:
+                history.record(day, table)
+                fetched += 1
+    history.flush()
+    return fetched
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "backfill":
+        print("usage: python ratehistory.py backfill START [END] [path]")
+        sys.exit(2)
+    first = date.fromisoformat(sys.argv[2])
+    last = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today() - timedelta(days=1)
+    # The CBA SOAP client and its WSDL cache are set up by the bot module
+    from bot import fetch_rate_table
+
+    rate_history = RateHistory(sys.argv[4] if len(sys.argv) > 4 else RATE_HISTORY_PATH, first_day=first)
+    count = backfill(rate_history, fetch_rate_table, first, last)
+    print(f"Recorded {count} days ({rate_history.first_day} .. {rate_history.last_day}) in {rate_history.path}")
+    rate_history.close()
@@ -0,0 +1,72 @@
+"""
+Compact records for reminder.py.
+
+Both classes use __slots__ and keep times as integer epoch seconds instead of
+datetime objects, so a pending reminder or a chat costs one small object
+rather than a dict (plus nested dicts and datetimes) per record.
+"""
+
+
+class Reminder:
+    """
+    A pending reminder.
+
+    final_utc:      when its next pending trigger fires, epoch seconds (UTC)
+    original_local: the time the user asked about, epoch seconds (UTC), or
+                    None; converted to the chat's zone for display
+    options:        the chosen reminder options (see reminder.py) as a tuple;
+                    each one is a trigger of this single record
+    rule:           recurrence rule (see recurrence.py), or None for a one-shot
+                    reminder; only the next occurrence is ever stored
+    """
+
+    __slots__ = ("reminder_id", "chat_id", "text", "final_utc", "original_local", "options", "rule")
+
+    def __init__(self, chat_id, text, final_utc, original_local=None, options=(0,), reminder_id=None,
+                 rule=None):
+        self.reminder_id = reminder_id
+        self.rule = rule
+        self.chat_id = chat_id
+        self.text = text
+        self.final_utc = final_utc
+        self.original_local = original_local
+        self.options = options
+
+    def __repr__(self):
+        return f"Reminder({self.reminder_id!r}, chat {self.chat_id!r}, due {self.final_utc})"
+
+
+class Session:
+    """
+    Conversation state of one chat.
+
+    state:          0-4, see reminder.py
+    tz,
+    tz_region:      the chat's time zone key (see timezones.py; None until
+                    set) and the region name the user gave with it
+    reminder_text,
+    reminder_local: the reminder being set up (local wall-clock time as
+                    epoch seconds, i.e. before the zone is applied)
+    warning_issued: whether the 1-minute prompt warning was sent
+    prompt_at:      when the pending prompt (state 3 or 4) was sent, epoch seconds
+    """
+
+    __slots__ = ("state", "tz", "tz_region", "reminder_text", "reminder_local",
+                 "warning_issued", "prompt_at")
+
+    def __init__(self, state=0, tz=None, tz_region=None):
+        self.state = state
+        self.tz = tz
+        self.tz_region = tz_region
+        self.clear_prompt()
+
+    def clear_prompt(self):
+        """Forget the reminder being set up."""
+        self.reminder_text = None
+        self.reminder_local = None
+        self.warning_issued = False
+        self.prompt_at = None
+
+    @property
+    def has_prompt(self):
+        return self.reminder_text is not None
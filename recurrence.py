@@ -0,0 +1,152 @@
+"""
+Recurrence rules for reminders.
+
+A rule is a short string stored with the reminder:
+
+    daily, weekly            same local time every day / week
+    monthly:31               day 31 of every month (clamped to short months)
+    yearly:02-29             every year on that day (Feb 29 -> Feb 28 in
+                             non-leap years)
+    every:1800               every 1800 seconds, regardless of the zone
+
+A calendar rule may end in "/N" to repeat every N periods ("daily/3",
+"weekly/2", "monthly:31/3" for "every 3 days/2 weeks/3 months").
+
+Only the next occurrence of a recurring reminder is scheduled; when it
+fires, next_event() computes the one after it. A rule that repeats forever
+costs one record, not one per occurrence. Calendar rules step in the
+chat's local wall-clock time, so a daily 9:00 reminder stays at 9:00
+across DST changes.
+"""
+import calendar
+import re
+from datetime import timedelta
+
+from timezones import local_to_utc, utc_to_local
+
+RULE_RE = re.compile(
+    r"\b(?:(?P<word>daily|weekly|monthly|yearly|annually)"
+    r"|every\s+(?P<unit_only>day|week|month|year)"
+    r"|every\s+(?P<count>\d+)\s*(?P<period>days?|weeks?|months?|years?)"
+    r"|every\s+(?P<amount>\d+)\s*(?P<unit>m|min|mins|minutes?|h|hr|hrs|hours?))\b"
+)
+
+# Any other "every ..." is a repeat phrase we could not read
+EVERY_RE = re.compile(r"\bevery\b")
+
+WORDS = {"daily": "daily", "weekly": "weekly", "monthly": "monthly", "yearly": "yearly",
+         "annually": "yearly", "day": "daily", "week": "weekly", "month": "monthly", "year": "yearly"}
+
+UNITS = {"daily": "days", "weekly": "weeks", "monthly": "months", "yearly": "years"}
+
+# Shortest allowed "every N minutes" interval
+MIN_INTERVAL = 60
+
+
+def split_rule(text):
+    """
+    Find a recurrence phrase ('daily', 'every week', 'every 2 days', 'every 2h', ...)
+    in text. Returns (kind, rest) where kind is 'daily'/'weekly'/'monthly'/'yearly'
+    (with '/N' for every N periods), 'every:<seconds>' or None, and rest is the
+    text without the phrase. Raises ValueError for an "every ..." phrase that
+    is not a valid rule.
+    """
+    match = RULE_RE.search(text.lower())
+    if not match:
+        if EVERY_RE.search(text.lower()):
+            raise ValueError(f"unknown repeat phrase in {text!r}")
+        return None, text
+    rest = (text[:match.start()] + text[match.end():]).strip()
+    word = match.group("word") or match.group("unit_only")
+    if word:
+        return WORDS[word], rest
+    if match.group("period"):
+        count = int(match.group("count"))
+        if count < 1:
+            raise ValueError("the repeat interval must be at least 1")
+        kind = WORDS[match.group("period").rstrip("s")]
+        return (kind if count == 1 else f"{kind}/{count}"), rest
+    seconds = int(match.group("amount")) * (3600 if match.group("unit")[0] == "h" else 60)
+    if seconds < MIN_INTERVAL:
+        raise ValueError(f"the repeat interval must be at least {MIN_INTERVAL // 60} min")
+    return f"every:{seconds}", rest
+
+
+def _parse(rule):
+    """'monthly:31/3' -> ('monthly', '31', 3); interval 1 without a '/N' suffix."""
+    rule, _, interval = rule.partition("/")
+    kind, _, arg = rule.partition(":")
+    return kind, arg, int(interval) if interval else 1
+
+
+def rule_kind(rule):
+    """A rule without its anchor ('monthly:31/3' -> 'monthly/3'), for anchor_rule() on a new date."""
+    kind, _, interval = _parse(rule)
+    return kind if interval == 1 or kind == "every" else f"{kind}/{interval}"
+
+
+def anchor_rule(kind, event_local):
+    """Rule string for kind, anchored on the first occurrence (a naive local datetime)."""
+    if kind.startswith("every:"):
+        return kind
+    kind, _, interval = kind.partition("/")
+    suffix = f"/{interval}" if interval else ""
+    if kind == "monthly":
+        return f"monthly:{event_local.day}{suffix}"
+    if kind == "yearly":
+        return f"yearly:{event_local.month:02d}-{event_local.day:02d}{suffix}"
+    return kind + suffix
+
+
+def describe(rule):
+    kind, arg, interval = _parse(rule)
+    if kind != "every":
+        return kind if interval == 1 else f"every {interval} {UNITS[kind]}"
+    seconds = int(arg)
+    if seconds % 3600 == 0:
+        return f"every {seconds // 3600}h"
+    return f"every {seconds // 60} min"
+
+
+def _add_months(local, months, day):
+    month_index = local.month - 1 + months
+    year, month = local.year + month_index // 12, month_index % 12 + 1
+    return local.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def _step(rule, local, n):
+    """The local datetime n periods of a calendar rule after `local`."""
+    kind, arg, interval = _parse(rule)
+    n *= interval
+    if kind == "daily":
+        return local + timedelta(days=n)
+    if kind == "weekly":
+        return local + timedelta(weeks=n)
+    if kind == "monthly":
+        return _add_months(local, n, int(arg))
+    if kind == "yearly":
+        month, day = map(int, arg.split("-"))
+        year = local.year + n
+        return local.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+    raise ValueError(f"unknown recurrence rule {rule!r}")
+
+
+def next_event(rule, event_utc, zone, after):
+    """
+    First occurrence of the event at event_utc (epoch seconds) that is later
+    than `after`, stepping by the rule in the local time of `zone`.
+    Long gaps (e.g. the bot was down) are skipped in one jump.
+    """
+    kind, arg, interval = _parse(rule)
+    if kind == "every":
+        period = int(arg)
+        return event_utc + max(1, (after - event_utc) // period + 1) * period
+
+    event_local = utc_to_local(event_utc, zone)
+    days_per_period = {"daily": 1, "weekly": 7, "monthly": 31, "yearly": 366}[kind] * interval
+    n = max(1, (after - event_utc) // 86400 // days_per_period)
+    while True:
+        next_utc = local_to_utc(_step(rule, event_local, n), zone)
+        if next_utc > after:
+            return next_utc
+        n += 1
@@ -1,22 +1,36 @@
-import requests # type: ignore
 import base64
+import os
 import time
-from datetime import datetime, timedelta
 import json
+import re
+from dateparse import parse_when
+from metrics import (LAG_BUCKETS, METRICS_PORT, MetricsServer, Registry, register_outbound,
+                     register_ingest, register_router, register_runtime, register_yoai)
+from records import Reminder, Session
+from recurrence import anchor_rule, describe, next_event, rule_kind, split_rule
+from router import LatencyHistogram, Router
+from runtime import BotRuntime
+from scheduler import DeadlineIndex, ReminderScheduler
+from shard import ShardInbox, ShardedIngest, shard_db_path
+from storage import Store, from_epoch, to_epoch
+from timezones import local_to_utc, localize_batch, parse_timezone, utc_to_local
+from updates import UpdateTracker
+from webhook import WebhookServer
+from outbound import GLOBAL_BURST, GLOBAL_RATE, OutboundQueue
+from yoai_client import YoAIClient
 
 # YoAI API Key
-YOAI_API_KEY = "019460fa-68fa-7efb-b4cf-bc838f2ed6a7:81009105a93be4bbc8e740745b78b1a429513da24115f0fc3669489548f4458c"
+YOAI_API_KEY = os.environ.get(
+    "YOAI_API_KEY",
+    "019460fa-68fa-7efb-b4cf-bc838f2ed6a7:81009105a93be4bbc8e740745b78b1a429513da24115f0fc3669489548f4458c",
+)
 
-# YoAI API Endpoints
-GET_UPDATES_URL = "https://yoai.yophone.com/api/pub/getUpdates"
-SEND_MESSAGE_URL = "https://yoai.yophone.com/api/pub/sendMessage"
-SET_WEBHOOK_URL = "https://yoai.yophone.com/api/pub/setWebhook"
+# Shared YoAI client: pooled keep-alive connections, timeouts and retries
+yoai = YoAIClient(YOAI_API_KEY)
 
-# Headers for API requests
-HEADERS = {
-    "Content-Type": "application/json",
-    "X-YoAI-API-Key": YOAI_API_KEY,
-}
+# Outgoing messages are rate limited (globally and per chat) and retried
+# from a bounded queue, so a burst of replies does not trip YoAI's limits
+outbound = OutboundQueue(yoai.deliver)
 
 # ----- Data structures -----
 # Store user states to manage conversation flow
@@ -27,30 +41,76 @@ HEADERS = {
 #   3 - Received a message to remind about, waiting for date/time
 #   4 - Received date/time, waiting for reminder option
 # (After scheduling, user returns to state 2)
-user_states = {}
-
-# Store user time zones: chat_id -> (offset_hours, "Name or region")
-#   Example: +4 Armenia -> (4, "Armenia")
-user_timezones = {}
-
-# Temporary storage while we await user responses:
-#   reminder_text: text of the forwarded message the user wants to be reminded about
-#   reminder_datetime: the datetime the user wants to be reminded
-#   warning_issued: whether we have already issued a 1-minute warning
-#   time_prompt_timestamp: when we asked for date/time, to check the 1-minute timeout
-#   option_prompt_timestamp: when we asked for the reminder option
-user_temp_data = {}
-
-# Reminders structure:
-#  We'll store each reminder as a dictionary:
-#  {
-#    "chat_id": ...,
-#    "reminder_text": ...,
-#    "reminder_time": ... (the exact time at which the final reminder should go off, in UTC or local),
-#    "option": ... (which option 1-4, or default)
-#  }
-# We'll poll these and send messages at the appropriate times.
-reminders = []
+# One records.Session per chat holds its state, its time zone and the
+# reminder being set up (text, local time, prompt timestamp, warning flag).
+sessions = {}
+
+# Reminders are records.Reminder objects with times in epoch seconds.
+# Pending reminders live in a min-heap keyed by final_utc, so each tick only
+# looks at the reminders that are actually due.
+reminders = ReminderScheduler()
+
+# Deadlines of pending prompts (states 3 and 4): chat_id -> when the prompt
+# times out. check_timeouts() only looks at chats whose deadline has passed.
+prompt_deadlines = DeadlineIndex()
+PROMPT_TIMEOUT = 60
+
+# Reminder lead time per option (seconds); option 1 is 9:00 on the day itself
+# and any other choice means DEFAULT_LEAD_TIME
+LEAD_TIMES = {2: 3 * 60 * 60, 3: 60 * 60, 4: 0}
+DEFAULT_LEAD_TIME = 15 * 60
+
+# A reminder can have several options (e.g. "2 4": 3 hours before and exactly
+# at the time); each becomes a trigger sharing the one reminder record.
+# Option 0 means "no choice" (DEFAULT_LEAD_TIME).
+OPTION_TEXTS = {
+    0: "15 minutes before the specified time (default)",
+    1: "at 9:00 AM on the same day",
+    2: "3 hours before the specified time",
+    3: "1 hour before the specified time",
+    4: "exactly at the specified time",
+}
+DEFAULT_OPTIONS = (0,)
+OPTION_RE = re.compile(r"\d+")
+# Chosen option tuples, shared between reminders
+OPTION_SETS = {}
+
+# Clock (epoch seconds) used for prompt timestamps, timeouts and due times;
+# replaceable for tests
+clock = time.time
+
+# Persistent storage for reminders and conversation state (SQLite, WAL mode).
+# Everything above is reloaded from it on startup, see load_state().
+store = Store()
+
+# getUpdates cursor and de-duplication of redelivered updates
+update_tracker = UpdateTracker(store, "reminder")
+
+# How updates arrive: "polling" (getUpdates) or "webhook" (YoAI pushes them to
+# our HTTP server; WEBHOOK_URL is the public address registered with setWebhook)
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8080"))
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "16"))
+
+# Number of worker processes, each owning a hash partition of chat_ids
+# (1 = single process; see shard.py for how to change it on a live deployment)
+BOT_SHARDS = int(os.environ.get("BOT_SHARDS", "1"))
+
+# Longest the reminder scheduler sleeps (seconds); it wakes up earlier when
+# the next reminder is due sooner.
+POLL_INTERVAL = 5
+
+# Only reminders due within LOAD_HORIZON seconds are kept in the scheduler;
+# the rest stay in the store and are read through its due-time index as the
+# horizon advances (every LOAD_STEP seconds). loaded_until is the end of the
+# loaded window, epoch seconds.
+LOAD_HORIZON = 24 * 60 * 60
+LOAD_STEP = 60 * 60
+loaded_until = 0
+
+# How late reminder triggers were sent compared with their fire time (seconds)
+reminder_lag = LatencyHistogram(LAG_BUCKETS)
 
 
 # ----- Helper Functions -----
@@ -64,398 +124,649 @@ def decode_base64(text):
 
 
 def send_message(chat_id, text):
-    """Send a text message to the specified chat_id."""
-    payload = {"to": chat_id, "text": text}
-    try:
-        response = requests.post(SEND_MESSAGE_URL, json=payload, headers=HEADERS)
-        # if response.status_code == 200 and response.json().get("success"):
-        #     # print(f"Message sent to {chat_id}: {text}")
-        # else:
-        #     # print(f"Failed to send message to {chat_id}: {response.json()}")
-    except Exception as e:
-        print(f"Error sending message: {e}")
+    """Queue a text message to the specified chat_id for rate-limited delivery."""
+    outbound.submit(chat_id, text)
 
 
 def get_updates():
-    """Fetch new updates from YoAI."""
-    try:
-        response = requests.post(GET_UPDATES_URL, json={}, headers=HEADERS)
-        if response.status_code == 200:
-            updates = response.json()
-            if updates.get("success") and updates.get("data"):
-                return updates["data"]
-            else:
-                # No new data in the response
-                return []
-        elif response.status_code == 204:
-            # No content
-            return []
-        else:
-            # print(f"Failed to fetch updates. HTTP Status: {response.status_code}, Response: {response.text}")
-            return []
-    except Exception as e:
-        # print(f"Error while fetching updates: {e}")
-        return []
+    """Fetch new updates from YoAI, skipping ones that were already processed."""
+    return update_tracker.filter(yoai.get_updates(offset=update_tracker.next_offset()))
+
+
+def load_state():
+    """Reload users and the reminders due within the load horizon after a restart."""
+    global sessions, loaded_until
+    sessions = store.load_users()
+    # Each stored reminder is queued at its next pending trigger (final_utc)
+    # only; its later triggers are computed when that one fires
+    loaded_until = now_epoch() + LOAD_HORIZON
+    reminders.load(store.due_reminders(loaded_until))
+
+    # Rebuild the prompt deadlines of conversations that were waiting for input
+    for chat_id, session in sessions.items():
+        if session.state in (3, 4) and session.prompt_at is not None:
+            prompt_deadlines.set(chat_id, session.prompt_at + PROMPT_TIMEOUT)
+
+
+def now_epoch():
+    """clock() as whole epoch seconds (prompt timestamps and deadlines use this)."""
+    return int(clock())
+
 
+def persist_user(chat_id):
+    """Write the conversation state of a single chat to the store."""
+    session = sessions.get(chat_id)
+    if session is not None:
+        store.save_user(chat_id, session)
 
-def parse_timezone(text):
+
+def load_upcoming():
+    """Advance the load horizon: schedule the stored reminders that entered it."""
+    global loaded_until
+    until = now_epoch() + LOAD_HORIZON
+    # Reminders created or edited since they were loaded are scheduled already
+    upcoming = [r for r in store.reminders_between(loaded_until, until) if reminders.get(r.reminder_id) is None]
+    reminders.load(upcoming)
+    loaded_until = until
+
+
+def queue_reminder(reminder, zone):
     """
-    Attempt to parse a time zone in the format '+4', '-3', etc.
-    Possibly with a region or name after it (e.g., '+4 Armenia').
-    Returns (offset_int, region_string) or None if invalid.
+    Give a reminder new triggers in the scheduler (its old ones become stale),
+    or leave it to load_upcoming() if it is due after the load horizon.
     """
-    parts = text.split(maxsplit=1)
-    tz_part = parts[0].strip()  # e.g. "+4" or "-3"
-    region = parts[1].strip() if len(parts) > 1 else ""  # e.g. "Armenia"
-
-    # Validate that tz_part starts with '+' or '-' followed by digits
-    if (tz_part.startswith('+') or tz_part.startswith('-')) and tz_part[1:].isdigit():
-        try:
-            offset = int(tz_part)
-            return offset, region
-        except ValueError:
-            return None
+    if reminder.final_utc <= loaded_until:
+        reminders.push(reminder, fire_times(reminder, zone))
     else:
-        return None
+        reminders.cancel(reminder.reminder_id)
+
+
+def schedule_reminder(reminder, zone):
+    """Persist a new reminder and add its triggers to the scheduler."""
+    store.add_reminder(reminder)
+    queue_reminder(reminder, zone)
+
 
+def fire_time(option, event_utc, zone):
+    """When to send the reminder for an event at event_utc (epoch seconds), per reminder option."""
+    if option == 1:
+        # 9:00 AM on the same day (local time)
+        event_local = utc_to_local(event_utc, zone)
+        return local_to_utc(event_local.replace(hour=9, minute=0, second=0), zone)
+    return event_utc - LEAD_TIMES.get(option, DEFAULT_LEAD_TIME)
 
-def parse_datetime(text):
+
+def fire_times(reminder, zone):
+    """Pending trigger times of a reminder: one per option, from its final_utc on."""
+    if reminder.original_local is None:
+        return (reminder.final_utc,)
+    times = sorted({fire_time(option, reminder.original_local, zone) for option in reminder.options})
+    return [t for t in times if t >= reminder.final_utc] or [reminder.final_utc]
+
+
+def parse_options(text):
     """
-    Parse a date/time in the format 'YYYY-MM-DD HH:MM'.
-    Returns a datetime object or None if invalid.
+    Reminder options typed in state 4: '4', '2 4', '2, 4', ... -> sorted tuple,
+    '' -> DEFAULT_OPTIONS, None if anything else was typed.
     """
-    try:
-        dt = datetime.strptime(text.strip(), "%Y-%m-%d %H:%M")
-        return dt
-    except ValueError:
+    numbers = OPTION_RE.findall(text)
+    if not numbers:
+        return DEFAULT_OPTIONS if not text.strip() else None
+    if any(n not in ("1", "2", "3", "4") for n in numbers):
         return None
+    return OPTION_SETS.setdefault(frozenset(numbers), tuple(sorted(int(n) for n in set(numbers))))
 
 
-def process_updates():
-    """Main update processor—handles the conversation logic and state transitions."""
-    global user_states, user_timezones, user_temp_data, reminders
+def zone_of(chat_id):
+    session = sessions.get(chat_id)
+    return session.tz if session is not None and session.tz else "UTC"
 
+
+def parse_datetime(text, zone="UTC"):
+    """
+    Parse a reminder date/time typed in zone `zone`: 'YYYY-MM-DD HH:MM' or a
+    relative/natural form like 'in 2h', 'tomorrow 9:00', 'next mon 14:30',
+    '25.12 18:00' (see dateparse.py).
+    Returns an aware datetime in the user's zone, or None if invalid.
+    """
+    return parse_when(text, zone, clock())
+
+
+def process_updates():
+    """Fetch updates from YoAI and run each message through the state machine."""
     updates = get_updates()
     if not updates:
         return
 
     for message in updates:
-        chat_id = message.get("chatId")
-        encoded_text = message.get("text", "")
-        text = decode_base64(encoded_text).strip()
-        sender = message.get("sender", {})
-        sender_name = (f"{sender.get('firstName', '')} {sender.get('lastName', '')}").strip()
+        handle_update(message)
+    store.flush()
 
-        # Make sure we have a default state for this user
-        if chat_id not in user_states:
-            user_states[chat_id] = 0
 
-        current_state = user_states[chat_id]
+def handle_update(message):
+    """Handle one update, persist the resulting conversation state and acknowledge it."""
+    try:
+        handle_message(message)
+        persist_user(message.get("chatId"))
+    finally:
+        # Also when the handler failed, so one bad update cannot hold the cursor
+        update_tracker.ack(message)
+
+
+# -------------------- STATE MACHINE --------------------
+# Commands are matched first, then the handler for the chat's current state.
+router = Router()
+
+
+@router.command("/start")
+def handle_start(msg):
+    """Greet the user, explain how the bot works, ask for time zone."""
+    chat_id = msg.chat_id
+    sender_name = msg.sender_name
+
+    sessions[chat_id].state = 1  # Next: ask for time zone
+    prompt_deadlines.discard(chat_id)
+    send_message(
+        chat_id,
+        (
+            f"Hello, {sender_name}! I'm your Reminder Bot.\n"
+            "Here's how I work:\n"
+            "1. First, please provide your time zone, e.g. 'Asia/Yerevan', '+4 Armenia' or '+5:30'.\n"
+            "2. Once the time zone is set, just forward me any message you want to be reminded of.\n"
+            "3. I'll ask you when you want to be reminded (e.g. 'tomorrow 9:00', 'in 2h' or YYYY-MM-DD HH:MM).\n"
+            "4. You'll then select one or more of these reminder options (e.g. '2 4'):\n"
+            "   1) 9:00 AM on the same day\n"
+            "   2) 3 hours before\n"
+            "   3) 1 hour before\n"
+            "   4) Exactly at the specified time\n"
+            "   (Default is 15 minutes before if you don't choose anything.)\n"
+            "Send /list to see your reminders, '/cancel <id>' or '/edit <id> <new time>' to change one.\n"
+            "Let's get started—please send me your time zone!"
+        )
+    )
+
+
+@router.command("/list")
+def handle_list(msg):
+    """List the chat's pending reminders with their ids (for /cancel and /edit)."""
+    chat_id = msg.chat_id
+    pending = store.reminders_for_chat(chat_id)
+    if not pending:
+        send_message(chat_id, "You have no pending reminders.")
+        return
+    zone = zone_of(chat_id)
+    local_times = localize_batch([r.original_local or r.final_utc for r in pending], [zone] * len(pending))
+    lines = ["Your reminders:"]
+    for r, local in zip(pending, local_times):
+        repeat = f", {describe(r.rule)}" if r.rule else ""
+        lines.append(f"#{r.reminder_id} {local.strftime('%Y-%m-%d %H:%M')}{repeat}: {r.text}")
+    lines.append("Use '/cancel <id>' or '/edit <id> <new time>'.")
+    send_message(chat_id, "\n".join(lines))
+
+
+def own_reminder(msg, usage):
+    """The chat's pending reminder named by the first argument ('12' or '#12'), or None."""
+    if not msg.args:
+        send_message(msg.chat_id, f"Usage: {usage}. Send /list to see your reminders.")
+        return None
+    reminder_id = msg.args.split(maxsplit=1)[0].lstrip("#")
+    reminder = None
+    if reminder_id.isdigit():
+        # Reminders due after the load horizon are only in the store
+        reminder = reminders.get(int(reminder_id)) or store.get_reminder(int(reminder_id))
+    if reminder is None or reminder.chat_id != msg.chat_id:
+        send_message(msg.chat_id, "No such reminder. Send /list to see yours.")
+        return None
+    return reminder
 
-        # print(f"Received from {sender_name} (chat {chat_id}), state={current_state}: {text}")
 
-        # -------------------- STATE MACHINE --------------------
-        if text.lower() == "/start":
-            # Greet the user, explain how the bot works, ask for time zone
-            user_states[chat_id] = 1  # Next: ask for time zone
-            send_message(
-                chat_id,
-                (
-                    f"Hello, {sender_name}! I'm your Reminder Bot.\n"
-                    "Here's how I work:\n"
-                    "1. First, please provide your time zone in the format '+4 Armenia' (for example).\n"
-                    "2. Once the time zone is set, just forward me any message you want to be reminded of.\n"
-                    "3. I'll ask you when you want to be reminded (in the format YYYY-MM-DD HH:MM).\n"
-                    "4. You'll then select one of these reminder options:\n"
-                    "   1) 9:00 AM on the same day\n"
-                    "   2) 3 hours before\n"
-                    "   3) 1 hour before\n"
-                    "   4) Exactly at the specified time\n"
-                    "   (Default is 15 minutes before if you don't choose anything.)\n"
-                    "Let's get started—please send me your time zone!"
-                )
+@router.prefix("/cancel")
+def handle_cancel(msg):
+    """Cancel a reminder; all of its pending triggers are dropped at once."""
+    reminder = own_reminder(msg, "/cancel <id>")
+    if reminder is None:
+        return
+    reminders.cancel(reminder.reminder_id)
+    store.delete_reminder(reminder.reminder_id)
+    send_message(msg.chat_id, f"Reminder #{reminder.reminder_id} cancelled: \"{reminder.text}\"")
+
+
+@router.prefix("/edit")
+def handle_edit(msg):
+    """Move a reminder to a new time, keeping its text, options and repeat rule."""
+    reminder = own_reminder(msg, "/edit <id> <new time>, e.g. '/edit 12 tomorrow 9:00'")
+    if reminder is None:
+        return
+    zone = zone_of(msg.chat_id)
+    parts = msg.args.split(maxsplit=1)
+    dt = parse_datetime(parts[1], zone) if len(parts) > 1 else None
+    if dt is None:
+        send_message(msg.chat_id, "Please give the new time, e.g. '/edit 12 tomorrow 9:00'.")
+        return
+    user_local = dt.replace(tzinfo=None)
+    reminder.original_local = local_to_utc(user_local, zone)
+    reminder.final_utc = min(fire_time(option, reminder.original_local, zone) for option in reminder.options)
+    if reminder.rule is not None:
+        reminder.rule = anchor_rule(rule_kind(reminder.rule), user_local)
+    queue_reminder(reminder, zone)
+    store.update_reminder(reminder)
+    send_message(
+        msg.chat_id,
+        f"Reminder #{reminder.reminder_id} moved to {user_local.strftime('%Y-%m-%d %H:%M')} ({zone})."
+    )
+
+
+@router.state(1)
+def handle_timezone(msg):
+    """State 1: waiting for the user to send their time zone."""
+    chat_id = msg.chat_id
+    text = msg.text
+
+    # User is supposed to send time zone info
+    tz_parsed = parse_timezone(text)
+    if tz_parsed is None:
+        send_message(chat_id, "Invalid time zone. Please try again (e.g. 'Asia/Yerevan', '+4 Armenia' or '+5:30').")
+    else:
+        zone, region = tz_parsed
+        session = sessions[chat_id]
+        session.tz, session.tz_region = zone, region
+        session.state = 2
+        send_message(
+            chat_id,
+            f"Time zone successfully set to {zone} {region}.\n"
+            "Everything is ready! Now, just forward a message you want to be reminded about."
+        )
+
+
+@router.state(2)
+def handle_reminder_text(msg):
+    """State 2: time zone set; the user forwards a message to be reminded about."""
+    chat_id = msg.chat_id
+    text = msg.text
+
+    # The user can forward any text (the message they'd like a reminder for)
+    # We'll store it, then ask for the date/time
+    now = now_epoch()
+    session = sessions[chat_id]
+    session.clear_prompt()
+    session.reminder_text = text
+    session.prompt_at = now
+    session.state = 3
+    prompt_deadlines.set(chat_id, now + PROMPT_TIMEOUT)
+
+    send_message(
+        chat_id,
+        "When should I remind you? E.g. 'in 2h', 'tomorrow 9:00', 'next mon 14:30', "
+        "'25.12 18:00' or YYYY-MM-DD HH:MM."
+    )
+
+
+@router.state(3)
+def handle_reminder_datetime(msg):
+    """State 3: we have the reminder text, waiting for the date/time."""
+    chat_id = msg.chat_id
+    text = msg.text
+
+    dt = parse_datetime(text, sessions[chat_id].tz or "UTC")
+    if dt is None:
+        # Could be an invalid format or user might be ignoring the request
+        # Check if they typed something else. We'll just ask them again:
+        send_message(
+            chat_id,
+            "I couldn't understand the date/time. Try 'in 2h', 'tomorrow 9:00', "
+            "'next mon 14:30' or 'YYYY-MM-DD HH:MM'."
+        )
+    else:
+        # We have a valid datetime. Store it and move on to reminder option.
+        session = sessions[chat_id]
+        now = now_epoch()
+        session.reminder_local = to_epoch(dt.replace(tzinfo=None))
+        session.prompt_at = now
+        session.state = 4
+        prompt_deadlines.set(chat_id, now + PROMPT_TIMEOUT)
+        send_message(
+            chat_id,
+            (
+                "Great! Now, choose a reminder option:\n"
+                "1) Remind at 9:00 AM on the same day\n"
+                "2) 3 hours before\n"
+                "3) 1 hour before\n"
+                "4) Exactly at the specified time\n"
+                "(If you do not select any option, I'll remind you 15 minutes before by default.)\n"
+                "You can pick several, e.g. '2 4' for 3 hours before and exactly at the time.\n"
+                "Add 'daily', 'weekly', 'monthly', 'yearly' or e.g. 'every 2 weeks' or 'every 2h' to repeat it\n"
+                "(e.g. '4 daily')."
             )
-            continue
+        )
 
-        # If we haven't set time zone yet, or are waiting to set it
-        if current_state == 1:
-            # User is supposed to send time zone info
-            tz_parsed = parse_timezone(text)
-            if tz_parsed is None:
-                send_message(chat_id, "Invalid time zone format. Please try again (e.g. '+4 Armenia').")
-            else:
-                offset, region = tz_parsed
-                user_timezones[chat_id] = (offset, region)
-                user_states[chat_id] = 2
-                send_message(
-                    chat_id,
-                    f"Time zone successfully set to {offset} {region}.\n"
-                    "Everything is ready! Now, just forward a message you want to be reminded about."
-                )
-            continue
 
-        # State 2: Time zone set, user can forward a message to remind about
-        if current_state == 2:
-            # The user can forward any text (the message they'd like a reminder for)
-            # We'll store it, then ask for the date/time
-            user_temp_data[chat_id] = {
-                "reminder_text": text,
-                "reminder_datetime": None,
-                "warning_issued": False,
-                "time_prompt_timestamp": datetime.now(),
-                "option_prompt_timestamp": None,
-            }
-            user_states[chat_id] = 3
+@router.state(4)
+def handle_reminder_option(msg):
+    """State 4: we have the text and date/time, waiting for the reminder option."""
+    chat_id = msg.chat_id
+    # A repeat phrase ("daily", "every 2 weeks", "every 2h", ...) may come with the option
+    try:
+        repeat, text = split_rule(msg.text)
+    except ValueError:
+        send_message(chat_id, "I couldn't read how often to repeat. Try e.g. 'daily', 'every 2 weeks', "
+                              "'every 3 months' or 'every 30 min'.")
+        return
 
-            send_message(
-                chat_id,
-                "When should I remind you? Please specify in YYYY-MM-DD HH:MM format."
-            )
+    # One or more options, e.g. "4" or "2 4" (3 hours before and exactly at);
+    # an empty answer means the default
+    chosen_options = parse_options(text)
+    if chosen_options is None:
+        send_message(chat_id, "That option doesn't exist. Please choose 1, 2, 3, or 4 (or several, e.g. '2 4').")
+        return
+
+    # Now we have valid chosen_options (possibly (0,) for default)
+    # Schedule the reminder
+    session = sessions[chat_id]
+    reminder_text = session.reminder_text
+    reminder_datetime = from_epoch(session.reminder_local)
+    zone = session.tz
+
+    # The user's specified time is wall-clock time in their zone; convert it to
+    # UTC epoch seconds through the zone (so half-hour offsets and DST are right)
+    # e.g. with Asia/Yerevan (+4), 2025-01-01 10:00 local is 2025-01-01 06:00 UTC
+    user_local = reminder_datetime
+    # Convert to UTC:
+    reminder_utc = local_to_utc(user_local, zone)
+
+    # Next, figure out the "send" times based on the options (one trigger each)
+    option_msg = "I will remind you " + " and ".join(OPTION_TEXTS[o] for o in chosen_options) + "."
+    final_utc = min(fire_time(o, reminder_utc, zone) for o in chosen_options)
+
+    rule = None
+    if repeat is not None:
+        rule = anchor_rule(repeat, user_local)
+        option_msg += f" Repeats {describe(rule)}."
+
+    # Store the reminder
+    schedule_reminder(Reminder(
+        chat_id,
+        reminder_text,
+        final_utc,  # when we send the first reminder
+        reminder_utc,  # shown (in the chat's zone) when the reminder fires
+        chosen_options,
+        rule=rule,
+    ), zone)
+
+    # Notify the user
+    send_message(
+        chat_id,
+        f"Your reminder is set! {option_msg}\n\n"
+        f"You want to be reminded about:\n\"{reminder_text}\"\n"
+        f"at local time: {user_local.strftime('%Y-%m-%d %H:%M')} ({zone})."
+    )
+
+    # Reset user state to time zone set / ready to accept new messages
+    session.state = 2
+    session.clear_prompt()
+    prompt_deadlines.discard(chat_id)
+
+
+def handle_message(message):
+    """Main update processor—routes a message to the command or state handler."""
+    chat_id = message.get("chatId")
+    text = decode_base64(message.get("text", "")).strip()
+
+    # Make sure we have a default state for this user
+    session = sessions.get(chat_id)
+    if session is None:
+        session = sessions[chat_id] = Session()
+
+    # print(f"Received from chat {chat_id}, state={session.state}: {text}")
+
+    # Users in state 0 (no /start yet) and unknown states are ignored
+    router.dispatch(message, text, state=session.state)
+
+
+def check_timeouts(now=None):
+    """
+    Check if user has not provided the required input (date/time or option) within 1 minute.
+    If so, send a warning or reset the conversation if they've already been warned.
+    Only conversations whose prompt deadline has passed are touched.
+    """
+    if now is None:
+        now = now_epoch()
+
+    for chat_id in prompt_deadlines.pop_expired(now):
+        session = sessions.get(chat_id)
+        if session is None or not session.has_prompt:
             continue
+        state = session.state
 
-        # State 3: We have the reminder text, waiting for user to provide date/time
-        if current_state == 3:
-            dt = parse_datetime(text)
-            if dt is None:
-                # Could be an invalid format or user might be ignoring the request
-                # Check if they typed something else. We'll just ask them again:
-                send_message(chat_id, "I couldn't understand the date/time. Please use 'YYYY-MM-DD HH:MM'.")
-            else:
-                # We have a valid datetime. Store it and move on to reminder option.
-                user_temp_data[chat_id]["reminder_datetime"] = dt
-                user_temp_data[chat_id]["option_prompt_timestamp"] = datetime.now()
-                user_states[chat_id] = 4
+        if state == 3:
+            # waiting for date/time
+            if not session.warning_issued:
+                # Issue warning and give them another minute
                 send_message(
                     chat_id,
-                    (
-                        "Great! Now, choose a reminder option:\n"
-                        "1) Remind at 9:00 AM on the same day\n"
-                        "2) 3 hours before\n"
-                        "3) 1 hour before\n"
-                        "4) Exactly at the specified time\n"
-                        "(If you do not select any option, I'll remind you 15 minutes before by default.)"
-                    )
+                    "You haven't provided a date/time within 1 minute. Please respond soon, or send a new message."
                 )
-            continue
-
-        # State 4: We have the text and date/time, waiting for user to choose reminder option
-        if current_state == 4:
-            # Strip out spaces from the beginning/end of the number
-            chosen_option = text.strip()
-            # If user typed nothing or typed something that isn't 1-4, handle
-            if chosen_option in ["1", "2", "3", "4"]:
-                # Valid option
-                chosen_option = int(chosen_option)
+                session.warning_issued = True
+                prompt_deadlines.set(chat_id, now + PROMPT_TIMEOUT)
             else:
-                # Maybe there's extra spaces or something else (like " 4")
-                # Let's filter out non-digit characters or handle partial
-                numeric_part = "".join([ch for ch in chosen_option if ch.isdigit()])
-                if numeric_part in ["1", "2", "3", "4"]:
-                    chosen_option = int(numeric_part)
-                elif chosen_option == "":
-                    # If truly empty, treat it as no selection => default
-                    chosen_option = 0  # We'll treat 0 as "no selection"
-                else:
-                    # Check if user typed something that can't parse
-                    if numeric_part == "":
-                        # If there's no digit at all, treat as invalid
-                        send_message(chat_id, "That option doesn't exist. Please choose 1, 2, 3, or 4.")
-                        continue
-                    else:
-                        # If numeric_part is something else, also invalid
-                        if numeric_part not in ["1", "2", "3", "4"]:
-                            send_message(chat_id, "That option doesn't exist. Please choose 1, 2, 3, or 4.")
-                            continue
-                        else:
-                            chosen_option = int(numeric_part)
-
-            # Now we have a valid chosen_option (possibly 0 for default)
-            # Schedule the reminder
-            reminder_text = user_temp_data[chat_id]["reminder_text"]
-            reminder_datetime = user_temp_data[chat_id]["reminder_datetime"]
-            (offset, region) = user_timezones[chat_id]
-
-            # Convert user local time to a "server reference" time if needed
-            # For simplicity, assume server's local time is UTC or a known reference.
-            # We'll treat the user's specified time as local and convert it to UTC by subtracting the offset:
-            # UTC = user_local_time - offset (in hours)
-            # e.g. if offset=+4 and user says 2025-01-01 10:00 local, that's 2025-01-01 06:00 UTC
+                # They have already been warned; reset conversation
+                send_message(chat_id, "No date/time received. I'll wait for a new message.")
+                session.state = 2
+                # Clear temp data for this chat
+                session.clear_prompt()
+
+        elif state == 4:
+            # waiting for reminder option: over a minute has passed, no option chosen => default
+            reminder_text = session.reminder_text
+            reminder_datetime = from_epoch(session.reminder_local)
+            zone = session.tz
+
+            # Convert user local time to UTC
             user_local = reminder_datetime
-            # Convert to UTC:
-            reminder_utc = user_local - timedelta(hours=offset)
-
-            # Next, figure out final "send" time based on the option.
-            # We'll store *all* relevant times (like "9:00 same day", etc.) in a schedule.
-            # But the user specifically wants one single time for the final reminder. We'll handle each option:
-            if chosen_option == 1:
-                # Remind at 9:00 AM on the same day (local time).
-                # We'll create a new datetime with the same date, but hour=9, minute=0 (user local).
-                remind_local = user_local.replace(hour=9, minute=0, second=0)
-                # Convert that to UTC
-                final_utc = remind_local - timedelta(hours=offset)
-                option_msg = "I will remind you at 9:00 AM on the same day."
-            elif chosen_option == 2:
-                # 3 hours before
-                final_utc = reminder_utc - timedelta(hours=3)
-                option_msg = "I will remind you 3 hours before the specified time."
-            elif chosen_option == 3:
-                # 1 hour before
-                final_utc = reminder_utc - timedelta(hours=1)
-                option_msg = "I will remind you 1 hour before the specified time."
-            elif chosen_option == 4:
-                # Exactly at the specified time
-                final_utc = reminder_utc
-                option_msg = "I will remind you exactly at the specified time."
-            else:
-                # Default: 15 minutes before
-                final_utc = reminder_utc - timedelta(minutes=15)
-                option_msg = "I will remind you 15 minutes before the specified time (default)."
-
-            # Store the reminder
-            reminders.append({
-                "chat_id": chat_id,
-                "reminder_text": reminder_text,
-                "final_utc": final_utc,  # when we actually send the reminder
-                "original_local": user_local,  # just for reference if needed
-                "option_chosen": chosen_option
-            })
-
-            # Notify the user
+            reminder_utc = local_to_utc(user_local, zone)
+            # Default = 15 min before
+            final_utc = fire_time(0, reminder_utc, zone)
+
+            schedule_reminder(Reminder(
+                chat_id,
+                reminder_text,
+                final_utc,
+                reminder_utc,
+                DEFAULT_OPTIONS,
+            ), zone)
+
             send_message(
                 chat_id,
-                f"Your reminder is set! {option_msg}\n\n"
-                f"You want to be reminded about:\n\"{reminder_text}\"\n"
-                f"at local time: {user_local.strftime('%Y-%m-%d %H:%M')} (UTC offset {offset})."
+                f"You did not choose a reminder option. Defaulting to 15 minutes before.\n"
+                f"Your reminder has been set for \"{reminder_text}\" at local time: "
+                f"{user_local.strftime('%Y-%m-%d %H:%M')} ({zone})."
             )
 
-            # Reset user state to time zone set / ready to accept new messages
-            user_states[chat_id] = 2
-            continue
+            # Reset user state
+            session.state = 2
+            session.clear_prompt()
 
-        # If user is in any other state, or message is not recognized, do nothing special
         else:
-            # Possibly check timeouts or warnings here
-            pass
+            # The conversation moved on (e.g. /start) since the prompt was sent
+            continue
+
+        persist_user(chat_id)
 
 
-def check_timeouts():
+def send_reminders():
     """
-    Check if user has not provided the required input (date/time or option) within 1 minute.
-    If so, send a warning or reset the conversation if they've already been warned.
+    Send every reminder trigger that is due.
+    Due triggers are popped off the scheduler heap, so the cost is
+    proportional to the number of reminders sent, not the number pending.
+    The times they refer to are converted to each chat's zone in one batch.
     """
-    for chat_id, state in user_states.items():
-        if state == 3:
-            # waiting for date/time
-            data = user_temp_data.get(chat_id)
-            if data:
-                prompt_time = data.get("time_prompt_timestamp")
-                if prompt_time:
-                    elapsed = (datetime.now() - prompt_time).total_seconds()
-                    if elapsed > 60:
-                        # Over a minute has passed
-                        if not data["warning_issued"]:
-                            # Issue warning
-                            send_message(
-                                chat_id,
-                                "You haven't provided a date/time within 1 minute. Please respond soon, or send a new message."
-                            )
-                            data["warning_issued"] = True
-                        else:
-                            # They have already been warned; reset conversation
-                            send_message(chat_id, "No date/time received. I'll wait for a new message.")
-                            user_states[chat_id] = 2
-                            # Clear temp data for this chat
-                            user_temp_data.pop(chat_id, None)
+    if not reminders:
+        return
 
-        elif state == 4:
-            # waiting for reminder option
-            data = user_temp_data.get(chat_id)
-            if data:
-                prompt_time = data.get("option_prompt_timestamp")
-                if prompt_time:
-                    elapsed = (datetime.now() - prompt_time).total_seconds()
-                    if elapsed > 60:
-                        # Over a minute has passed, no option chosen => default
-                        reminder_text = data["reminder_text"]
-                        reminder_datetime = data["reminder_datetime"]
-                        (offset, region) = user_timezones[chat_id]
-
-                        # Convert user local time to UTC
-                        user_local = reminder_datetime
-                        reminder_utc = user_local - timedelta(hours=offset)
-                        # Default = 15 min before
-                        final_utc = reminder_utc - timedelta(minutes=15)
-
-                        reminders.append({
-                            "chat_id": chat_id,
-                            "reminder_text": reminder_text,
-                            "final_utc": final_utc,
-                            "original_local": user_local,
-                            "option_chosen": 0  # indicates default
-                        })
-
-                        send_message(
-                            chat_id,
-                            f"You did not choose a reminder option. Defaulting to 15 minutes before.\n"
-                            f"Your reminder has been set for \"{reminder_text}\" at local time: "
-                            f"{user_local.strftime('%Y-%m-%d %H:%M')} (offset {offset})."
-                        )
-
-                        # Reset user state
-                        user_states[chat_id] = 2
-                        user_temp_data.pop(chat_id, None)
+    due = reminders.pop_due(clock())
+    if not due:
+        return
+    zones = [zone_of(r.chat_id) for r, _, _ in due]
+    local_times = localize_batch([r.original_local or fire_utc for r, fire_utc, _ in due], zones)
+    now = clock()
+    for (r, fire_utc, last), local, zone in zip(due, local_times, zones):
+        reminder_lag.observe(max(0, now - fire_utc))
+        text = f"⏰ Reminder! Don't forget:\n\n{r.text}"
+        if r.original_local is not None:
+            text += f"\n\n(set for {local.strftime('%Y-%m-%d %H:%M')})"
+        send_message(r.chat_id, text)
+        later = ()
+        if not last or (len(r.options) > 1 and r.original_local is not None):
+            later = [t for t in fire_times(r, zone) if t > fire_utc]
+        if later:
+            # Remember which triggers are left in case of a restart
+            r.final_utc = later[0]
+            store.update_reminder_times(r)
+            if last:
+                # Loaded at startup with its next trigger only: queue the rest now
+                reminders.push(r, later)
+        elif r.rule is None or r.original_local is None:
+            store.delete_reminder(r.reminder_id)
+        else:
+            reschedule(r, zone, now)
+    store.flush()
 
 
-def send_reminders():
+def reschedule(reminder, zone, now):
     """
-    Periodically check if it's time to send any reminders.
-    We'll compare the current UTC time to each reminder's final_utc.
-    If it's time, we send the reminder and remove it.
+    Move a recurring reminder whose last trigger just fired to its next
+    occurrence. Occurrences whose first trigger has already passed are skipped.
     """
-    global reminders
-    now_utc = datetime.utcnow()
-    if not reminders:
-        return
+    event = reminder.original_local
+    # Option 1 fires up to a day before the event, so start looking a bit earlier
+    event = next_event(reminder.rule, event, zone, max(event, int(now) - 2 * 86400))
+    while min(fire_time(option, event, zone) for option in reminder.options) <= now:
+        event = next_event(reminder.rule, event, zone, event)
+    reminder.original_local = event
+    reminder.final_utc = min(fire_time(option, event, zone) for option in reminder.options)
+    store.update_reminder_times(reminder)
+    queue_reminder(reminder, zone)
 
-    # We'll work on a copy to safely remove from the original
-    for r in reminders[:]:
-        final_utc = r["final_utc"]
-        if now_utc >= final_utc:
-            # Time to remind
-            chat_id = r["chat_id"]
-            reminder_text = r["reminder_text"]
-            send_message(chat_id, f"⏰ Reminder! Don't forget:\n\n{reminder_text}")
-            reminders.remove(r)
+
+# Earliest pending trigger as of the last scheduler tick, for the metrics
+# thread (next_deadline() drops cancelled heap entries, so only the event
+# loop calls it)
+next_due_utc = None
+
+
+def seconds_until_next_tick():
+    """How long the scheduler can sleep: POLL_INTERVAL at most, less if a reminder is due sooner."""
+    global next_due_utc
+    next_due = next_due_utc = reminders.next_deadline()
+    if next_due is None:
+        return POLL_INTERVAL
+    until_due = next_due - clock()
+    return max(0, min(POLL_INTERVAL, until_due))
 
 
 def set_webhook(webhook_url):
     """Set a webhook for the bot (optional if you're using polling)."""
-    try:
-        payload = {"webhookURL": webhook_url}
-        response = requests.post(SET_WEBHOOK_URL, json=payload, headers=HEADERS)
-
-        if response.status_code == 200:
-            response_data = response.json()
-            if response_data.get("success"):
-                # print("Webhook set successfully.")
-                return True
-            else:
-                # print(f"Failed to set webhook. Response: {response_data}")
-                return False
-        else:
-            # print(f"HTTP Error: {response.status_code}, Response: {response.text}")
-            return False
-    except Exception as e:
-        # print(f"Error while setting webhook: {e}")
-        return False
+    return yoai.set_webhook(webhook_url)
+
+
+def build_registry(runtime):
+    """Metrics of this process: the runtime, handlers, delivery and the scheduler."""
+    registry = Registry()
+    register_runtime(registry, runtime)
+    register_router(registry, router)
+    register_outbound(registry, outbound)
+    register_yoai(registry, yoai)
+    registry.value("gauge", "bot_reminders_pending", "Reminders in the scheduler (due within the load horizon)",
+                   lambda: len(reminders))
+    registry.value("gauge", "bot_reminder_triggers_queued", "Scheduler heap entries, including stale ones",
+                   lambda: reminders.queued_triggers)
+    registry.value("gauge", "bot_reminder_next_due_seconds", "Seconds until the next trigger (negative: overdue)",
+                   lambda: (next_due_utc or float("inf")) - clock())
+    registry.histogram("bot_reminder_lag_seconds", "Delay between a trigger's fire time and its send",
+                       lambda: (((), reminder_lag),))
+    registry.value("gauge", "bot_sessions", "Chats with conversation state", lambda: len(sessions))
+    registry.value("gauge", "bot_prompts_pending", "Chats waiting to answer a prompt", lambda: len(prompt_deadlines))
+    registry.value("gauge", "bot_store_pending_writes", "Writes not committed yet", lambda: store.pending)
+    return registry
+
+
+def run_shard(shard, shards, inbox, acks):
+    """
+    Worker process of a sharded deployment: runs the state machine and the
+    scheduler for the chats of one partition, with its own database file and
+    its share of the global send rate.
+    """
+    global store, update_tracker, outbound
+    store.close()
+    store = Store(shard_db_path(store.path, shard, shards))
+    update_tracker = ShardInbox(inbox, acks)
+    outbound = OutboundQueue(yoai.deliver, global_rate=GLOBAL_RATE / shards,
+                             global_burst=max(1, GLOBAL_BURST // shards)).start()
+    load_state()
+
+    def commit_and_ack():
+        # Updates are acknowledged to the ingest process only once committed
+        store.commit()
+        update_tracker.flush_acks()
+
+    runtime = BotRuntime(
+        update_tracker.fetch,
+        handle_update,
+        poll_idle_interval=0,
+        periodic=[
+            (check_timeouts, 1),
+            (send_reminders, seconds_until_next_tick),
+            (load_upcoming, LOAD_STEP),
+            (commit_and_ack, store.commit_interval),
+        ],
+    )
+    if METRICS_PORT:
+        # Shard i serves its metrics on METRICS_PORT + 1 + i
+        MetricsServer(build_registry(runtime), port=METRICS_PORT + 1 + shard,
+                      health=runtime.health).start()
+    runtime.run()
+
+
+def main():
+    """Run the bot (or the ingest process of a sharded bot) until interrupted."""
+    # print("Reminder Bot is running...")
+    if BOT_SHARDS > 1:
+        # This process only polls and routes; the shards do everything else
+        ingest = ShardedIngest(BOT_SHARDS, run_shard, tracker=update_tracker)
+        if METRICS_PORT:
+            registry = Registry()
+            register_ingest(registry, ingest)
+            register_yoai(registry, yoai)
+            MetricsServer(registry, health=ingest.health).start()
+        ingest.run(get_updates)
+        return
 
+    outbound.start()
+    load_state()
+
+    webhook = None
+    if BOT_MODE == "webhook":
+        if not set_webhook(WEBHOOK_URL):
+            print(f"Could not register webhook {WEBHOOK_URL}")
+        webhook = WebhookServer(port=WEBHOOK_PORT, workers=WEBHOOK_WORKERS,
+                                filter_updates=update_tracker.filter)
+
+    # The poller (or webhook server), the timeout checker and the reminder
+    # scheduler run as separate coroutines; updates are handled per chat, in order.
+    runtime = BotRuntime(
+        get_updates,
+        handle_update,
+        periodic=[
+            (check_timeouts, 1),
+            (send_reminders, seconds_until_next_tick),
+            (load_upcoming, LOAD_STEP),
+            (store.flush, store.commit_interval),
+        ],
+        webhook=webhook,
+    )
+    if METRICS_PORT:
+        MetricsServer(build_registry(runtime), health=runtime.health).start()
+    runtime.run()
 
-if __name__ == "__main__":
-    # print("Reminder Bot is running...")
 
-    # Use a simple polling mechanism
-    while True:
-        process_updates()   # Process incoming messages and update states
-        check_timeouts()    # Check if we should warn the user or reset
-        send_reminders()    # Send any reminders that are due
-        time.sleep(5)       # Poll interval (adjust as needed)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import bisect
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0,
+)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (cumulative counts are computed on read)."""
+
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self):
+        """Return {"buckets": [(upper_bound, cumulative_count), ...], "count": n, "sum": s}."""
+        cumulative = 0
+        rows = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            rows.append((bound, cumulative))
+        return {"buckets": rows, "count": self.count, "sum": self.total}
+
+
+class Message:
+    """A decoded incoming message, normalized once for routing."""
+
+    __slots__ = ("chat_id", "text", "key", "args", "raw")
+
+    def __init__(self, raw, text):
+        self.raw = raw
+        self.chat_id = raw.get("chatId")
+        self.text = text
+        # Case-folded, trimmed text used for lookups; computed once per message
+        self.key = text.strip().lower()
+        self.args = ""
+
+    @property
+    def sender_name(self):
+        sender = self.raw.get("sender", {})
+        return f"{sender.get('firstName', '')} {sender.get('lastName', '')}".strip()
+
+
+class Router:
+    """
+    Dispatch table for bot commands.
+
+    Lookup order for a message:
+      1. exact commands ("help", "/start", "usd", ...)   - one dict lookup
+      2. prefix commands by first word ("add <...>", or
+         the bare word with empty args)                   - one dict lookup
+      3. the handler for the chat's conversation state   - one dict lookup
+      4. the fallback handler
+
+    Handlers take a Message and return the handler's result (bots use it
+    as the reply text, or send replies themselves and return None). Each
+    handler's run time is recorded in a LatencyHistogram (see timings)
+    unless the router is created with timed=False.
+    """
+
+    def __init__(self, timed=True):
+        self.timed = timed
+        self.commands = {}
+        self.prefixes = {}
+        self.states = {}
+        self.fallback = None
+        self.timings = {}
+
+    # ----- Registration -----
+    def _timed(self, handler):
+        self.timings.setdefault(handler.__name__, LatencyHistogram())
+        return handler
+
+    def add_command(self, name, handler):
+        self.commands[name.lower()] = self._timed(handler)
+
+    def command(self, *names):
+        """Decorator: handle messages whose whole text is one of `names` (case-insensitive)."""
+        def register(handler):
+            for name in names:
+                self.add_command(name, handler)
+            return handler
+        return register
+
+    def prefix(self, word):
+        """
+        Decorator: handle '<word> <args>' messages; Message.args holds the rest of the text
+        ('' for the bare word, so the handler can reply with its usage).
+        """
+        def register(handler):
+            self.prefixes[word.lower()] = self._timed(handler)
+            return handler
+        return register
+
+    def state(self, state):
+        """Decorator: handle messages from chats in the given conversation state."""
+        def register(handler):
+            self.states[state] = self._timed(handler)
+            return handler
+        return register
+
+    def default(self, handler):
+        """Decorator: handle messages nothing else matched."""
+        self.fallback = self._timed(handler)
+        return handler
+
+    # ----- Dispatch -----
+    def resolve(self, msg, state=None):
+        """Return the handler for msg (setting msg.args for prefix commands), or None."""
+        key = msg.key
+        handler = self.commands.get(key)
+        if handler is not None:
+            return handler
+        if self.prefixes:
+            word = key.partition(" ")[0]
+            handler = self.prefixes.get(word)
+            if handler is not None:
+                msg.args = msg.text.strip()[len(word):].strip()
+                return handler
+        if state is not None:
+            handler = self.states.get(state)
+            if handler is not None:
+                return handler
+        return self.fallback
+
+    def dispatch(self, raw, text, state=None):
+        """Route one decoded message. Returns the handler's result, or None if unrouted."""
+        msg = Message(raw, text)
+        handler = self.resolve(msg, state)
+        if handler is None:
+            return None
+        if not self.timed:
+            return handler(msg)
+        start = time.perf_counter()
+        try:
+            return handler(msg)
+        finally:
+            self.timings[handler.__name__].observe(time.perf_counter() - start)
@@ -0,0 +1,186 @@
+import asyncio
+import inspect
+import time
+from collections import deque
+
+from metrics import LAG_BUCKETS
+from router import LatencyHistogram
+
+# Poll again right away while updates keep coming; back off to this interval when idle
+POLL_IDLE_INTERVAL = 0.5
+
+# Maximum number of handlers running in worker threads at the same time
+MAX_CONCURRENCY = 32
+
+# health() reports a poller that has not completed a poll for this long (seconds)
+POLL_STALE_AFTER = 60
+
+
+class BotRuntime:
+    """
+    asyncio runtime shared by the bots.
+
+    - the poller (or a webhook server) hands each message to its chat's queue
+    - every chat with pending messages gets its own task, so chats are served
+      concurrently while messages of one chat are handled strictly in order
+    - periodic jobs (scheduler, timeout checker, ...) run as separate coroutines
+    - replies queued on the YoAI client are flushed as soon as a handler finishes
+
+    Blocking callables (HTTP calls, SOAP lookups) run in worker threads via
+    asyncio.to_thread; coroutine functions are awaited directly.
+
+    Poll counts and latency, handler errors and how late periodic jobs start
+    are kept as plain counters for metrics.register_runtime().
+    """
+
+    def __init__(self, fetch_updates, handle_message, flush=None, periodic=(),
+                 handlers_in_threads=False, poll_idle_interval=POLL_IDLE_INTERVAL,
+                 max_concurrency=MAX_CONCURRENCY, webhook=None):
+        """
+        fetch_updates:       () -> list of update dicts (blocking)
+        handle_message:      (message) -> None, sync or async
+        flush:               () -> None, delivers queued outgoing messages (blocking)
+        periodic:            iterable of (func, interval); interval is seconds or a
+                             callable returning the seconds until the next run
+        handlers_in_threads: run sync handlers in worker threads (only for
+                             handlers that are safe to run concurrently)
+        webhook:             a webhook.WebhookServer; when given, updates are
+                             pushed to it instead of being polled
+        """
+        self.fetch_updates = fetch_updates
+        self.handle_message = handle_message
+        self.flush = flush
+        self.periodic = list(periodic)
+        self.handlers_in_threads = handlers_in_threads
+        self.poll_idle_interval = poll_idle_interval
+        self.max_concurrency = max_concurrency
+        self.webhook = webhook
+        self._chat_queues = {}
+        self._semaphore = None
+        self._flush_needed = None
+        self.polls = 0
+        self.poll_errors = 0
+        self.updates_received = 0
+        self.poll_latency = LatencyHistogram()
+        self.last_poll = time.monotonic()
+        self.handler_errors = 0
+        self.periodic_lag = {}
+        self.periodic_errors = {}
+
+    # ----- Dispatch -----
+    def dispatch(self, message, done=None):
+        """
+        Queue a message behind any pending messages of the same chat.
+        `done` is an optional future resolved once the message has been handled.
+        """
+        chat_id = message.get("chatId")
+        queue = self._chat_queues.get(chat_id)
+        if queue is not None:
+            queue.append((message, done))
+            return
+        queue = self._chat_queues[chat_id] = deque([(message, done)])
+        asyncio.get_running_loop().create_task(self._drain(chat_id, queue))
+
+    async def process(self, message):
+        """Dispatch a message and wait until it has been handled."""
+        done = asyncio.get_running_loop().create_future()
+        self.dispatch(message, done)
+        await done
+
+    async def _drain(self, chat_id, queue):
+        try:
+            while queue:
+                message, done = queue.popleft()
+                await self._handle(message)
+                if done is not None and not done.done():
+                    done.set_result(None)
+        finally:
+            del self._chat_queues[chat_id]
+
+    async def _handle(self, message):
+        try:
+            if inspect.iscoroutinefunction(self.handle_message):
+                await self.handle_message(message)
+            elif self.handlers_in_threads:
+                async with self._semaphore:
+                    await asyncio.to_thread(self.handle_message, message)
+            else:
+                self.handle_message(message)
+        except Exception as e:
+            self.handler_errors += 1
+            print(f"Error handling message: {e}")
+        if self._flush_needed is not None:
+            self._flush_needed.set()
+
+    # ----- Coroutines -----
+    async def poller(self):
+        while True:
+            start = time.monotonic()
+            try:
+                updates = await asyncio.to_thread(self.fetch_updates)
+            except Exception as e:
+                self.poll_errors += 1
+                print(f"Error fetching updates: {e}")
+                updates = []
+            else:
+                self.last_poll = time.monotonic()
+            self.polls += 1
+            self.updates_received += len(updates)
+            self.poll_latency.observe(time.monotonic() - start)
+            for message in updates:
+                self.dispatch(message)
+            if not updates:
+                await asyncio.sleep(self.poll_idle_interval)
+
+    async def sender(self):
+        while True:
+            await self._flush_needed.wait()
+            self._flush_needed.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"Error sending messages: {e}")
+
+    async def run_periodic(self, func, interval):
+        name = func.__name__
+        lag = self.periodic_lag[name] = LatencyHistogram(LAG_BUCKETS)
+        self.periodic_errors[name] = 0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                func()
+            except Exception as e:
+                self.periodic_errors[name] += 1
+                print(f"Error in {name}: {e}")
+            if self._flush_needed is not None:
+                self._flush_needed.set()
+            delay = interval() if callable(interval) else interval
+            due = loop.time() + delay
+            await asyncio.sleep(delay)
+            lag.observe(max(0.0, loop.time() - due))
+
+    def health(self, stale_after=POLL_STALE_AFTER):
+        """(ok, details) for a health check: a polling runtime must have polled recently."""
+        if self.webhook is not None:
+            return True, {"mode": "webhook"}
+        age = time.monotonic() - self.last_poll
+        return age < stale_after, {"mode": "polling", "last_poll_age": round(age, 1)}
+
+    async def main(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.webhook is not None:
+            tasks = [self.webhook.serve(self)]
+        else:
+            tasks = [self.poller()]
+        if self.flush is not None:
+            self._flush_needed = asyncio.Event()
+            tasks.append(self.sender())
+        tasks.extend(self.run_periodic(func, interval) for func, interval in self.periodic)
+        await asyncio.gather(*tasks)
+
+    def run(self):
+        """Run the bot until interrupted."""
+        try:
+            asyncio.run(self.main())
+        except KeyboardInterrupt:
+            pass
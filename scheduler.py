@@ -0,0 +1,160 @@
+import heapq
+import itertools
+
+
+class ReminderScheduler:
+    """
+    Keeps pending reminders (records.Reminder) in a min-heap of triggers.
+
+    A reminder may have several triggers (e.g. 3 hours before and exactly
+    at the time); every trigger references the same record, so the text is
+    stored once. Triggers carry the reminder's generation: cancel() bumps
+    it, which invalidates all pending triggers of that reminder in O(1),
+    and stale triggers are dropped when they reach the top of the heap
+    (lazy cancellation, tombstones).
+
+    - push() is O(k log n) for k triggers
+    - next_deadline() peeks at the earliest pending trigger in O(1)
+    - pop_due() pops only the triggers that are due
+    """
+
+    def __init__(self):
+        # Heap entries are (fire_utc, seq, reminder, generation)
+        self._heap = []
+        # reminder_id -> [reminder, generation, pending trigger count]
+        self._entries = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._generations = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def push(self, reminder, fire_times=None):
+        """
+        Schedule a reminder at each of fire_times (default: its final_utc) and
+        return its reminder_id. Pushing a scheduled reminder again replaces its
+        triggers (this is how a reminder is edited).
+        """
+        reminder_id = reminder.reminder_id
+        if reminder_id is None:
+            reminder_id = reminder.reminder_id = next(self._ids)
+        if fire_times is None:
+            fire_times = (reminder.final_utc,)
+        # A fresh generation makes any earlier triggers of this reminder stale
+        generation = next(self._generations)
+        self._entries[reminder_id] = [reminder, generation, len(fire_times)]
+        for fire_utc in fire_times:
+            heapq.heappush(self._heap, (fire_utc, next(self._seq), reminder, generation))
+        return reminder_id
+
+    def load(self, reminders, fire_times=None):
+        """
+        Bulk-add reminders that already carry a reminder_id (O(n) heapify).
+        fire_times: optional reminder -> sequence of trigger times.
+        """
+        heap, seq = self._heap, self._seq
+        generation = next(self._generations)
+        for reminder in reminders:
+            times = fire_times(reminder) if fire_times is not None else (reminder.final_utc,)
+            self._entries[reminder.reminder_id] = [reminder, generation, len(times)]
+            for fire_utc in times:
+                heap.append((fire_utc, next(seq), reminder, generation))
+        heapq.heapify(heap)
+
+    @property
+    def queued_triggers(self):
+        """Heap entries, including stale triggers not dropped yet."""
+        return len(self._heap)
+
+    def get(self, reminder_id):
+        entry = self._entries.get(reminder_id)
+        return entry[0] if entry is not None else None
+
+    def cancel(self, reminder_id):
+        """Cancel all pending triggers of a reminder. Returns False if it was not pending."""
+        return self._entries.pop(reminder_id, None) is not None
+
+    def _drop_cancelled(self):
+        heap = self._heap
+        entries = self._entries
+        while heap:
+            entry = entries.get(heap[0][2].reminder_id)
+            if entry is not None and entry[1] == heap[0][3]:
+                return
+            heapq.heappop(heap)
+
+    def next_deadline(self):
+        """Return the time of the earliest pending trigger, or None."""
+        self._drop_cancelled()
+        if not self._heap:
+            return None
+        return self._heap[0][0]
+
+    def pop_due(self, now_utc):
+        """
+        Remove and return every trigger due by now_utc, earliest first, as
+        (reminder, fire_utc, last) tuples; last is True for a reminder's final
+        pending trigger, after which the reminder is no longer scheduled.
+        """
+        heap = self._heap
+        entries = self._entries
+        due = []
+        while heap and heap[0][0] <= now_utc:
+            fire_utc, _, reminder, generation = heapq.heappop(heap)
+            entry = entries.get(reminder.reminder_id)
+            if entry is None or entry[1] != generation:
+                continue
+            entry[2] -= 1
+            last = entry[2] == 0
+            if last:
+                del entries[reminder.reminder_id]
+            due.append((reminder, fire_utc, last))
+        return due
+
+    def pending(self):
+        """Iterate over pending reminders (unordered)."""
+        for entry in self._entries.values():
+            yield entry[0]
+
+
+class DeadlineIndex:
+    """
+    One deadline per key (e.g. per chat), ordered in a min-heap.
+
+    set() replaces a key's deadline and discard() removes it; outdated heap
+    entries are skipped when they surface, so pop_expired() only touches
+    keys whose deadline has actually passed.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def set(self, key, deadline):
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+
+    def discard(self, key):
+        self._deadlines.pop(key, None)
+
+    def pop_expired(self, now):
+        """Remove and return the keys whose deadline is <= now, earliest first."""
+        heap = self._heap
+        expired = []
+        while heap and heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                expired.append(key)
+        return expired
@@ -0,0 +1,308 @@
+"""
+Sharded deployment: one ingest process fetches updates and routes each one to
+the worker process owning its chat, chosen by a stable hash of chat_id.
+
+Every shard keeps its state in its own database file (see shard_db_path), so
+workers never contend for a SQLite write lock. Changing the number of shards
+is an offline step: stop the bot, move users and reminders to the new layout
+and start it with the new count:
+
+    python shard.py rebalance OLD_SHARDS NEW_SHARDS [db_path]
+
+A count of 1 is the plain single-process database, so "rebalance 1 4" shards
+an existing deployment and "rebalance 4 1" merges it back. The old files are
+left untouched and can be used to roll back.
+"""
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import zlib
+
+from storage import DB_PATH, Store
+from updates import UpdateTracker
+
+# Batches of updates waiting for one shard before the ingest process blocks
+SHARD_QUEUE_SIZE = 100
+
+# How long a worker waits on its queue before returning an empty fetch, and
+# how long the ingest process sleeps when getUpdates returned nothing (seconds)
+SHARD_FETCH_TIMEOUT = 0.5
+INGEST_IDLE_INTERVAL = 0.5
+
+# Restarts of a shard in a row without an acknowledgement before its pending
+# updates are given up on (a crash-looping update must not stall the cursor)
+SHARD_MAX_REDELIVERIES = 3
+
+
+def shard_of(chat_id, shards):
+    """Shard owning chat_id. Stable across processes and restarts (unlike hash())."""
+    if shards == 1:
+        return 0
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+
+def shard_db_path(base_path, shard, shards):
+    """Database file of one shard: bot_yo.db -> bot_yo.shard2-of-4.db (1 shard: base_path)."""
+    if shards == 1:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.shard{shard}-of-{shards}{ext}"
+
+
+class ShardInbox:
+    """
+    Worker side of a shard: fetch() feeds BotRuntime from the shard's queue and
+    ack() collects processed update ids, sent back in one batch by flush_acks()
+    once the shard's store has committed them.
+    """
+
+    def __init__(self, inbox, acks, timeout=SHARD_FETCH_TIMEOUT):
+        self.inbox = inbox
+        self.acks = acks
+        self.timeout = timeout
+        self._acked = []
+
+    def fetch(self):
+        try:
+            batch = self.inbox.get(timeout=self.timeout)
+        except queue.Empty:
+            return []
+        updates = []
+        while batch is not None:
+            updates.extend(batch)
+            try:
+                batch = self.inbox.get_nowait()
+            except queue.Empty:
+                return updates
+        # None is the stop signal from ShardedIngest.stop()
+        raise SystemExit
+
+    def ack(self, update):
+        self._acked.append(UpdateTracker.update_id(update))
+
+    def flush_acks(self):
+        if self._acked:
+            acked, self._acked = self._acked, []
+            self.acks.put(acked)
+
+
+class ShardedIngest:
+    """
+    Ingest side of a sharded bot.
+
+    Updates are routed in one batch per shard and poll. A shard handles its
+    chats in order, so per-chat ordering is kept. The persisted getUpdates
+    cursor only advances past the longest prefix of routed updates that every
+    shard has acknowledged, so a crash never skips an unprocessed update.
+    Workers that die are restarted on a fresh queue (the dead process may
+    have held the old one's lock); they reload their state from their own
+    database and get every update routed to them but not acknowledged again.
+    A shard that dies SHARD_MAX_REDELIVERIES times in a row without
+    acknowledging anything has its pending updates dropped with an error.
+
+    worker(shard, shards, inbox, acks, *args) runs in a spawned process.
+    """
+
+    def __init__(self, shards, worker, args=(), tracker=None, queue_size=SHARD_QUEUE_SIZE,
+                 max_redeliveries=SHARD_MAX_REDELIVERIES):
+        self.shards = shards
+        self.worker = worker
+        self.args = tuple(args)
+        self.tracker = tracker
+        self.queue_size = queue_size
+        self.max_redeliveries = max_redeliveries
+        self._ctx = multiprocessing.get_context("spawn")
+        self.inboxes = [self._ctx.Queue(queue_size) for _ in range(shards)]
+        self.acks = self._ctx.Queue()
+        self.processes = [None] * shards
+        self._pending = [{} for _ in range(shards)]   # per shard: update_id -> update, in routing order
+        self._owner = {}                               # update_id -> shard
+        self._failures = [0] * shards                  # restarts since the shard last acknowledged
+        self._stopping = False
+        self.routed = 0
+        self.acked = 0
+        self.restarts = 0
+        self.redelivered = 0
+        self.dropped = 0
+
+    def start(self):
+        for shard in range(self.shards):
+            self._spawn(shard)
+        return self
+
+    def _spawn(self, shard):
+        process = self._ctx.Process(
+            target=self.worker,
+            args=(shard, self.shards, self.inboxes[shard], self.acks) + self.args,
+            name=f"shard-{shard}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[shard] = process
+
+    def route(self, updates):
+        """Hand updates to their shards (blocks while a shard's queue is full)."""
+        batches = [[] for _ in range(self.shards)]
+        for update in updates:
+            shard = shard_of(update.get("chatId"), self.shards)
+            batches[shard].append(update)
+            update_id = UpdateTracker.update_id(update)
+            if update_id is not None:
+                self._pending[shard][update_id] = update
+                self._owner[update_id] = shard
+        for shard, batch in enumerate(batches):
+            if batch:
+                self.inboxes[shard].put(batch)
+        self.routed += len(updates)
+
+    def collect_acks(self, timeout=None):
+        """Apply acknowledgements from the shards; waits up to `timeout` for the first batch."""
+        try:
+            batch = self.acks.get(timeout=timeout) if timeout else self.acks.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            self.acked += len(batch)
+            for update_id in batch:
+                shard = self._owner.pop(update_id, None)
+                if shard is not None:
+                    self._pending[shard].pop(update_id, None)
+                    self._failures[shard] = 0
+            if self.tracker is not None:
+                # The tracker advances the cursor over the acknowledged prefix only
+                for update_id in batch:
+                    self.tracker.ack_id(update_id)
+            try:
+                batch = self.acks.get_nowait()
+            except queue.Empty:
+                break
+        if self.tracker is not None:
+            self.tracker.store.flush()
+
+    def check_workers(self):
+        """Restart shards whose process has died and hand them their unacknowledged updates again."""
+        for shard, process in enumerate(self.processes):
+            if self._stopping or process.is_alive():
+                continue
+            print(f"Shard {shard} exited with code {process.exitcode}; restarting")
+            # Acknowledgements the worker sent before dying are not redelivered
+            self.collect_acks()
+            self.restarts += 1
+            self._failures[shard] += 1
+            if self._pending[shard] and self._failures[shard] > self.max_redeliveries:
+                self._drop(shard)
+            pending = self._pending[shard]
+            self.inboxes[shard] = self._ctx.Queue(self.queue_size)
+            if pending:
+                self.inboxes[shard].put(list(pending.values()))
+                self.redelivered += len(pending)
+            self._spawn(shard)
+
+    def _drop(self, shard):
+        """Give up on a shard's pending updates: the cursor moves past them."""
+        pending, self._pending[shard] = self._pending[shard], {}
+        print(f"Error: shard {shard} died {self._failures[shard]} times without progress; "
+              f"dropping {len(pending)} update(s), ids {min(pending)}..{max(pending)}")
+        self._failures[shard] = 0
+        self.dropped += len(pending)
+        for update_id in pending:
+            del self._owner[update_id]
+            if self.tracker is not None:
+                self.tracker.ack_id(update_id)
+        if self.tracker is not None:
+            self.tracker.store.flush()
+
+    @property
+    def unacked(self):
+        """Routed updates the cursor cannot move past yet."""
+        return self.tracker.in_flight if self.tracker is not None else 0
+
+    def health(self):
+        """(ok, details) for a health check: every shard process must be running."""
+        alive = sum(1 for process in self.processes if process is not None and process.is_alive())
+        return alive == self.shards, {"shards": self.shards, "alive": alive, "restarts": self.restarts,
+                                      "redelivered": self.redelivered, "dropped": self.dropped}
+
+    def run(self, fetch_updates, idle_interval=INGEST_IDLE_INTERVAL):
+        """Start the shards and route updates to them until interrupted."""
+        self.start()
+        try:
+            while True:
+                try:
+                    updates = fetch_updates()
+                except Exception as e:
+                    print(f"Error fetching updates: {e}")
+                    updates = []
+                self.route(updates)
+                self.collect_acks()
+                self.check_workers()
+                if not updates:
+                    time.sleep(idle_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self, timeout=10):
+        self._stopping = True
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for process in self.processes:
+            process.join(timeout)
+        self.collect_acks()
+        if self.tracker is not None:
+            self.tracker.store.commit()
+
+
+def rebalance(base_path, old_shards, new_shards):
+    """
+    Move users and reminders from the old_shards files to new_shards files.
+    Run it while the bot is stopped. Target files are cleared first;
+    reminders get new ids in their new shard.
+    Returns (users, reminders) moved.
+    """
+    if old_shards == new_shards:
+        raise ValueError("shard counts are equal")
+    targets = [Store(shard_db_path(base_path, shard, new_shards)) for shard in range(new_shards)]
+    for target in targets:
+        target.conn.execute("BEGIN")
+        target.conn.execute("DELETE FROM users")
+        target.conn.execute("DELETE FROM reminders")
+
+    users = reminders = 0
+    for shard in range(old_shards):
+        path = shard_db_path(base_path, shard, old_shards)
+        if not os.path.exists(path):
+            continue
+        # Opened through Store so older files get the current columns
+        source = Store(path).conn
+        for row in source.execute("SELECT chat_id, state, tz_offset, tz_region, temp_data FROM users"):
+            targets[shard_of(row[0], new_shards)].conn.execute(
+                "INSERT OR REPLACE INTO users (chat_id, state, tz_offset, tz_region, temp_data) "
+                "VALUES (?, ?, ?, ?, ?)", row)
+            users += 1
+        for row in source.execute(
+            "SELECT chat_id, reminder_text, final_utc, original_local, option_chosen, recurrence, "
+            "lead_options FROM reminders"
+        ):
+            targets[shard_of(row[0], new_shards)].conn.execute(
+                "INSERT INTO reminders (chat_id, reminder_text, final_utc, original_local, option_chosen, "
+                "recurrence, lead_options) VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            reminders += 1
+        source.close()
+
+    for target in targets:
+        target.conn.execute("COMMIT")
+        target.close()
+    return users, reminders
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "rebalance":
+        print("usage: python shard.py rebalance OLD_SHARDS NEW_SHARDS [db_path]")
+        sys.exit(2)
+    path = sys.argv[4] if len(sys.argv) > 4 else DB_PATH
+    moved_users, moved_reminders = rebalance(path, int(sys.argv[2]), int(sys.argv[3]))
+    print(f"Moved {moved_users} users and {moved_reminders} reminders to {sys.argv[3]} shard(s)")
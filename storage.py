@@ -0,0 +1,394 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from alerts import Alert
+from records import Reminder, Session
+from timezones import offset_key
+
+# Default database file, shared by all bots (SQLite in WAL mode allows
+# several processes to use the same file).
+DB_PATH = os.environ.get("BOT_DB_PATH", "bot_yo.db")
+
+# Writes are committed in batches: whichever comes first of BATCH_SIZE pending
+# writes or COMMIT_INTERVAL seconds since the last commit.
+BATCH_SIZE = 500
+COMMIT_INTERVAL = 1.0
+
+EPOCH = datetime(1970, 1, 1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    reminder_id    INTEGER PRIMARY KEY,
+    chat_id        NOT NULL,
+    reminder_text  TEXT    NOT NULL,
+    final_utc      INTEGER NOT NULL,
+    original_local INTEGER,
+    option_chosen  INTEGER NOT NULL DEFAULT 0,
+    recurrence     TEXT,
+    lead_options   TEXT
+);
+CREATE INDEX IF NOT EXISTS reminders_by_due ON reminders (final_utc);
+CREATE INDEX IF NOT EXISTS reminders_by_chat ON reminders (chat_id);
+
+CREATE TABLE IF NOT EXISTS users (
+    chat_id   PRIMARY KEY,
+    state     INTEGER NOT NULL,
+    tz_offset,
+    tz_region TEXT,
+    temp_data TEXT
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS birthdays (
+    chat_id NOT NULL,
+    name    TEXT NOT NULL,
+    date    TEXT NOT NULL,
+    PRIMARY KEY (chat_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS birthday_notifications (
+    chat_id    NOT NULL,
+    name       TEXT NOT NULL,
+    event_date TEXT NOT NULL,
+    sent       INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (chat_id, name, event_date)
+);
+
+CREATE TABLE IF NOT EXISTS notify_prefs (
+    chat_id   PRIMARY KEY,
+    hour      INTEGER NOT NULL,
+    tz_offset INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS price_alerts (
+    alert_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id   NOT NULL,
+    symbol    TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    threshold TEXT NOT NULL
+);
+"""
+
+
+def to_epoch(dt):
+    """Naive UTC datetime -> integer epoch seconds."""
+    return int((dt - EPOCH).total_seconds())
+
+
+def from_epoch(ts):
+    """Integer epoch seconds -> naive UTC datetime."""
+    return EPOCH + timedelta(seconds=ts)
+
+
+# Columns read by _reminder(), in its order
+REMINDER_COLUMNS = (
+    "chat_id, reminder_text, final_utc, original_local, option_chosen, reminder_id, recurrence, lead_options"
+)
+
+# Option tuples are shared between records instead of one tuple per reminder
+_option_sets = {}
+
+
+def _encode_options(options):
+    return ",".join(map(str, options)) if len(options) > 1 else None
+
+
+def _reminder(row):
+    """Reminder from a SELECT of REMINDER_COLUMNS."""
+    chat_id, text, final_utc, original_local, option, reminder_id, rule, lead_options = row
+    key = lead_options or option
+    options = _option_sets.get(key)
+    if options is None:
+        options = _option_sets[key] = (
+            tuple(int(o) for o in lead_options.split(",")) if lead_options else (option,)
+        )
+    return Reminder(chat_id, text, final_utc, original_local, options, reminder_id, rule)
+
+
+def _encode_prompt(session):
+    """JSON for the reminder a chat is setting up, or None."""
+    if not session.has_prompt:
+        return None
+    return json.dumps([session.reminder_text, session.reminder_local, session.warning_issued, session.prompt_at])
+
+
+def _decode_prompt(session, data):
+    if isinstance(data, list):
+        session.reminder_text, session.reminder_local, session.warning_issued, session.prompt_at = data
+        return
+    # Rows written before sessions were records: a dict with ISO datetimes
+    session.reminder_text = data.get("reminder_text")
+    session.warning_issued = data.get("warning_issued", False)
+    local = data.get("reminder_datetime")
+    prompt = data.get("option_prompt_timestamp") if session.state == 4 else data.get("time_prompt_timestamp")
+    session.reminder_local = to_epoch(datetime.fromisoformat(local["__dt__"])) if local else None
+    session.prompt_at = to_epoch(datetime.fromisoformat(prompt["__dt__"])) if prompt else None
+
+
+class Store:
+    """
+    SQLite-backed storage shared by the bots.
+
+    The database runs in WAL mode so a crash never leaves a half-written
+    file, and writes are grouped into batched transactions (see BATCH_SIZE
+    and COMMIT_INTERVAL). Call flush() on every loop tick and on shutdown.
+    The connection is guarded by a lock, so handler threads may share a Store.
+    """
+
+    def __init__(self, path=DB_PATH, batch_size=BATCH_SIZE, commit_interval=COMMIT_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._lock = threading.RLock()
+
+    def _migrate(self):
+        """Add columns introduced after a database file was created."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(reminders)")}
+        for column in ("recurrence", "lead_options"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE reminders ADD COLUMN {column} TEXT")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(birthday_notifications)")}
+        if "sent" not in columns:
+            # Markers written before this column existed were written when sending
+            self.conn.execute("ALTER TABLE birthday_notifications ADD COLUMN sent INTEGER NOT NULL DEFAULT 1")
+        sql = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'price_alerts'").fetchone()[0]
+        if "AUTOINCREMENT" not in sql:
+            # Ids of deleted alerts must never be handed out again (see alerts.py)
+            self.conn.execute("BEGIN")
+            self.conn.execute("ALTER TABLE price_alerts RENAME TO price_alerts_old")
+            self.conn.execute(SCHEMA[SCHEMA.index("CREATE TABLE IF NOT EXISTS price_alerts"):])
+            self.conn.execute("INSERT INTO price_alerts SELECT * FROM price_alerts_old")
+            self.conn.execute("DROP TABLE price_alerts_old")
+            self.conn.execute("COMMIT")
+
+    # ----- Transactions -----
+    def _write(self, sql, params=()):
+        """Run one write statement inside the current batch transaction."""
+        with self._lock:
+            # A failed statement (e.g. "database is locked" while another
+            # process holds the write lock) leaves the batch open, so check
+            # the connection rather than the write count
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            cursor = self.conn.execute(sql, params)
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self.commit()
+            return cursor
+
+    def commit(self):
+        """Commit pending writes now."""
+        with self._lock:
+            if self.conn.in_transaction:
+                self.conn.execute("COMMIT")
+            self._pending = 0
+            self._last_commit = time.monotonic()
+
+    @property
+    def pending(self):
+        """Number of writes in the open batch transaction."""
+        return self._pending
+
+    def flush(self):
+        """Commit pending writes if the commit interval has elapsed."""
+        if self._pending and time.monotonic() - self._last_commit >= self.commit_interval:
+            self.commit()
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    # ----- Key/value metadata (update cursors, ...) -----
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self._write("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ----- Reminders -----
+    def add_reminder(self, reminder):
+        """Insert a Reminder; sets and returns its reminder_id."""
+        cursor = self._write(
+            "INSERT INTO reminders (chat_id, reminder_text, final_utc, original_local, option_chosen, "
+            "recurrence, lead_options) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (reminder.chat_id, reminder.text, reminder.final_utc, reminder.original_local, reminder.options[0],
+             reminder.rule, _encode_options(reminder.options)),
+        )
+        reminder.reminder_id = cursor.lastrowid
+        return cursor.lastrowid
+
+    def update_reminder(self, reminder):
+        """Store a reminder's text, options and rule after an edit."""
+        self._write(
+            "UPDATE reminders SET reminder_text = ?, final_utc = ?, original_local = ?, option_chosen = ?, "
+            "recurrence = ?, lead_options = ? WHERE reminder_id = ?",
+            (reminder.text, reminder.final_utc, reminder.original_local, reminder.options[0],
+             reminder.rule, _encode_options(reminder.options), reminder.reminder_id),
+        )
+
+    def update_reminder_times(self, reminder):
+        """Store the next pending trigger (or occurrence) of a reminder."""
+        self._write(
+            "UPDATE reminders SET final_utc = ?, original_local = ? WHERE reminder_id = ?",
+            (reminder.final_utc, reminder.original_local, reminder.reminder_id),
+        )
+
+    def delete_reminder(self, reminder_id):
+        self._write("DELETE FROM reminders WHERE reminder_id = ?", (reminder_id,))
+
+    def load_reminders(self):
+        """Return all pending reminders as Reminder records (unordered; the scheduler heapifies them)."""
+        rows = self.conn.execute(f"SELECT {REMINDER_COLUMNS} FROM reminders")
+        return [_reminder(row) for row in rows]
+
+    def get_reminder(self, reminder_id):
+        """The stored reminder with this id, or None."""
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT {REMINDER_COLUMNS} FROM reminders WHERE reminder_id = ?", (reminder_id,)
+            ).fetchone()
+        return _reminder(row) if row is not None else None
+
+    def reminders_for_chat(self, chat_id):
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {REMINDER_COLUMNS} FROM reminders WHERE chat_id = ? ORDER BY final_utc",
+                (chat_id,),
+            ).fetchall()
+        return [_reminder(row) for row in rows]
+
+    def due_reminders(self, now_utc):
+        """Reminders with final_utc <= now_utc (epoch seconds), using the due-time index."""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {REMINDER_COLUMNS} FROM reminders WHERE final_utc <= ? ORDER BY final_utc",
+                (now_utc,),
+            ).fetchall()
+        return [_reminder(row) for row in rows]
+
+    def reminders_between(self, after_utc, until_utc):
+        """Reminders with after_utc < final_utc <= until_utc, using the due-time index."""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {REMINDER_COLUMNS} FROM reminders WHERE final_utc > ? AND final_utc <= ?",
+                (after_utc, until_utc),
+            ).fetchall()
+        return [_reminder(row) for row in rows]
+
+    # ----- Users (reminder.py conversation state) -----
+    def save_user(self, chat_id, session):
+        """Write a chat's Session."""
+        self._write(
+            "INSERT OR REPLACE INTO users (chat_id, state, tz_offset, tz_region, temp_data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (chat_id, session.state, session.tz, session.tz_region, _encode_prompt(session)),
+        )
+
+    def load_users(self):
+        """Return {chat_id: Session}."""
+        sessions = {}
+        rows = self.conn.execute("SELECT chat_id, state, tz_offset, tz_region, temp_data FROM users")
+        for chat_id, state, tz, region, temp_data in rows:
+            # tz_offset holds a zone key; rows from before zone support hold whole hours
+            if isinstance(tz, int):
+                tz = offset_key(tz * 60)
+            session = sessions[chat_id] = Session(state, tz, region)
+            if temp_data:
+                _decode_prompt(session, json.loads(temp_data))
+        return sessions
+
+    # ----- Birthdays (Todo.py) -----
+    def save_birthday(self, chat_id, name, date_str):
+        self._write(
+            "INSERT OR REPLACE INTO birthdays (chat_id, name, date) VALUES (?, ?, ?)",
+            (chat_id, name, date_str),
+        )
+
+    def delete_birthday(self, chat_id, name):
+        self._write("DELETE FROM birthdays WHERE chat_id = ? AND name = ?", (chat_id, name))
+
+    def load_birthdays(self):
+        """Return a list of (chat_id, name, date_str) rows."""
+        return self.conn.execute("SELECT chat_id, name, date FROM birthdays").fetchall()
+
+    def claim_notification(self, chat_id, name, event_date):
+        """
+        Record the notification for an event occurrence as pending.
+        Returns False if it was already recorded (pending or sent).
+        """
+        cursor = self._write(
+            "INSERT OR IGNORE INTO birthday_notifications (chat_id, name, event_date, sent) VALUES (?, ?, ?, 0)",
+            (chat_id, name, event_date),
+        )
+        return cursor.rowcount == 1
+
+    def mark_notification_sent(self, chat_id, name, event_date):
+        self._write(
+            "UPDATE birthday_notifications SET sent = 1 WHERE chat_id = ? AND name = ? AND event_date = ?",
+            (chat_id, name, event_date),
+        )
+
+    def pending_notifications(self):
+        """Claimed notifications not delivered yet, as (chat_id, name, event_date) rows."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT chat_id, name, event_date FROM birthday_notifications WHERE sent = 0"
+            ).fetchall()
+
+    def prune_notifications(self, before_date):
+        """Forget sent-markers of occurrences before before_date (YYYY-MM-DD)."""
+        self._write("DELETE FROM birthday_notifications WHERE event_date < ?", (before_date,))
+
+    def save_notify_pref(self, chat_id, hour, tz_offset):
+        self._write(
+            "INSERT OR REPLACE INTO notify_prefs (chat_id, hour, tz_offset) VALUES (?, ?, ?)",
+            (chat_id, hour, tz_offset),
+        )
+
+    def load_notify_prefs(self):
+        """Return {chat_id: (hour, tz_offset)}."""
+        with self._lock:
+            rows = self.conn.execute("SELECT chat_id, hour, tz_offset FROM notify_prefs").fetchall()
+        return {chat_id: (hour, tz_offset) for chat_id, hour, tz_offset in rows}
+
+    # ----- Price alerts (bot.py) -----
+    def add_alert(self, alert):
+        """Insert an Alert; sets and returns its alert_id."""
+        cursor = self._write(
+            "INSERT INTO price_alerts (chat_id, symbol, direction, threshold) VALUES (?, ?, ?, ?)",
+            (alert.chat_id, alert.symbol, alert.direction, str(alert.threshold)),
+        )
+        alert.alert_id = cursor.lastrowid
+        return cursor.lastrowid
+
+    def delete_alerts(self, alert_ids):
+        """Delete fired or cancelled alerts (one batched transaction however many there are)."""
+        for alert_id in alert_ids:
+            self._write("DELETE FROM price_alerts WHERE alert_id = ?", (alert_id,))
+
+    def load_alerts(self):
+        """Return all pending alerts as Alert records."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT chat_id, symbol, direction, threshold, alert_id FROM price_alerts"
+            ).fetchall()
+        return [Alert(chat_id, symbol, direction, Decimal(threshold), alert_id)
+                for chat_id, symbol, direction, threshold, alert_id in rows]
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The bots are flat modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class MemoryStore:
+    """The metadata part of storage.Store, in memory (what an UpdateTracker uses)."""
+
+    def __init__(self):
+        self.meta = {}
+
+    def get_meta(self, key, default=None):
+        return self.meta.get(key, default)
+
+    def set_meta(self, key, value):
+        self.meta[key] = value
+
+    def flush(self):
+        pass
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def memory_store():
+    return MemoryStore()
@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+from alerts import ABOVE, BELOW, Alert, AlertBook
+from storage import Store
+
+
+def test_add_cancel_readd_evaluate(tmp_path):
+    store = Store(str(tmp_path / "alerts.db"))
+    book = AlertBook()
+
+    btc = Alert("c", "BTC", ABOVE, Decimal("1000"))
+    store.add_alert(btc)
+    book.add(btc)
+    book.cancel(btc.alert_id)
+    store.delete_alerts([btc.alert_id])
+
+    usd = Alert("c", "USD", BELOW, Decimal("380"))
+    store.add_alert(usd)
+    book.add(usd)
+    # The cancelled alert's id is not handed out again
+    assert usd.alert_id != btc.alert_id
+
+    assert book.evaluate("BTC", Decimal("2000")) == []
+    assert book.evaluate("USD", Decimal("300")) == [usd]
+    assert len(book) == 0
+    store.close()
+
+
+def test_tombstone_of_a_reused_id_does_not_fire_the_new_alert():
+    book = AlertBook()
+    book.add(Alert("c", "BTC", ABOVE, Decimal("1000"), 1))
+    book.cancel(1)
+    book.add(Alert("c", "USD", BELOW, Decimal("380"), 1))
+    book.add(Alert("c", "BTC", ABOVE, Decimal("5000"), 2))
+    book.cancel(2)
+    book.add(Alert("c", "BTC", ABOVE, Decimal("9000"), 2))
+
+    assert book.evaluate("BTC", Decimal("6000")) == []
+    assert [alert.alert_id for alert in book.evaluate("USD", Decimal("300"))] == [1]
+    assert [alert.alert_id for alert in book.evaluate("BTC", Decimal("9000"))] == [2]
+
+
+def test_boundary_is_exact_in_decimal():
+    book = AlertBook()
+    # Both thresholds are 1.0 as floats
+    above = Alert("c", "USD", ABOVE, Decimal("1.00000000000000001"), 1)
+    below = Alert("c", "EUR", BELOW, Decimal("0.99999999999999999"), 2)
+    book.add(above)
+    book.add(below)
+
+    assert book.evaluate("USD", Decimal("1")) == []
+    assert book.evaluate("EUR", Decimal("1")) == []
+    assert book.evaluate("USD", Decimal("1.00000000000000001")) == [above]
+    assert book.evaluate("EUR", 0.99) == [below]
+    assert len(book) == 0
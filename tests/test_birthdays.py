@@ -0,0 +1,60 @@
+import importlib
+from collections import deque
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from birthdays import BirthdayCalendar, next_occurrence
+from storage import Store
+
+LEAP_DAY = date(2000, 2, 29)
+
+
+def test_leap_day_falls_on_feb_28_in_other_years():
+    calendar = BirthdayCalendar()
+    calendar.add("c", "Leap", LEAP_DAY)
+    calendar.add("c", "March", date(1990, 3, 1))
+
+    assert [(day, name) for day, _, name, _ in calendar.upcoming(date(2025, 2, 26), 4)] == [
+        (date(2025, 2, 28), "Leap"), (date(2025, 3, 1), "March")]
+    assert [(day, name) for day, _, name, _ in calendar.upcoming(date(2024, 2, 26), 4)] == [
+        (date(2024, 2, 29), "Leap"), (date(2024, 3, 1), "March")]
+    assert next_occurrence(LEAP_DAY, date(2025, 1, 1)) == date(2025, 2, 28)
+    assert next_occurrence(LEAP_DAY, date(2027, 3, 1)) == date(2028, 2, 29)
+
+
+def test_calendar_is_per_chat():
+    calendar = BirthdayCalendar()
+    calendar.add("a", "Ann", date(1990, 5, 1))
+    calendar.add("b", "Ann", date(1990, 5, 2))
+    calendar.add("a", "Ann", date(1990, 5, 3))    # replaces a's Ann
+    assert len(calendar) == 2
+    assert [(chat_id, day) for day, chat_id, _, _ in calendar.upcoming(date(2025, 4, 30), 7)] == [
+        ("b", date(2025, 5, 2)), ("a", date(2025, 5, 3))]
+    assert calendar.remove("a", "Ann") and not calendar.remove("a", "Ann")
+    assert [name for _, name, _ in calendar.for_owner("b", date(2025, 1, 1))] == ["Ann"]
+
+
+@pytest.fixture
+def todo_bot(tmp_path, monkeypatch):
+    # Todo.py opens its database in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("Todo")
+    monkeypatch.setattr(module, "store", Store(str(tmp_path / "birthdays.db")))
+    monkeypatch.setattr(module, "birthdays", BirthdayCalendar())
+    monkeypatch.setattr(module, "notify_prefs", {})
+    monkeypatch.setattr(module, "notification_queue", deque())
+    yield module
+    module.store.close()
+
+
+@pytest.mark.parametrize("offset", [-12, 0, 4, 14])
+def test_leap_day_birthday_is_notified_once_in_a_non_leap_year(todo_bot, offset):
+    todo_bot.birthdays.add("c", "Leap", LEAP_DAY)
+    todo_bot.notify_prefs["c"] = (9, offset)
+    # Hourly sweeps from mid-February until after the birthday
+    now = datetime(2025, 2, 10)
+    while now < datetime(2025, 3, 3):
+        todo_bot.check_upcoming_birthdays(now)
+        now += timedelta(hours=1)
+    assert list(todo_bot.notification_queue) == [("c", "Leap", "2025-02-28")]
@@ -0,0 +1,29 @@
+import importlib
+from decimal import Decimal
+
+import pytest
+
+from crossrates import CrossRates
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    # bot.py opens its database in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("bot")
+    rates = CrossRates({"USD": Decimal("390.5")}, {"BTC": Decimal("38000000"), "DOGE": Decimal("50")})
+    monkeypatch.setattr(module, "get_cross_rates", lambda: rates)
+    return module
+
+
+def convert(bot, text):
+    return bot.router.dispatch({"chatId": "c"}, text)
+
+
+def test_conversion(bot):
+    assert convert(bot, "100 USD to AMD") == "100 USD = 39050.00 AMD (1 USD = 390.5 AMD)."
+
+
+def test_amount_too_large_for_the_precision_gets_a_reply(bot):
+    assert convert(bot, "999999999999999 BTC to DOGE") == (
+        "Sorry, 999999999999999 BTC is too large an amount to convert to DOGE.")
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from dateparse import parse_when
+from timezones import local_to_utc
+
+ZONE = "Asia/Yerevan"
+NOW = local_to_utc(datetime(2025, 1, 15, 14, 0), ZONE)  # a Wednesday
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2025-01-20 10:00", "2025-01-20 10:00"),
+    ("2025-1-2 7:05", "2025-01-02 07:05"),
+    ("2025-02-01", "2025-02-01 09:00"),
+    ("in 2h", "2025-01-15 16:00"),
+    ("in 90 min", "2025-01-15 15:30"),
+    ("in 1h30m", "2025-01-15 15:30"),
+    ("In 3 days", "2025-01-18 14:00"),
+    ("in 1 week", "2025-01-22 14:00"),
+    ("18:00", "2025-01-15 18:00"),
+    ("9:00", "2025-01-16 09:00"),
+    ("9am", "2025-01-16 09:00"),
+    ("9:30 pm", "2025-01-15 21:30"),
+    ("12am", "2025-01-16 00:00"),
+    ("today 18:00", "2025-01-15 18:00"),
+    ("tomorrow 9:00", "2025-01-16 09:00"),
+    ("Tomorrow at 9", "2025-01-16 09:00"),
+    ("tomorrow", "2025-01-16 09:00"),
+    ("fri 14:30", "2025-01-17 14:30"),
+    ("wed 18:00", "2025-01-15 18:00"),
+    ("wed 10:00", "2025-01-22 10:00"),
+    ("next mon 14:30", "2025-01-20 14:30"),
+    ("next wed", "2025-01-22 09:00"),
+    ("monday at 8:15", "2025-01-20 08:15"),
+    ("25.12 18:00", "2025-12-25 18:00"),
+    ("01.01 00:00", "2026-01-01 00:00"),
+    ("25.12.2026 18:00", "2026-12-25 18:00"),
+    ("25/12", "2025-12-25 09:00"),
+    ("", None),
+    ("soon", None),
+    ("in 2 fortnights", None),
+    ("25:00", None),
+    ("13pm", None),
+    ("31.02 10:00", None),
+    ("2025-13-01 10:00", None),
+    ("next blursday", None),
+])
+def test_parse_when(text, expected):
+    result = parse_when(text, ZONE, NOW)
+    assert (result.strftime("%Y-%m-%d %H:%M") if result else None) == expected
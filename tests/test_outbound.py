@@ -0,0 +1,34 @@
+import time
+
+from outbound import OutboundQueue
+
+
+def test_throttled_chat_does_not_hold_up_others():
+    delivered = []
+
+    def send(chat_id, text):
+        delivered.append((chat_id, text, time.monotonic()))
+        return True
+
+    def wait_for(condition, timeout):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    # Chat "a" may send one message every two seconds
+    queue = OutboundQueue(send, workers=2, chat_rate=0.5, chat_burst=1).start()
+    try:
+        queue.submit("a", "a1")
+        queue.submit("a", "a2")
+        wait_for(lambda: queue.sent == 1, 1)
+        # "a" is now throttled at the head of the schedule
+        submitted = time.monotonic()
+        queue.submit("b", "b1")
+        wait_for(lambda: len(delivered) == 2, 1)
+
+        assert [text for _, text, _ in delivered] == ["a1", "b1"]
+        assert delivered[1][2] - submitted < 0.5
+        assert queue.join(5)
+        assert [text for _, text, _ in delivered] == ["a1", "b1", "a2"]
+    finally:
+        queue.stop(1)
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from prices import BACKOFF_INITIAL, BACKOFF_MAX, CryptoPriceService, RateLimited
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_network_errors_back_off_like_rate_limits():
+    clock = Clock()
+    calls = []
+
+    def fetch(ids):
+        calls.append(clock.now)
+        raise TimeoutError("read timed out")
+
+    service = CryptoPriceService(fetch, ["bitcoin"], clock=clock)
+    for _ in range(100):
+        assert service.get("bitcoin") is None
+    assert len(calls) == 1
+
+    # Doubles on every failure in a row, up to the cap
+    clock.now += BACKOFF_INITIAL
+    service.get("bitcoin")
+    clock.now += BACKOFF_INITIAL
+    service.get("bitcoin")
+    assert len(calls) == 2
+    clock.now += BACKOFF_INITIAL
+    service.get("bitcoin")
+    assert len(calls) == 3
+    clock.now += 10 * BACKOFF_MAX
+    service.get("bitcoin")
+    clock.now += BACKOFF_MAX
+    service.get("bitcoin")
+    assert len(calls) == 5
+
+
+def test_retry_after_is_honoured():
+    clock = Clock()
+    service = CryptoPriceService(lambda ids: (_ for _ in ()).throw(RateLimited(5)), ["bitcoin"], clock=clock)
+    assert not service.refresh()
+    clock.now += 4
+    assert not service.refresh()
+    assert service.upstream_calls == 1
+    clock.now += 1
+    service.refresh()
+    assert service.upstream_calls == 2
+
+
+def test_listeners_do_not_block_get():
+    clock = Clock()
+    service = CryptoPriceService(lambda ids: {"bitcoin": 1.0}, ["bitcoin"], clock=clock)
+    in_listener = threading.Event()
+    release = threading.Event()
+
+    @service.on_refresh
+    def slow_listener(prices):
+        in_listener.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=service.refresh)
+    thread.start()
+    try:
+        assert in_listener.wait(5)
+        # A caller with a stale snapshot is not blocked by the listener
+        clock.now += 2 * service.ttl
+        start = time.monotonic()
+        assert service.get("bitcoin") == 1.0
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        thread.join()
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+from recurrence import anchor_rule, describe, next_event, rule_kind, split_rule
+from timezones import local_to_utc, utc_to_local
+
+
+@pytest.mark.parametrize("text, kind, rest", [
+    ("every 2 days", "daily/2", ""),
+    ("4 every 2 weeks", "weekly/2", "4"),
+    ("1 every 3 months", "monthly/3", "1"),
+    ("2 4 every 1 day", "daily", "2 4"),
+    ("every 2 years", "yearly/2", ""),
+    ("3 every 90 min", "every:5400", "3"),
+    ("4 daily", "daily", "4"),
+    ("4", None, "4"),
+])
+def test_split_rule(text, kind, rest):
+    assert split_rule(text) == (kind, rest)
+
+
+@pytest.mark.parametrize("text", ["4 every 2 fortnights", "every other day", "4 every 0 days", "1 every 0 min"])
+def test_unreadable_repeat_phrase_is_rejected(text):
+    with pytest.raises(ValueError):
+        split_rule(text)
+
+
+def test_every_three_months_keeps_the_day_and_local_time():
+    zone = "Europe/Berlin"
+    start = datetime(2025, 1, 31, 9, 0)
+    kind, _ = split_rule("every 3 months")
+    rule = anchor_rule(kind, start)
+    assert rule == "monthly:31/3"
+    assert describe(rule) == "every 3 months"
+    assert rule_kind(rule) == "monthly/3"
+
+    event = local_to_utc(start, zone)
+    dates = []
+    for _ in range(3):
+        event = next_event(rule, event, zone, event)
+        dates.append(utc_to_local(event, zone))
+    # Clamped to short months; 9:00 local across the DST change
+    assert dates == [datetime(2025, 4, 30, 9, 0), datetime(2025, 7, 31, 9, 0), datetime(2025, 10, 31, 9, 0)]
+
+
+def test_every_two_weeks_skips_a_long_gap_in_one_jump():
+    zone = "UTC"
+    rule = anchor_rule("weekly/2", datetime(2025, 1, 1, 8, 0))
+    event = local_to_utc(datetime(2025, 1, 1, 8, 0), zone)
+    after = local_to_utc(datetime(2025, 3, 1, 0, 0), zone)
+    assert utc_to_local(next_event(rule, event, zone, after), zone) == datetime(2025, 3, 12, 8, 0)
@@ -0,0 +1,63 @@
+import base64
+import importlib
+
+import pytest
+
+from router import Router
+
+
+@pytest.fixture
+def router():
+    router = Router(timed=False)
+    router.command("/list")(lambda msg: ("list", msg.args))
+    router.prefix("/cancel")(lambda msg: ("cancel", msg.args))
+    router.prefix("/edit")(lambda msg: ("edit", msg.args))
+    for state in (1, 3, 4):
+        router.state(state)(lambda msg, state=state: (f"state {state}", msg.text))
+    router.default(lambda msg: ("unknown", msg.text))
+    return router
+
+
+STATES = [None, 1, 3, 4]
+
+
+@pytest.mark.parametrize("state", STATES)
+@pytest.mark.parametrize("text, expected", [
+    ("/cancel", ("cancel", "")),
+    ("  /Cancel ", ("cancel", "")),
+    ("/edit", ("edit", "")),
+    ("/cancel 12", ("cancel", "12")),
+    ("/edit 12 Tomorrow 9:00", ("edit", "12 Tomorrow 9:00")),
+    ("/list", ("list", "")),
+])
+def test_commands_win_over_the_state(router, state, text, expected):
+    assert router.dispatch({"chatId": "c"}, text, state=state) == expected
+
+
+@pytest.mark.parametrize("state", STATES)
+@pytest.mark.parametrize("text", ["/unknown", "/unknown 12", "/cancelled", "buy milk"])
+def test_other_text_goes_to_the_state_handler(router, state, text):
+    expected = ("unknown", text) if state is None else (f"state {state}", text)
+    assert router.dispatch({"chatId": "c"}, text, state=state) == expected
+
+
+@pytest.fixture
+def reminder_bot(tmp_path, monkeypatch):
+    # reminder.py opens its database in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("reminder")
+    sent = []
+    monkeypatch.setattr(module, "send_message", lambda chat_id, text: sent.append(text))
+    monkeypatch.setattr(module, "sessions", {})
+    return module, sent
+
+
+@pytest.mark.parametrize("command", ["/cancel", "/edit"])
+def test_bare_command_while_waiting_for_the_reminder_text(reminder_bot, command):
+    module, sent = reminder_bot
+    session = module.sessions["c"] = module.Session()
+    session.state = 3
+    module.handle_message({"chatId": "c", "text": base64.b64encode(command.encode()).decode()})
+    assert session.state == 3
+    assert session.reminder_text is None
+    assert len(sent) == 1 and sent[0].startswith(f"Usage: {command} <id>")
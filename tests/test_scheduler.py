@@ -0,0 +1,86 @@
+from records import Reminder
+from scheduler import DeadlineIndex, ReminderScheduler
+
+
+def reminder(final_utc, text="r"):
+    return Reminder("c", text, final_utc)
+
+
+def test_triggers_come_out_in_time_order():
+    scheduler = ReminderScheduler()
+    late, early, middle = reminder(300, "late"), reminder(100, "early"), reminder(200, "middle")
+    for r in (late, early, middle):
+        scheduler.push(r)
+    assert scheduler.next_deadline() == 100
+    assert [(r.text, t, last) for r, t, last in scheduler.pop_due(250)] == [
+        ("early", 100, True), ("middle", 200, True)]
+    assert len(scheduler) == 1
+    assert scheduler.pop_due(299) == []
+    assert [r.text for r, _, _ in scheduler.pop_due(300)] == ["late"]
+    assert not scheduler and scheduler.next_deadline() is None
+
+
+def test_several_triggers_of_one_reminder():
+    scheduler = ReminderScheduler()
+    r = reminder(1000)
+    scheduler.push(r, fire_times=(1000 - 3 * 3600, 1000 - 900, 1000))
+    assert [(t, last) for _, t, last in scheduler.pop_due(1000 - 900)] == [(1000 - 3 * 3600, False),
+                                                                          (1000 - 900, False)]
+    assert scheduler.get(r.reminder_id) is r
+    assert scheduler.pop_due(1000) == [(r, 1000, True)]
+    assert scheduler.get(r.reminder_id) is None
+
+
+def test_reschedule_leaves_stale_triggers_as_tombstones():
+    scheduler = ReminderScheduler()
+    r = reminder(100)
+    reminder_id = scheduler.push(r, fire_times=(50, 100))
+    # Editing pushes the reminder again: the old triggers must never fire
+    r.final_utc = 500
+    assert scheduler.push(r) == reminder_id
+    assert scheduler.queued_triggers == 3
+    assert scheduler.next_deadline() == 500
+    assert scheduler.queued_triggers == 1
+    assert scheduler.pop_due(400) == []
+    assert scheduler.pop_due(500) == [(r, 500, True)]
+
+
+def test_cancel_drops_every_trigger():
+    scheduler = ReminderScheduler()
+    kept, cancelled = reminder(200, "kept"), reminder(100, "cancelled")
+    scheduler.push(kept)
+    scheduler.push(cancelled, fire_times=(80, 100))
+    assert scheduler.cancel(cancelled.reminder_id)
+    assert not scheduler.cancel(cancelled.reminder_id)
+    assert len(scheduler) == 1
+    assert scheduler.next_deadline() == 200
+    assert [r.text for r, _, _ in scheduler.pop_due(1000)] == ["kept"]
+
+
+def test_cancelled_triggers_are_skipped_without_a_peek():
+    scheduler = ReminderScheduler()
+    r = reminder(100)
+    scheduler.push(r)
+    scheduler.cancel(r.reminder_id)
+    scheduler.push(reminder(100, "other"))
+    assert [other.text for other, _, _ in scheduler.pop_due(100)] == ["other"]
+
+
+def test_bulk_load_keeps_ids_and_order():
+    scheduler = ReminderScheduler()
+    loaded = [Reminder("c", str(i), t, reminder_id=i + 1) for i, t in enumerate((30, 10, 20))]
+    scheduler.load(loaded)
+    assert [r.reminder_id for r, _, _ in scheduler.pop_due(30)] == [2, 3, 1]
+
+
+def test_deadline_index_keeps_the_latest_deadline_per_key():
+    index = DeadlineIndex()
+    index.set("a", 10)
+    index.set("b", 20)
+    index.set("a", 30)    # moved: the entry at 10 is stale
+    index.set("c", 15)
+    index.discard("c")
+    assert index.pop_expired(25) == ["b"]
+    assert "a" in index and len(index) == 1
+    assert index.pop_expired(30) == ["a"]
+    assert len(index) == 0
@@ -0,0 +1,60 @@
+import os
+import time
+
+from shard import ShardInbox, ShardedIngest
+from updates import UpdateTracker
+
+
+def crashing_worker(shard, shards, inbox, acks, marker, crash_id, crashes):
+    """Acknowledges every update, but exits on update `crash_id` the first `crashes` times it sees it."""
+    shard_inbox = ShardInbox(inbox, acks, timeout=0.05)
+    while True:
+        for update in shard_inbox.fetch():
+            update_id = UpdateTracker.update_id(update)
+            if update_id == crash_id:
+                with open(marker, "a") as f:
+                    f.write("x")
+                with open(marker) as f:
+                    if len(f.read()) <= crashes:
+                        os._exit(1)
+            shard_inbox.ack(update)
+        shard_inbox.flush_acks()
+
+
+def run_until_idle(ingest, timeout=30):
+    deadline = time.monotonic() + timeout
+    while ingest.unacked and time.monotonic() < deadline:
+        ingest.collect_acks(timeout=0.05)
+        ingest.check_workers()
+
+
+def start(tmp_path, memory_store, crashes):
+    tracker = UpdateTracker(memory_store, "test")
+    ingest = ShardedIngest(1, crashing_worker, args=(str(tmp_path / "crashes"), 2, crashes),
+                           tracker=tracker, max_redeliveries=2).start()
+    ingest.route(tracker.filter([{"updateId": update_id, "chatId": "c"} for update_id in (1, 2, 3)]))
+    return tracker, ingest
+
+
+def test_dead_shard_gets_its_unacknowledged_updates_again(tmp_path, memory_store):
+    tracker, ingest = start(tmp_path, memory_store, crashes=1)
+    try:
+        run_until_idle(ingest)
+        assert tracker.cursor == 3
+        assert ingest.restarts == 1
+        # The batch was not acknowledged, so update 1 is handed over again too
+        assert ingest.redelivered == 3
+        assert ingest.dropped == 0
+    finally:
+        ingest.stop()
+
+
+def test_crash_looping_update_is_dropped(tmp_path, memory_store):
+    tracker, ingest = start(tmp_path, memory_store, crashes=100)
+    try:
+        run_until_idle(ingest)
+        assert tracker.cursor == 3
+        assert ingest.restarts == 3
+        assert ingest.dropped == 3
+    finally:
+        ingest.stop()
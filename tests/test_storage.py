@@ -0,0 +1,81 @@
+import importlib
+import sqlite3
+
+import pytest
+
+from records import Reminder, Session
+from scheduler import DeadlineIndex, ReminderScheduler
+from storage import Store
+
+HOUR = 3600
+NOW = 1_735_689_600  # 2025-01-01 00:00 UTC
+
+
+def committed_users(path):
+    """Users another connection (e.g. after a crash) can see."""
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT chat_id FROM users")}
+    finally:
+        conn.close()
+
+
+def test_writes_are_committed_in_batches(tmp_path):
+    path = str(tmp_path / "bot.db")
+    store = Store(path, batch_size=3, commit_interval=3600)
+    store.save_user("a", Session(2, "UTC"))
+    store.save_user("b", Session(2, "UTC"))
+    assert store.pending == 2
+    assert committed_users(path) == set()
+
+    # The third write fills the batch
+    store.save_user("c", Session(2, "UTC"))
+    assert store.pending == 0
+    assert committed_users(path) == {"a", "b", "c"}
+
+    # flush() commits a partial batch only once the interval has passed
+    store.save_user("d", Session(2, "UTC"))
+    store.flush()
+    assert committed_users(path) == {"a", "b", "c"}
+    store.commit_interval = 0
+    store.flush()
+    assert committed_users(path) == {"a", "b", "c", "d"}
+    store.close()
+
+
+@pytest.fixture
+def reminder_bot(tmp_path, monkeypatch):
+    # reminder.py opens its database in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("reminder")
+    monkeypatch.setattr(module, "reminders", ReminderScheduler())
+    monkeypatch.setattr(module, "prompt_deadlines", DeadlineIndex())
+    monkeypatch.setattr(module, "sessions", {})
+    monkeypatch.setattr(module, "loaded_until", 0)
+    return module
+
+
+def test_load_horizon_across_a_restart(tmp_path, monkeypatch, reminder_bot):
+    path = str(tmp_path / "restart.db")
+    store = Store(path)
+    due_in = {"overdue": -HOUR, "soon": HOUR, "tomorrow": 23 * HOUR, "later": 25 * HOUR, "next week": 7 * 24 * HOUR}
+    ids = {text: store.add_reminder(Reminder("c", text, NOW + offset)) for text, offset in due_in.items()}
+    store.close()
+
+    # A fresh process: only what is due within the horizon is scheduled
+    monkeypatch.setattr(reminder_bot, "store", Store(path))
+    monkeypatch.setattr(reminder_bot, "clock", lambda: NOW)
+    reminder_bot.load_state()
+    assert sorted(r.text for r in reminder_bot.reminders.pending()) == ["overdue", "soon", "tomorrow"]
+    assert reminder_bot.loaded_until == NOW + reminder_bot.LOAD_HORIZON
+
+    # Advancing the horizon picks up what entered it, once
+    monkeypatch.setattr(reminder_bot, "clock", lambda: NOW + 2 * HOUR)
+    reminder_bot.load_upcoming()
+    reminder_bot.load_upcoming()
+    assert reminder_bot.reminders.queued_triggers == 4
+    assert reminder_bot.reminders.get(ids["later"]).text == "later"
+    assert reminder_bot.reminders.get(ids["next week"]) is None
+    assert [r.text for r, _, _ in reminder_bot.reminders.pop_due(NOW + 25 * HOUR)] == [
+        "overdue", "soon", "tomorrow", "later"]
+    reminder_bot.store.close()
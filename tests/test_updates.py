@@ -0,0 +1,52 @@
+from updates import UpdateTracker
+
+
+def updates(*ids):
+    return [{"updateId": update_id, "chatId": "c"} for update_id in ids]
+
+
+def test_cursor_waits_for_earlier_updates_acked_out_of_order(memory_store):
+    tracker = UpdateTracker(memory_store, "test")
+    fresh = tracker.filter(updates(1, 2, 3, 4, 5, 6))
+    assert len(fresh) == 6
+
+    # A fast handler finishes update 6 while 1..5 are still running
+    tracker.ack_id(6)
+    assert tracker.cursor is None
+    assert memory_store.meta == {}
+
+    for update_id in (3, 1):
+        tracker.ack_id(update_id)
+    assert tracker.cursor == 1
+
+    tracker.ack_id(2)
+    assert tracker.cursor == 3
+    assert tracker.in_flight == 3
+
+    for update_id in (5, 4):
+        tracker.ack_id(update_id)
+    assert tracker.cursor == 6
+    assert memory_store.meta["update_cursor:test"] == "6"
+    assert tracker.in_flight == 0
+
+
+def test_restart_resumes_after_the_acked_prefix(memory_store):
+    tracker = UpdateTracker(memory_store, "test")
+    tracker.filter(updates(10, 11, 12))
+    tracker.ack_id(10)
+    tracker.ack_id(12)
+
+    # Crash with 11 unfinished: it is fetched again after the restart
+    restarted = UpdateTracker(memory_store, "test")
+    assert restarted.next_offset() == 11
+    assert [u["updateId"] for u in restarted.filter(updates(11, 12))] == [11, 12]
+
+
+def test_cursor_never_moves_backwards(memory_store):
+    tracker = UpdateTracker(memory_store, "test")
+    tracker.filter(updates(1, 2))
+    tracker.ack_id(1)
+    tracker.ack_id(2)
+    tracker.ack_id(1)
+    assert tracker.cursor == 2
+    assert tracker.filter(updates(1, 2)) == []
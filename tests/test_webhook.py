@@ -0,0 +1,31 @@
+import asyncio
+import json
+
+from updates import UpdateTracker
+from webhook import WebhookServer
+
+
+def body(*ids):
+    return json.dumps([{"updateId": update_id, "chatId": "c", "text": "hi"} for update_id in ids]).encode()
+
+
+def test_rejected_batch_is_accepted_when_redelivered(memory_store):
+    tracker = UpdateTracker(memory_store, "test")
+    server = WebhookServer(queue_size=2, filter_updates=tracker.filter)
+    server.queue = asyncio.Queue(server.queue_size)
+
+    assert server._handle_request("POST", "/webhook", body(1)) == 200
+    # One free slot for two updates: backpressure
+    assert server._handle_request("POST", "/webhook", body(2, 3)) == 503
+    assert server.queue.qsize() == 1
+
+    server.queue.get_nowait()
+    # The redelivery is not mistaken for a duplicate
+    assert server._handle_request("POST", "/webhook", body(2, 3)) == 200
+    assert [server.queue.get_nowait()["updateId"] for _ in range(2)] == [2, 3]
+    assert tracker.duplicates == 0
+
+    # A second redelivery after success is one
+    assert server._handle_request("POST", "/webhook", body(2, 3)) == 200
+    assert server.queue.qsize() == 0
+    assert tracker.duplicates == 2
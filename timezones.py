@@ -0,0 +1,103 @@
+"""
+Time zones for reminder.py.
+
+A chat's zone is kept as a short key: an IANA name ("Asia/Yerevan") or a
+fixed offset normalized to "+05:30". get_zone() resolves a key to a tzinfo
+through an LRU cache, so a ZoneInfo object is built once per zone rather
+than once per message or reminder.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Resolved zone objects kept in memory
+ZONE_CACHE_SIZE = 512
+
+# Offsets are looked up once per zone and QUARTER_HOUR bucket of a batch;
+# zone transitions fall on quarter hours
+QUARTER_HOUR = 15 * 60
+
+OFFSET_RE = re.compile(r"^(?:UTC|GMT)?([+-])(\d{1,2})(?::?(\d{2}))?$", re.IGNORECASE)
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = EPOCH.replace(tzinfo=timezone.utc)
+
+
+def offset_key(minutes):
+    """Key of a fixed UTC offset given in minutes: 330 -> "+05:30"."""
+    sign = "-" if minutes < 0 else "+"
+    hours, mins = divmod(abs(minutes), 60)
+    return f"{sign}{hours:02d}:{mins:02d}"
+
+
+def parse_timezone(text):
+    """
+    Parse '+4', '-3', '+5:30', 'UTC+4' or an IANA name like 'Asia/Yerevan',
+    optionally followed by a region or name ('+4 Armenia').
+    Returns (zone_key, region) or None if invalid.
+    """
+    parts = text.split(maxsplit=1)
+    if not parts:
+        return None
+    tz_part = parts[0]
+    region = parts[1].strip() if len(parts) > 1 else ""
+
+    match = OFFSET_RE.match(tz_part)
+    if match:
+        sign, hours, minutes = match.groups()
+        total = int(hours) * 60 + int(minutes or 0)
+        if int(minutes or 0) >= 60 or total > 14 * 60:
+            return None
+        return offset_key(-total if sign == "-" else total), region
+
+    if "/" in tz_part or tz_part.upper() == "UTC":
+        try:
+            get_zone(tz_part)
+        except (ZoneInfoNotFoundError, ValueError):
+            return None
+        return tz_part, region
+    return None
+
+
+@lru_cache(maxsize=ZONE_CACHE_SIZE)
+def get_zone(key):
+    """tzinfo for a zone key; fixed offsets become datetime.timezone objects."""
+    if key[0] in "+-":
+        sign = -1 if key[0] == "-" else 1
+        hours, minutes = key[1:].split(":")
+        return timezone(sign * timedelta(hours=int(hours), minutes=int(minutes)))
+    return ZoneInfo(key)
+
+
+def local_to_utc(local, key):
+    """Naive wall-clock datetime in zone `key` -> epoch seconds (UTC)."""
+    return int(local.replace(tzinfo=get_zone(key)).timestamp())
+
+
+def utc_to_local(ts, key):
+    """Epoch seconds -> naive wall-clock datetime in zone `key`."""
+    return datetime.fromtimestamp(ts, get_zone(key)).replace(tzinfo=None)
+
+
+def localize_batch(timestamps, keys):
+    """
+    Convert epoch seconds to naive local datetimes, timestamps[i] in zone keys[i].
+    Each zone is resolved once per batch and each UTC offset is computed once
+    per zone and quarter hour, so a batch of due reminders (which share a few
+    zones and seconds) costs a handful of tz lookups in total.
+    """
+    offsets = {}
+    converted = {}  # (key, ts) -> datetime; due reminders share a few seconds
+    result = []
+    for ts, key in zip(timestamps, keys):
+        local = converted.get((key, ts))
+        if local is None:
+            bucket = (key, ts // QUARTER_HOUR)
+            offset = offsets.get(bucket)
+            if offset is None:
+                instant = EPOCH_UTC + timedelta(seconds=bucket[1] * QUARTER_HOUR)
+                offset = offsets[bucket] = int(instant.astimezone(get_zone(key)).utcoffset().total_seconds())
+            local = converted[(key, ts)] = EPOCH + timedelta(seconds=ts + offset)
+        result.append(local)
+    return result
@@ -0,0 +1,111 @@
+import threading
+from collections import deque
+
+# Fields that may carry the update id in a getUpdates item, in order of preference
+UPDATE_ID_KEYS = ("updateId", "update_id", "id", "messageId")
+
+# How many recent update ids are remembered for de-duplication
+SEEN_CAPACITY = 10000
+
+
+class UpdateTracker:
+    """
+    Cursor and de-duplication for getUpdates.
+
+    - the cursor is persisted in the store, so after a restart the fetch
+      resumes after it and older redeliveries are dropped. Handlers may run
+      concurrently and finish out of order, so the cursor only advances over
+      the longest prefix of handed-out updates that are all acknowledged: a
+      crash never skips an update that was still being handled
+    - the last SEEN_CAPACITY ids are kept in a ring buffer + set, so retries
+      and overlapping fetches are filtered in O(1) without scanning history
+
+    Updates without an id cannot be de-duplicated and are passed through.
+    """
+
+    def __init__(self, store, name, capacity=SEEN_CAPACITY):
+        self.store = store
+        self.meta_key = f"update_cursor:{name}"
+        cursor = store.get_meta(self.meta_key)
+        self.cursor = int(cursor) if cursor is not None else None
+        self._ring = deque(maxlen=capacity)
+        self._seen = set()
+        self._in_flight = deque()  # ids returned by filter(), in arrival order
+        self._pending = set()      # the same ids, for O(1) membership
+        self._done = set()         # acknowledged ids not yet at the head of _in_flight
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    @staticmethod
+    def update_id(update):
+        for key in UPDATE_ID_KEYS:
+            value = update.get(key)
+            if value is not None:
+                return int(value) if isinstance(value, str) and value.isdigit() else value
+        return None
+
+    def next_offset(self):
+        """Offset to request from getUpdates (first id after the cursor), or None."""
+        return self.cursor + 1 if self.cursor is not None else None
+
+    def _remember(self, update_id):
+        if len(self._ring) == self._ring.maxlen:
+            self._seen.discard(self._ring[0])
+        self._ring.append(update_id)
+        self._seen.add(update_id)
+
+    def filter(self, updates):
+        """
+        Return only updates that were not seen before, marking them as seen.
+        Every update returned must be acknowledged with ack() once handled.
+        """
+        fresh = []
+        with self._lock:
+            for update in updates:
+                update_id = self.update_id(update)
+                if update_id is None:
+                    fresh.append(update)
+                    continue
+                if update_id in self._seen or (
+                    self.cursor is not None and isinstance(update_id, int) and update_id <= self.cursor
+                ):
+                    self.duplicates += 1
+                    continue
+                self._remember(update_id)
+                if isinstance(update_id, int):
+                    self._in_flight.append(update_id)
+                    self._pending.add(update_id)
+                fresh.append(update)
+        return fresh
+
+    def ack(self, update):
+        """Record that an update has been fully processed (advances the persisted cursor)."""
+        self.ack_id(self.update_id(update))
+
+    def ack_id(self, update_id):
+        if not isinstance(update_id, int):
+            return
+        with self._lock:
+            if update_id not in self._pending:
+                # Not handed out by filter(): nothing earlier can be in flight for it
+                if not self._in_flight and (self.cursor is None or update_id > self.cursor):
+                    self._advance(update_id)
+                return
+            self._done.add(update_id)
+            in_flight, done = self._in_flight, self._done
+            last = None
+            while in_flight and in_flight[0] in done:
+                last = in_flight.popleft()
+                done.discard(last)
+                self._pending.discard(last)
+            if last is not None and (self.cursor is None or last > self.cursor):
+                self._advance(last)
+
+    @property
+    def in_flight(self):
+        """Updates handed out by filter() and not acknowledged yet (or behind one that is not)."""
+        return len(self._in_flight)
+
+    def _advance(self, update_id):
+        self.cursor = update_id
+        self.store.set_meta(self.meta_key, str(update_id))
@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+# Default listening address and path for pushed updates
+WEBHOOK_HOST = "0.0.0.0"
+WEBHOOK_PORT = 8080
+WEBHOOK_PATH = "/webhook"
+
+# Number of worker coroutines handing updates to the runtime, and how many
+# accepted updates may wait for a worker before new requests get 503
+WEBHOOK_WORKERS = 16
+WEBHOOK_QUEUE_SIZE = 1000
+
+# Requests larger than this are rejected
+MAX_BODY_SIZE = 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def parse_updates(body):
+    """
+    Decode a webhook body into a list of update dicts. Accepts a single
+    update, a list of updates, or a getUpdates-style {"data": [...]} object.
+    """
+    payload = json.loads(body)
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        if isinstance(payload.get("data"), list):
+            return payload["data"]
+        return [payload]
+    raise ValueError("unexpected webhook payload")
+
+
+class WebhookServer:
+    """
+    Minimal asyncio HTTP server receiving pushed YoAI updates.
+
+    Accepted updates go into a bounded queue drained by `workers` coroutines,
+    each waiting for BotRuntime.process() so at most `workers` updates are in
+    flight. When the queue is full the request is answered with 503 and
+    Retry-After, so YoAI backs off and redelivers instead of us buffering
+    without limit.
+    """
+
+    def __init__(self, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                 workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE, filter_updates=None):
+        """
+        filter_updates: optional (list of updates) -> list of updates, e.g.
+                        UpdateTracker.filter to drop redelivered updates
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self.workers = workers
+        self.queue_size = queue_size
+        self.filter_updates = filter_updates
+        self.queue = None
+        self.server = None
+        self.accepted = 0
+        self.rejected = 0
+
+    async def serve(self, runtime):
+        """Serve until cancelled, handing updates to the runtime."""
+        self.queue = asyncio.Queue(self.queue_size)
+        workers = [asyncio.ensure_future(self._worker(runtime)) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self._client, self.host, self.port)
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def _worker(self, runtime):
+        while True:
+            message = await self.queue.get()
+            try:
+                await runtime.process(message)
+            finally:
+                self.queue.task_done()
+
+    def _enqueue(self, updates):
+        """Queue all updates of one request, or none of them. Returns False when full."""
+        # Check the room first: filtering marks the updates as seen, and a
+        # rejected batch must not be dropped as a duplicate when it is redelivered
+        if self.queue.maxsize - self.queue.qsize() < len(updates):
+            self.rejected += len(updates)
+            return False
+        if self.filter_updates is not None:
+            updates = self.filter_updates(updates)
+        for update in updates:
+            self.queue.put_nowait(update)
+        self.accepted += len(updates)
+        return True
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status = self._handle_request(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, close=not keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _handle_request(self, method, target, body):
+        if target.split("?", 1)[0] != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        try:
+            updates = parse_updates(body)
+        except ValueError:
+            return 400
+        return 200 if self._enqueue(updates) else 503
+
+    async def _respond(self, writer, status, close=False):
+        body = json.dumps({"success": status == 200}).encode()
+        head = [
+            f"HTTP/1.1 {status} {REASONS[status]}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+        ]
+        if status == 503:
+            head.append("Retry-After: 1")
+        if close:
+            head.append("Connection: close")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
@@ -0,0 +1,131 @@
+import os
+import random
+import time
+
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+
+from metrics import CallStats
+from outbound import PermanentSendError
+
+# YoAI API base URL; the endpoints below are appended to it
+YOAI_BASE_URL = os.environ.get("YOAI_BASE_URL", "https://yoai.yophone.com/api/pub")
+
+# (connect, read) timeouts in seconds for every request
+TIMEOUT = (3.05, 15)
+
+# Retry on throttling and server errors with exponential, jittered backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+
+# Size of the keep-alive connection pool
+POOL_SIZE = 8
+
+
+class YoAIClient:
+    """
+    Shared YoAI API client.
+
+    All calls go through one requests.Session, so TCP/TLS connections are
+    kept alive and reused instead of paying a new handshake per message.
+    Every attempt is recorded per endpoint in `calls` (a CallStats each).
+    """
+
+    def __init__(self, api_key, base_url=YOAI_BASE_URL, timeout=TIMEOUT, pool_size=POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "X-YoAI-API-Key": api_key,
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.calls = {}
+
+    # ----- Low-level -----
+    def _backoff(self, attempt, response=None):
+        """Sleep before the next retry, honouring Retry-After when the server sends it."""
+        delay = None
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+        if delay is None:
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+        time.sleep(delay)
+
+    def post(self, endpoint, payload, retries=MAX_RETRIES):
+        """
+        POST a JSON payload to a YoAI endpoint, retrying on 429/5xx and
+        connection errors. Returns the final response, or None if every
+        attempt failed to connect.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        stats = self.calls.get(endpoint)
+        if stats is None:
+            stats = self.calls.setdefault(endpoint, CallStats())
+        response = None
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                stats.observe(time.perf_counter() - start, type(e).__name__)
+                response = None
+                if attempt == retries:
+                    return None
+                self._backoff(attempt)
+                continue
+            status = response.status_code
+            stats.observe(time.perf_counter() - start, "ok" if status == 200 else str(status))
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            self._backoff(attempt, response)
+        return response
+
+    # ----- API -----
+    def get_updates(self, offset=None):
+        """Fetch new updates (starting at `offset` when given); returns a (possibly empty) list."""
+        try:
+            response = self.post("getUpdates", {"offset": offset} if offset is not None else {})
+            if response is None or response.status_code != 200:
+                return []
+            updates = response.json()
+            if updates.get("success") and updates.get("data"):
+                return updates["data"]
+            return []
+        except ValueError:
+            return []
+
+    def send_message(self, chat_id, text):
+        """Send a text message right away. Returns True on success."""
+        response = self.post("sendMessage", {"to": chat_id, "text": text})
+        return response is not None and response.status_code == 200
+
+    def deliver(self, chat_id, text):
+        """
+        Single sendMessage attempt for the outbound queue, which does its own
+        retries: returns True on success, False on a transient failure and
+        raises PermanentSendError when the request was rejected for good.
+        """
+        response = self.post("sendMessage", {"to": chat_id, "text": text}, retries=0)
+        if response is None or response.status_code in RETRY_STATUSES:
+            return False
+        if 400 <= response.status_code < 500:
+            raise PermanentSendError(f"HTTP {response.status_code}")
+        return response.status_code == 200
+
+    def set_webhook(self, webhook_url):
+        """Register a webhook URL. Returns True on success."""
+        try:
+            response = self.post("setWebhook", {"webhookURL": webhook_url})
+            return response is not None and response.status_code == 200 and bool(response.json().get("success"))
+        except ValueError:
+            return False
+
+    def close(self):
+        self.session.close()